@@ -0,0 +1,227 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from backends import create_executor
+from profiling import NullProfiler, batch_stats
+
+
+class GeneAggregates:
+    """
+    Per-gene summaries of the weights of all pairs of a gene: the number (Degree) and the sum (WeightedDegree)
+    of the weights of at least a threshold, as in `network-stats`, and the largest weight (MaxWeight). Partial
+    aggregates of tiles of pairs are merged into it, so memory stays linear in the number of genes.
+    """
+
+    def __init__(self, gene_names):
+        self.gene_names = np.asarray(gene_names)
+        n_genes = len(self.gene_names)
+        self.degree = np.zeros(n_genes, dtype=np.int64)
+        self.weighted_degree = np.zeros(n_genes)
+        self.max_weight = np.full(n_genes, np.nan)
+
+    @staticmethod
+    def fold(pairs: np.ndarray, weights: np.ndarray, threshold: float):
+        """
+        Folds the weights of gene pairs into partial aggregates of the genes they touch. Pairs that failed
+        (NaN weights) are ignored.
+
+        Returns:
+            tuple: The touched genes and their degree, weighted degree and maximum weight.
+        """
+        genes, columns = np.unique(pairs, return_inverse=True)
+        columns = columns.reshape(pairs.shape)
+        degree = np.zeros(len(genes), dtype=np.int64)
+        weighted_degree = np.zeros(len(genes))
+        max_weight = np.full(len(genes), np.nan)
+        above = weights >= threshold
+        for side in (columns[:, 0], columns[:, 1]):
+            np.add.at(degree, side[above], 1)
+            np.add.at(weighted_degree, side[above], weights[above])
+            np.fmax.at(max_weight, side, weights)
+        return genes, degree, weighted_degree, max_weight
+
+    def merge(self, genes, degree, weighted_degree, max_weight) -> None:
+        """
+        Merges partial aggregates returned by `fold`.
+        """
+        self.degree[genes] += degree
+        self.weighted_degree[genes] += weighted_degree
+        self.max_weight[genes] = np.fmax(self.max_weight[genes], max_weight)
+
+    def to_table(self) -> pd.DataFrame:
+        """
+        Returns the aggregates with the columns Gene, Degree, WeightedDegree and MaxWeight, sorted by
+        decreasing weighted degree.
+        """
+        table = pd.DataFrame(
+            {
+                "Gene": self.gene_names,
+                "Degree": self.degree,
+                "WeightedDegree": self.weighted_degree,
+                "MaxWeight": self.max_weight,
+            }
+        )
+        return table.sort_values(
+            ["WeightedDegree", "Degree"], ascending=False, kind="stable"
+        ).reset_index(drop=True)
+
+
+class GeneAggregateAnalyzer:
+    """
+    Computes the per-gene aggregates of all gene pairs without materializing the network. Every worker
+    computes a tile of the condensed pair ordering and folds its weights into the aggregates of the genes of
+    the tile, so only O(tile) values are returned per tile and the parent merges them into O(genes) arrays.
+    """
+
+    def __init__(self, analyzer):
+        """
+        Args:
+            analyzer (GeneExpressionAnalyzer): The analyzer used to compute the weights of the tiles.
+        """
+        self.analyzer = analyzer
+
+    def compute_tile(
+        self,
+        bounds,
+        threshold,
+        source1,
+        source2,
+        ties_method,
+        smoothing,
+        ks_stat_method,
+        data1_shape,
+        data2_shape,
+        dtype,
+        profile=False,
+    ):
+        """
+        Computes the weights of the gene pairs at the positions [start, stop) of the condensed pair ordering
+        with `GeneExpressionAnalyzer.compute_condensed_range` and folds them into partial aggregates. Runs
+        inside a worker.
+
+        Returns:
+            tuple: The partial aggregates returned by `GeneAggregates.fold`. If `profile` is set, a tuple of
+                   them and the profiler snapshot of the tile.
+        """
+        weights = self.analyzer.compute_condensed_range(
+            bounds,
+            source1,
+            source2,
+            ties_method,
+            smoothing,
+            ks_stat_method,
+            data1_shape,
+            data2_shape,
+            dtype,
+            profile,
+        )
+        if profile:
+            weights, snapshot = weights
+        start, stop = bounds
+        pairs = self.analyzer.condensed_to_pairs(np.arange(start, stop), data1_shape[1])
+        partial = GeneAggregates.fold(pairs, weights, threshold)
+        return (partial, snapshot) if profile else partial
+
+    def compute_aggregates(
+        self,
+        shared_data,
+        threshold=0.0,
+        ties_method="average",
+        smoothing="none",
+        ks_stat_method="asymp",
+        batch_size=1000,
+        max_workers=None,
+        executor=None,
+        max_in_flight=None,
+        profiler=None,
+        monitor=None,
+        verbose=True,
+        backend="processes",
+    ) -> GeneAggregates:
+        """
+        Computes the per-gene aggregates of all gene pairs of two conditions.
+
+        Args:
+            shared_data (SharedExpressionData): The expression data of both conditions, as returned by
+                                                `expression_data_class(backend)`.
+            threshold (float): Minimum weight of the pairs counted in Degree and WeightedDegree.
+            ties_method (str): Ranking method for ties within pseudo-observations.
+            smoothing (str): Smoothing applied to the empirical copula: 'none', 'beta' or 'checkerboard'.
+            ks_stat_method (str): Mode of the ks_2samp function.
+            batch_size (int): Number of gene pairs per tile.
+            max_workers (int): Number of workers. Defaults to the number of CPUs.
+            executor (Executor): An already running executor to submit the tiles to.
+            max_in_flight (int): Maximum number of tiles submitted at any time. Defaults to twice the number of
+                                 workers.
+            profiler (RunProfiler): If given, the time spent in every stage is recorded into it.
+            monitor (ProgressMonitor): If given, the progress of the run is reported to it.
+            verbose (bool): Whether to print a progress bar.
+            backend (str): Runs the tiles in worker 'processes', in 'threads' of this process or 'serial' in
+                           the calling thread.
+
+        Returns:
+            GeneAggregates: The aggregates of every gene.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
+        n_genes = shared_data.n_genes
+        n_pairs = n_genes * (n_genes - 1) // 2
+        max_workers = max_workers or os.cpu_count()
+        max_in_flight = max_in_flight or 2 * max_workers
+        collect_stats = batch_stats(profiler, monitor)
+
+        aggregates = GeneAggregates(shared_data.gene_names)
+        if profiler:
+            profiler.start_compute()
+        if monitor:
+            monitor.start(n_pairs, shared_memory_bytes=shared_data.nbytes)
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = create_executor(backend, max_workers)
+        try:
+            progress = tqdm(
+                total=-(-n_pairs // batch_size),
+                desc="Aggregating genes",
+                unit="batch",
+                disable=not verbose,
+            )
+            tiles = (
+                (start, min(start + batch_size, n_pairs))
+                for start in range(0, n_pairs, batch_size)
+            )
+            args = (
+                threshold,
+                *shared_data.sources,
+                ties_method,
+                smoothing,
+                ks_stat_method,
+                shared_data.data1_shape,
+                shared_data.data2_shape,
+                shared_data.dtype,
+                collect_stats,
+            )
+            for (start, stop), partial in self.analyzer.submit_bounded(
+                executor, self.compute_tile, tiles, args, max_in_flight, stage
+            ):
+                if collect_stats:
+                    partial, snapshot = partial
+                if profiler:
+                    profiler.add_batch(snapshot, received=time.time())
+                if monitor:
+                    monitor.record_batch(stop - start, snapshot["pid"], snapshot["end"])
+                with stage("result_collection"):
+                    aggregates.merge(*partial)
+                progress.update(1)
+            progress.close()
+        finally:
+            if owns_executor:
+                executor.shutdown()
+            if profiler:
+                profiler.end_compute()
+            if monitor:
+                monitor.stop()
+        return aggregates
@@ -1,12 +1,169 @@
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, wait
 from multiprocessing import shared_memory
+import itertools
 import os
+import time
 
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from scipy.stats import ks_2samp
 
+from backends import create_executor
+from profiling import NullProfiler, batch_profiler, batch_stats
+
+# Result of a gene pair as returned by the workers: the gene indices and the weight, 16 bytes per pair. Gene names
+# and the condition label are only attached when the network is built or written.
+PAIR_RESULT_DTYPE = np.dtype(
+    [("regulator", np.int32), ("target", np.int32), ("weight", np.float64)]
+)
+CONDITION_LABEL = "Diff Co-Exp of both Condition"
+
+
+class SharedExpressionData:
+    """
+    The expression matrices of both conditions published in shared memory, so that worker processes can read
+    them without copying. An instance can be reused by several computations on the same data and has to be
+    released with `close` (or by using it as a context manager).
+    """
+
+    def __init__(self, df1, df2):
+        """
+        Args:
+            df1 (pd.DataFrame): Expression data of the first condition, gene names in the first column.
+            df2 (pd.DataFrame): Expression data of the second condition, with the same genes as `df1`.
+        """
+        assert np.array_equal(
+            df1.iloc[:, 0].values, df2.iloc[:, 0].values
+        ), "Gene lists must match!"
+        self._publish(
+            df1.iloc[:, 0].values, df1.iloc[:, 1:].values, df2.iloc[:, 1:].values
+        )
+
+    @classmethod
+    def from_arrays(cls, data1, data2, gene_names=None):
+        """
+        Publishes expression matrices given as NumPy arrays.
+
+        Args:
+            data1 (np.ndarray): Expression data of the first condition, genes in rows and samples in columns.
+            data2 (np.ndarray): Expression data of the second condition, with the same genes as `data1`.
+            gene_names (np.ndarray): Names of the genes, defaults to their indices.
+        """
+        data1 = np.asarray(data1)
+        data2 = np.asarray(data2)
+        if data1.ndim != 2 or data2.ndim != 2 or len(data1) != len(data2):
+            raise ValueError(
+                "Both conditions must be 2-dimensional arrays with the same number of genes."
+            )
+        shared_data = cls.__new__(cls)
+        shared_data._publish(
+            np.arange(len(data1)) if gene_names is None else np.asarray(gene_names),
+            data1,
+            data2,
+        )
+        return shared_data
+
+    def _publish(self, gene_names, values1, values2):
+        self.gene_names = gene_names
+
+        # Samples in rows and genes in columns, both conditions share one dtype
+        dtype = np.result_type(values1, values2)
+        data1 = values1.T.astype(dtype, copy=False)
+        data2 = values2.T.astype(dtype, copy=False)
+
+        # Create shared memory
+        self.shm_data1 = shared_memory.SharedMemory(create=True, size=data1.nbytes)
+        self.shm_data2 = shared_memory.SharedMemory(create=True, size=data2.nbytes)
+        # Create numpy arrays on the buffer of the shared memory
+        np_data1 = np.ndarray(data1.shape, dtype=dtype, buffer=self.shm_data1.buf)
+        np_data2 = np.ndarray(data2.shape, dtype=dtype, buffer=self.shm_data2.buf)
+        np.copyto(np_data1, data1)
+        np.copyto(np_data2, data2)
+
+        self.data1_shape = data1.shape
+        self.data2_shape = data2.shape
+        self.dtype = dtype
+
+    @property
+    def n_genes(self):
+        return min(self.data1_shape[1], self.data2_shape[1])
+
+    @property
+    def nbytes(self):
+        return self.shm_data1.size + self.shm_data2.size
+
+    @property
+    def sources(self):
+        """
+        The sources of both conditions passed to the workers, see `attach_expression_data`.
+        """
+        return self.shm_data1.name, self.shm_data2.name
+
+    def close(self):
+        # Clean up shared memory
+        self.shm_data1.close()
+        self.shm_data1.unlink()
+        self.shm_data2.close()
+        self.shm_data2.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalExpressionData(SharedExpressionData):
+    """
+    The expression matrices of both conditions kept in the memory of this process, for the thread and serial
+    backends whose workers read the arrays directly instead of from shared memory. It has the interface of
+    SharedExpressionData; the matrices are not copied where their dtypes allow it and `close` releases nothing.
+    """
+
+    def _publish(self, gene_names, values1, values2):
+        self.gene_names = gene_names
+        dtype = np.result_type(values1, values2)
+        # Samples in rows and genes in columns, as views of the input where possible
+        self.data1 = values1.T.astype(dtype, copy=False)
+        self.data2 = values2.T.astype(dtype, copy=False)
+        self.data1_shape = self.data1.shape
+        self.data2_shape = self.data2.shape
+        self.dtype = dtype
+
+    @property
+    def nbytes(self):
+        return self.data1.nbytes + self.data2.nbytes
+
+    @property
+    def sources(self):
+        return self.data1, self.data2
+
+    def close(self):
+        pass
+
+
+def expression_data_class(backend: str):
+    """
+    Returns the class holding the expression data for the workers of a backend: shared memory for worker
+    processes, the arrays themselves for threads and serial runs.
+    """
+    return SharedExpressionData if backend == "processes" else LocalExpressionData
+
+
+def attach_expression_data(source, shape, dtype):
+    """
+    Returns the expression data of a condition inside a worker. `source` is the name of a shared memory segment,
+    which is attached, or the array itself for workers running in this process.
+
+    Returns:
+        tuple: The array and the attached SharedMemory, which the caller has to close, or None.
+    """
+    if isinstance(source, np.ndarray):
+        return source, None
+    shm = shared_memory.SharedMemory(name=source)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf), shm
+
 
 class GeneExpressionAnalyzer:
     TIES_AVERAGE = "average"
@@ -30,57 +187,262 @@ class GeneExpressionAnalyzer:
         indices,
         shm_name_data1,
         shm_name_data2,
-        gene_names,
         ties_method,
         smoothing,
         ks_stat_method,
         data1_shape,
         data2_shape,
         dtype,
+        profile=False,
     ):
-        # Access shared memory
-        existing_shm_data1 = shared_memory.SharedMemory(name=shm_name_data1)
-        existing_shm_data2 = shared_memory.SharedMemory(name=shm_name_data2)
+        """
+        Computes the differential coexpression weight of a batch of gene pairs. Runs inside a worker and reads
+        the expression data from shared memory, or directly from the arrays given for in-process workers.
 
-        # Create numpy arrays from the buffers of the shared memory
-        np_data1 = np.ndarray(data1_shape, dtype=dtype, buffer=existing_shm_data1.buf)
-        np_data2 = np.ndarray(data2_shape, dtype=dtype, buffer=existing_shm_data2.buf)
+        Args:
+            indices (list): Gene index pairs (i, j) to compute.
+            profile (bool | str): If True, the time spent in every stage is recorded and returned alongside the
+                                  results; with 'progress' only the progress of the batch (see `batch_profiler`).
 
-        results = []
+        Returns:
+            np.ndarray: Structured array of PAIR_RESULT_DTYPE with one record per computed pair, pairs that failed
+                        are left out. If `profile` is set, a tuple of the results and the profiler snapshot
+                        of the batch.
+        """
+        profiler = batch_profiler(profile)
+
+        with profiler.stage("attach_shared_memory"):
+            np_data1, existing_shm_data1 = attach_expression_data(
+                shm_name_data1, data1_shape, dtype
+            )
+            np_data2, existing_shm_data2 = attach_expression_data(
+                shm_name_data2, data2_shape, dtype
+            )
+
+        results = np.empty(len(indices), dtype=PAIR_RESULT_DTYPE)
+        n_results = 0
         for i, j in indices:
             try:
-                gene_pair_data1 = np.vstack((np_data1[:, i], np_data1[:, j])).T
-                gene_pair_data2 = np.vstack((np_data2[:, i], np_data2[:, j])).T
-                u1 = self.empirical_copula.pseudo_observations(
-                    gene_pair_data1, ties_method
-                )
-                u2 = self.empirical_copula.pseudo_observations(
-                    gene_pair_data2, ties_method
-                )
-                ec1 = self.empirical_copula.empirical_copula(
-                    u1, gene_pair_data1, ties_method, smoothing
-                )
-                ec2 = self.empirical_copula.empirical_copula(
-                    u2, gene_pair_data2, ties_method, smoothing
-                )
-                ks_stat, _ = ks_2samp(ec1, ec2, method=ks_stat_method)
-                results.append(
-                    {
-                        "Target": gene_names[j],
-                        "Regulator": gene_names[i],
-                        "Condition": "Diff Co-Exp of both Condition",
-                        "Weight": ks_stat,
-                    }
+                results[n_results] = (
+                    i,
+                    j,
+                    self.pair_weight(
+                        np_data1,
+                        np_data2,
+                        i,
+                        j,
+                        ties_method,
+                        smoothing,
+                        ks_stat_method,
+                        profiler,
+                    ),
                 )
+                n_results += 1
             except Exception as e:
                 print(f"Error processing pair ({i}, {j}): {e}")
+        results = results[:n_results]
 
         # Clean up shared memory
-        existing_shm_data1.close()
-        existing_shm_data2.close()
+        del np_data1, np_data2
+        for shm in (existing_shm_data1, existing_shm_data2):
+            if shm:
+                shm.close()
 
+        if profiler.enabled:
+            profiler.pairs = len(results)
+            return results, profiler.snapshot()
         return results
 
+    def pair_weight(
+        self,
+        np_data1,
+        np_data2,
+        i,
+        j,
+        ties_method,
+        smoothing,
+        ks_stat_method,
+        profiler=None,
+    ):
+        """
+        Computes the differential coexpression weight of the gene pair (i, j): the Kolmogorov-Smirnov statistic
+        between the empirical copulas of both conditions.
+
+        Args:
+            np_data1 (np.ndarray): Expression data of the first condition, samples in rows and genes in columns.
+            np_data2 (np.ndarray): Expression data of the second condition, samples in rows and genes in columns.
+            profiler (StageProfiler): If given, the time spent in every stage is recorded into it.
+
+        Returns:
+            float: The weight of the pair.
+        """
+        profiler = profiler or NullProfiler()
+        with profiler.stage("pseudo_observations"):
+            gene_pair_data1 = np.vstack((np_data1[:, i], np_data1[:, j])).T
+            gene_pair_data2 = np.vstack((np_data2[:, i], np_data2[:, j])).T
+            u1 = self.empirical_copula.pseudo_observations(gene_pair_data1, ties_method)
+            u2 = self.empirical_copula.pseudo_observations(gene_pair_data2, ties_method)
+        with profiler.stage("empirical_copula"):
+            ec1 = self.empirical_copula.empirical_copula(
+                u1, gene_pair_data1, ties_method, smoothing
+            )
+            ec2 = self.empirical_copula.empirical_copula(
+                u2, gene_pair_data2, ties_method, smoothing
+            )
+        with profiler.stage("ks_test"):
+            ks_stat, _ = ks_2samp(ec1, ec2, method=ks_stat_method)
+        return ks_stat
+
+    def compute_condensed_range(
+        self,
+        bounds,
+        shm_name_data1,
+        shm_name_data2,
+        ties_method,
+        smoothing,
+        ks_stat_method,
+        data1_shape,
+        data2_shape,
+        dtype,
+        profile=False,
+    ):
+        """
+        Computes the weights of the gene pairs at the positions [start, stop) of the condensed pair ordering.
+        Runs inside a worker and reads the expression data from shared memory, or directly from the arrays
+        given for in-process workers.
+
+        Args:
+            bounds (tuple): The range (start, stop) of condensed positions to compute.
+            profile (bool | str): If True, the time spent in every stage is recorded and returned alongside the
+                                  weights; with 'progress' only the progress of the batch (see `batch_profiler`).
+
+        Returns:
+            np.ndarray: The weights of the range, NaN for pairs that failed. If `profile` is set, a tuple of the
+                        weights and the profiler snapshot of the batch.
+        """
+        profiler = batch_profiler(profile)
+
+        with profiler.stage("attach_shared_memory"):
+            np_data1, existing_shm_data1 = attach_expression_data(
+                shm_name_data1, data1_shape, dtype
+            )
+            np_data2, existing_shm_data2 = attach_expression_data(
+                shm_name_data2, data2_shape, dtype
+            )
+
+        start, stop = bounds
+        pairs = self.condensed_to_pairs(np.arange(start, stop), data1_shape[1])
+        weights = np.empty(len(pairs))
+        for k, (i, j) in enumerate(pairs):
+            try:
+                weights[k] = self.pair_weight(
+                    np_data1,
+                    np_data2,
+                    i,
+                    j,
+                    ties_method,
+                    smoothing,
+                    ks_stat_method,
+                    profiler,
+                )
+            except Exception as e:
+                print(f"Error processing pair ({i}, {j}): {e}")
+                weights[k] = np.nan
+
+        del np_data1, np_data2
+        for shm in (existing_shm_data1, existing_shm_data2):
+            if shm:
+                shm.close()
+
+        if profiler.enabled:
+            profiler.pairs = len(weights)
+            return weights, profiler.snapshot()
+        return weights
+
+    @staticmethod
+    def submit_bounded(executor, fn, batches, args, max_in_flight, stage=None):
+        """
+        Submits `fn(batch, *args)` for every batch while keeping at most `max_in_flight` of them pending, so
+        that the batches can be generated lazily and the memory of the queue stays constant.
+
+        Yields:
+            tuple: Every batch together with its result, in the order in which they finish (in the order of
+                   submission for serial runs).
+        """
+        stage = stage or NullProfiler().stage
+        batches = iter(batches)
+        pending = {}
+        while True:
+            with stage("task_submission"):
+                for batch in itertools.islice(batches, max_in_flight - len(pending)):
+                    pending[executor.submit(fn, batch, *args)] = batch
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            # Finished batches are yielded in the order of their submission, which keeps serial runs in order
+            for future in [future for future in pending if future in done]:
+                yield pending.pop(future), future.result()
+
+    @staticmethod
+    def iter_pair_batches(n_genes, batch_size, pairs=None):
+        """
+        Lazily yields all gene index pairs (i, j) with i < j in batches of `batch_size`, without materializing
+        the list of all pairs. If `pairs` is given, its pairs are batched instead.
+        """
+        if pairs is None:
+            pairs = ((i, j) for i in range(n_genes - 1) for j in range(i + 1, n_genes))
+        else:
+            pairs = ((int(i), int(j)) for i, j in pairs)
+        while True:
+            batch = list(itertools.islice(pairs, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def condensed_to_pairs(condensed, n_genes):
+        """
+        Converts positions in the condensed (scipy `pdist`) ordering of all gene pairs into gene index pairs.
+
+        Args:
+            condensed (np.ndarray): Positions in [0, n_genes * (n_genes - 1) / 2).
+            n_genes (int): Number of genes.
+
+        Returns:
+            np.ndarray: Array of shape (len(condensed), 2) with the indices (i, j), i < j, of every pair.
+        """
+        condensed = np.asarray(condensed, dtype=np.int64)
+        n = n_genes
+        # Row i starts at position i * (2n - i - 1) / 2, so i is the root of that quadratic
+        i = (
+            n - 2 - np.floor(np.sqrt(-8.0 * condensed + 4.0 * n * (n - 1) - 7) / 2 - 0.5)
+        ).astype(np.int64)
+        row_start = i * (2 * n - i - 1) // 2
+        j = condensed - row_start + i + 1
+        return np.column_stack([i, j])
+
+    @staticmethod
+    def to_network(results, gene_names, condition=CONDITION_LABEL) -> pd.DataFrame:
+        """
+        Converts pair results as returned by `compute_pairs` into a network with the columns Target, Regulator,
+        Condition and Weight.
+
+        Args:
+            results (np.ndarray): Structured array of PAIR_RESULT_DTYPE.
+            gene_names (np.ndarray): Name of every gene index.
+            condition (str): Label of the Condition column.
+        """
+        gene_names = np.asarray(gene_names)
+        return pd.DataFrame(
+            {
+                "Target": gene_names[results["target"]],
+                "Regulator": gene_names[results["regulator"]],
+                "Condition": condition,
+                "Weight": results["weight"],
+            }
+        )
+
     def compute_dc_copula_network_parallel(
         self,
         df1,
@@ -89,88 +451,275 @@ class GeneExpressionAnalyzer:
         smoothing="none",
         ks_stat_method="asymp",
         batch_size=100,
+        max_workers=None,
+        profiler=None,
+        executor=None,
+        shared_data=None,
+        verbose=True,
+        max_in_flight=None,
+        monitor=None,
+        pairs=None,
+        on_batch=None,
+        backend="processes",
     ):
-        gene_names = df1.iloc[:, 0].values
-        assert np.array_equal(
-            gene_names, df2.iloc[:, 0].values
-        ), "Gene lists must match!"
+        """
+        Computes the differential coexpression weight of every gene pair in parallel.
 
-        data1 = df1.iloc[:, 1:].values.T
-        data2 = df2.iloc[:, 1:].values.T
+        Args:
+            df1 (pd.DataFrame): Expression data of the first condition, gene names in the first column.
+            df2 (pd.DataFrame): Expression data of the second condition, with the same genes as `df1`.
+            ties_method (str): Ranking method for ties within pseudo-observations.
+            smoothing (str): Smoothing applied to the empirical copula: 'none', 'beta' or 'checkerboard'.
+            ks_stat_method (str): Mode of the ks_2samp function.
+            batch_size (int): Number of gene pairs per task submitted to the worker processes.
+            max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+            profiler (RunProfiler): If given, the time spent in every stage of the parent and the workers is
+                                    recorded into it.
+            executor (ProcessPoolExecutor): An already running executor (with `max_workers` processes) to submit
+                                            the batches to, which is left running. By default a new one is used.
+            shared_data (SharedExpressionData): The expression data of `df1` and `df2` already published in shared
+                                                memory. By default it is published and released by this call.
+            verbose (bool): Whether to print the run summary and progress bars.
+            max_in_flight (int): Maximum number of batches submitted to the executor at any time. Defaults to
+                                 twice the number of workers.
+            monitor (ProgressMonitor): If given, the progress of the run is reported to it.
+            pairs (np.ndarray): Gene index pairs (i, j) to compute instead of all pairs, e.g. a sample of them.
+            on_batch (callable): If given, called with the results of every batch (a structured array of
+                                 PAIR_RESULT_DTYPE) as soon as they arrive instead of collecting them, e.g. to
+                                 write them while the computation continues.
+            backend (str): Runs the batches in worker 'processes', in 'threads' of this process or 'serial' in
+                           the calling thread. Threads and serial runs read the data without shared memory.
 
-        # Create shared memory
-        shm_data1 = shared_memory.SharedMemory(create=True, size=data1.nbytes)
-        shm_data2 = shared_memory.SharedMemory(create=True, size=data2.nbytes)
-        # Create numpy arrays on the buffer of the shared memory
-        np_data1 = np.ndarray(data1.shape, dtype=data1.dtype, buffer=shm_data1.buf)
-        np_data2 = np.ndarray(data2.shape, dtype=data2.dtype, buffer=shm_data2.buf)
-        np.copyto(np_data1, data1)
-        np.copyto(np_data2, data2)
+        Returns:
+            pd.DataFrame: One row per gene pair with the columns Target, Regulator, Condition and Weight, or None
+                          if `on_batch` is given.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
 
-        n_genes = min(len(data1[0]), len(data2[0]))
-        pairs = [(i, j) for i in range(n_genes - 1) for j in range(i + 1, n_genes)]
-        batches = [pairs[i : i + batch_size] for i in range(0, len(pairs), batch_size)]
-
-        results = pd.DataFrame()
-
-        # Print dataset summary
-        print(f"Starting DC Copula coexpression calculation:")
-        print(f"-------------------------")
-        print(f" - Number of gene pairs to be analyzed: {n_genes * (n_genes - 1) // 2}")
-        print(f" - Batch size: {batch_size}")
-        print(f" - Number of batches: {len(batches)}")
-        print(f" - Ties method: {ties_method}")
-        print(f" - Smoothing technique: {smoothing}")
-        print(f" - KS statistic mode: {ks_stat_method}")
-        print(f"-------------------------")
-
-        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-            futures = []
-
-            print("\nQueueing tasks...")
-            submission_progress = tqdm(
-                total=len(batches), desc="Queueing gene pairs", unit="batch"
-            )
+        owns_shared_data = shared_data is None
+        if owns_shared_data:
+            with stage("shared_memory_setup"):
+                shared_data = expression_data_class(backend)(df1, df2)
+        gene_names = shared_data.gene_names
 
-            for batch in batches:
-                futures.append(
-                    executor.submit(
-                        self.compute_pairs,
-                        batch,
-                        shm_data1.name,
-                        shm_data2.name,
-                        gene_names,
-                        ties_method,
-                        smoothing,
-                        ks_stat_method,
-                        data1.shape,
-                        data2.shape,
-                        data1.dtype,
-                    )
-                )
-                submission_progress.update(1)
-            submission_progress.close()
+        n_genes = shared_data.n_genes
+        n_pairs = n_genes * (n_genes - 1) // 2 if pairs is None else len(pairs)
+        n_batches = -(-n_pairs // batch_size)
+
+        max_workers = max_workers or os.cpu_count()
+        # Only a few batches per worker are queued at a time, so that the memory of the queue stays constant
+        max_in_flight = max_in_flight or 2 * max_workers
+        results = []
+
+        if verbose:
+            # Print dataset summary
+            print(f"Starting DC Copula coexpression calculation:")
+            print(f"-------------------------")
+            print(f" - Number of gene pairs to be analyzed: {n_pairs}")
+            print(f" - Batch size: {batch_size}")
+            print(f" - Number of batches: {n_batches}")
+            print(f" - Number of workers: {max_workers}")
+            print(f" - Ties method: {ties_method}")
+            print(f" - Smoothing technique: {smoothing}")
+            print(f" - KS statistic mode: {ks_stat_method}")
+            print(f"-------------------------")
 
-            print("\nProcessing gene pairs...")
+        # Workers only report their statistics if somebody consumes them
+        collect_stats = batch_stats(profiler, monitor)
+
+        if profiler:
+            profiler.start_compute()
+        if monitor:
+            monitor.start(n_pairs, shared_memory_bytes=shared_data.nbytes)
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = create_executor(backend, max_workers)
+
+        try:
+            if verbose:
+                print("\nProcessing gene pairs...")
             completion_progress = tqdm(
-                as_completed(futures),
-                total=len(futures),
+                total=n_batches,
                 desc="Computing distances",
                 unit="batch",
+                disable=not verbose,
             )
 
-            for future in completion_progress:
-                batch_results = future.result()
-                results = pd.concat(
-                    [results, pd.DataFrame(batch_results)], ignore_index=True
-                )
+            batches = self.iter_pair_batches(n_genes, batch_size, pairs)
+            args = (
+                *shared_data.sources,
+                ties_method,
+                smoothing,
+                ks_stat_method,
+                shared_data.data1_shape,
+                shared_data.data2_shape,
+                shared_data.dtype,
+                collect_stats,
+            )
+            for _, batch_results in self.submit_bounded(
+                executor, self.compute_pairs, batches, args, max_in_flight, stage
+            ):
+                if collect_stats:
+                    batch_results, snapshot = batch_results
+                if profiler:
+                    profiler.add_batch(snapshot, received=time.time())
+                if monitor:
+                    monitor.record_batch(
+                        len(batch_results), snapshot["pid"], snapshot["end"]
+                    )
+                with stage("result_collection"):
+                    if on_batch:
+                        on_batch(batch_results)
+                    else:
+                        results.append(batch_results)
                 completion_progress.update(1)
             completion_progress.close()
 
-        # Clean up shared memory
-        shm_data1.close()
-        shm_data1.unlink()
-        shm_data2.close()
-        shm_data2.unlink()
+            if on_batch:
+                results = None
+            else:
+                with stage("result_collection"):
+                    results = self.to_network(
+                        np.concatenate(results)
+                        if results
+                        else np.empty(0, dtype=PAIR_RESULT_DTYPE),
+                        gene_names,
+                    )
+        finally:
+            if owns_executor:
+                executor.shutdown()
+            if profiler:
+                profiler.end_compute()
+            if monitor:
+                monitor.stop()
+            if owns_shared_data:
+                with stage("shared_memory_cleanup"):
+                    shared_data.close()
 
         return results
+
+    def compute_condensed(
+        self,
+        data1,
+        data2,
+        ties_method="average",
+        smoothing="none",
+        ks_stat_method="asymp",
+        batch_size=1000,
+        max_workers=None,
+        out=None,
+        executor=None,
+        shared_data=None,
+        max_in_flight=None,
+        profiler=None,
+        monitor=None,
+        backend="processes",
+    ):
+        """
+        Computes the differential coexpression weight of every gene pair from NumPy arrays and returns them as a
+        condensed upper triangle, in the layout of `scipy.spatial.distance.pdist`: the weight of the genes i < j
+        is at position n * i - i * (i + 1) / 2 + j - i - 1. It can be expanded with
+        `scipy.spatial.distance.squareform` or passed to `scipy.cluster.hierarchy.linkage` directly. No object is
+        allocated per pair; every batch is a contiguous range of the condensed array.
+
+        Args:
+            data1 (np.ndarray): Expression data of the first condition, genes in rows and samples in columns.
+            data2 (np.ndarray): Expression data of the second condition, with the same genes as `data1`.
+            ties_method (str): Ranking method for ties within pseudo-observations.
+            smoothing (str): Smoothing applied to the empirical copula: 'none', 'beta' or 'checkerboard'.
+            ks_stat_method (str): Mode of the ks_2samp function.
+            batch_size (int): Number of gene pairs per task submitted to the worker processes.
+            max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+            out (np.ndarray): A float array of length n * (n - 1) / 2 the weights are written into, e.g. a
+                              preallocated or memory-mapped buffer. By default a new array is allocated.
+            executor (ProcessPoolExecutor): An already running executor to submit the batches to.
+            shared_data (SharedExpressionData): The expression data already published in shared memory, in which
+                                                case `data1` and `data2` are ignored.
+            max_in_flight (int): Maximum number of batches submitted at any time. Defaults to twice the number of
+                                 workers.
+            profiler (RunProfiler): If given, the time spent in every stage is recorded into it.
+            monitor (ProgressMonitor): If given, the progress of the run is reported to it.
+            backend (str): Runs the batches in worker 'processes', in 'threads' of this process or 'serial' in
+                           the calling thread.
+
+        Returns:
+            np.ndarray: The condensed weights (`out` if it was given). Pairs that failed are NaN.
+
+        Raises:
+            ValueError: If the inputs or `out` have the wrong shape.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
+
+        owns_shared_data = shared_data is None
+        if owns_shared_data:
+            with stage("shared_memory_setup"):
+                shared_data = expression_data_class(backend).from_arrays(data1, data2)
+
+        try:
+            n_genes = shared_data.n_genes
+            n_pairs = n_genes * (n_genes - 1) // 2
+            if out is None:
+                out = np.empty(n_pairs)
+            elif out.shape != (n_pairs,) or not np.issubdtype(out.dtype, np.floating):
+                raise ValueError(
+                    f"out must be a float array of shape ({n_pairs},), got {out.dtype} {out.shape}."
+                )
+
+            max_workers = max_workers or os.cpu_count()
+            max_in_flight = max_in_flight or 2 * max_workers
+            collect_stats = batch_stats(profiler, monitor)
+            if profiler:
+                profiler.start_compute()
+            if monitor:
+                monitor.start(n_pairs, shared_memory_bytes=shared_data.nbytes)
+
+            owns_executor = executor is None
+            if owns_executor:
+                executor = create_executor(backend, max_workers)
+            try:
+                ranges = (
+                    (start, min(start + batch_size, n_pairs))
+                    for start in range(0, n_pairs, batch_size)
+                )
+                args = (
+                    *shared_data.sources,
+                    ties_method,
+                    smoothing,
+                    ks_stat_method,
+                    shared_data.data1_shape,
+                    shared_data.data2_shape,
+                    shared_data.dtype,
+                    collect_stats,
+                )
+                for (start, stop), weights in self.submit_bounded(
+                    executor,
+                    self.compute_condensed_range,
+                    ranges,
+                    args,
+                    max_in_flight,
+                    stage,
+                ):
+                    if collect_stats:
+                        weights, snapshot = weights
+                    if profiler:
+                        profiler.add_batch(snapshot, received=time.time())
+                    if monitor:
+                        monitor.record_batch(
+                            len(weights), snapshot["pid"], snapshot["end"]
+                        )
+                    with stage("result_collection"):
+                        out[start:stop] = weights
+            finally:
+                if owns_executor:
+                    executor.shutdown()
+                if profiler:
+                    profiler.end_compute()
+                if monitor:
+                    monitor.stop()
+        finally:
+            if owns_shared_data:
+                with stage("shared_memory_cleanup"):
+                    shared_data.close()
+
+        return out
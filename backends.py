@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import Executor, Future
+
+BACKENDS = ["processes", "threads", "serial"]
+
+# Estimated work of a run (pairs times squared sample count, the cost of the empirical copulas) below which
+# starting worker processes and publishing the data costs more than computing the pairs in this process
+SERIAL_MAX_WORK = 20_000_000
+# Sample count from which the copula kernel spends most of its time in NumPy operations that release the GIL,
+# so that threads scale without the start-up and pickling costs of processes
+THREADS_MIN_SAMPLES = 1000
+
+
+class SerialExecutor(Executor):
+    """
+    Runs every submitted task immediately in the calling thread. Has the interface of the pool executors, so
+    that small inputs can be computed without any pool.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def create_executor(backend: str, max_workers: int = None) -> Executor:
+    """
+    Creates the executor of a backend: a process pool, a thread pool or a serial executor.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    # The pools are imported here, the CLI imports this module for BACKENDS and has to start quickly
+    if backend == "processes":
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(max_workers=max_workers)
+    if backend == "threads":
+        from concurrent.futures import ThreadPoolExecutor
+
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if backend == "serial":
+        return SerialExecutor()
+    raise ValueError(f"Unknown backend {backend}, expected one of {', '.join(BACKENDS)}.")
+
+
+def choose_backend(n_pairs: int, n_samples: int, max_workers: int = None) -> str:
+    """
+    Chooses the backend for a run from its size: small runs are computed serially, runs on many samples in
+    threads and everything else in worker processes.
+
+    Args:
+        n_pairs (int): Number of gene pairs.
+        n_samples (int): Largest number of samples of both conditions.
+        max_workers (int): Number of workers. Defaults to the number of CPUs.
+    """
+    max_workers = max_workers or os.cpu_count()
+    if max_workers == 1 or n_pairs * n_samples**2 <= SERIAL_MAX_WORK:
+        return "serial"
+    if n_samples >= THREADS_MIN_SAMPLES:
+        return "threads"
+    return "processes"
@@ -0,0 +1,382 @@
+import collections
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import yaml
+from tqdm import tqdm
+
+from analyzer import CONDITION_LABEL
+from backends import create_executor
+from multi_condition import MultiConditionAnalyzer
+from pipeline import read_expression_files, warm_up
+
+# Options of a job in the manifest with their defaults, None marks required options
+JOB_OPTIONS = {
+    "name": None,
+    "input_file_1": None,
+    "input_file_2": None,
+    "output_path": None,
+    "output_format": "tsv",
+    "ties_method": "average",
+    "smoothing": "none",
+    "ks_stat_method": "asymp",
+}
+JOB_CHOICES = {
+    "output_format": ["tsv", "tsv.gz"],
+    "ties_method": ["average", "max"],
+    "smoothing": ["none", "beta", "checkerboard"],
+    "ks_stat_method": ["asymp", "auto", "exact"],
+}
+
+
+def read_manifest(path: str) -> list:
+    """
+    Reads the jobs of a batch from a YAML manifest: a list `jobs` with the input files, the output path and
+    optionally the name and the computation options of every job, and optional `defaults` for all jobs:
+
+        defaults:
+          smoothing: beta
+        jobs:
+          - name: brca
+            input_file_1: data/BRCA_normal.tsv
+            input_file_2: data/BRCA_tumor.tsv
+            output_path: out/brca
+
+    Returns:
+        list: One dictionary per job with all keys of JOB_OPTIONS. Jobs without a name are called job1, job2...
+
+    Raises:
+        ValueError: If the manifest has no jobs, a job misses a required option, has an unknown option or an
+                    unsupported value, or two jobs share a name or an output path.
+    """
+    with open(path) as file:
+        manifest = yaml.safe_load(file) or {}
+    if not isinstance(manifest, dict) or not manifest.get("jobs"):
+        raise ValueError(f"The manifest {path} must contain a non-empty list of jobs.")
+    defaults = manifest.get("defaults") or {}
+    if not isinstance(defaults, dict):
+        raise ValueError(f"The defaults of {path} must be a mapping of options.")
+
+    jobs = []
+    for number, entry in enumerate(manifest["jobs"], start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Job {number} of {path} must be a mapping of options.")
+        job = {**JOB_OPTIONS, **defaults, **entry}
+        job["name"] = str(entry.get("name") or f"job{number}")
+        unknown = set(job) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(
+                f"Job {job['name']} has unknown options: {', '.join(sorted(unknown))}."
+            )
+        for option, value in job.items():
+            if value is None:
+                raise ValueError(f"Job {job['name']} misses the option {option}.")
+            if option in JOB_CHOICES and value not in JOB_CHOICES[option]:
+                raise ValueError(
+                    f"Job {job['name']} has an unsupported {option} {value!r}, expected one of "
+                    f"{', '.join(JOB_CHOICES[option])}."
+                )
+        jobs.append(job)
+
+    for key in ("name", "output_path"):
+        counts = collections.Counter(job[key] for job in jobs)
+        repeated = [value for value, count in counts.items() if count > 1]
+        if repeated:
+            raise ValueError(
+                f"Jobs must have distinct values of {key}: {', '.join(map(str, repeated))}."
+            )
+    return jobs
+
+
+class SharedInputs:
+    """
+    The expression data of all input files of a batch, each file read and published only once however many
+    jobs use it: in shared memory for worker processes, as arrays for the thread and serial backends. The data
+    is stored as float64 with samples in rows and genes in columns. Has to be released with `close` (or by
+    using it as a context manager).
+    """
+
+    def __init__(self, paths, backend="processes"):
+        """
+        Args:
+            paths (list): Paths of the input files, repeated paths (also through different spellings of the same
+                          file) are read once.
+            backend (str): Execution backend of the workers that read the data.
+        """
+        self.keys = {path: os.path.realpath(path) for path in paths}
+        files = list(dict.fromkeys(self.keys.values()))
+        self.gene_names = {}
+        self.shapes = {}
+        self.arrays = {}
+        self.shms = {}
+        try:
+            for key, df in zip(files, read_expression_files(*files)):
+                self.gene_names[key] = df.iloc[:, 0].values
+                values = np.ascontiguousarray(
+                    df.iloc[:, 1:].values.T, dtype=np.float64
+                )
+                self.shapes[key] = values.shape
+                if backend == "processes":
+                    shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+                    self.shms[key] = shm
+                    np.copyto(np.ndarray(values.shape, buffer=shm.buf), values)
+                else:
+                    self.arrays[key] = values
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def n_files(self):
+        return len(self.gene_names)
+
+    def genes(self, path):
+        return self.gene_names[self.keys[path]]
+
+    def source(self, path):
+        """
+        Returns what the workers need to read a file: its shared memory name or its array, and its shape. See
+        `attach_expression_data`.
+        """
+        key = self.keys[path]
+        source = self.shms[key].name if key in self.shms else self.arrays[key]
+        return source, self.shapes[key]
+
+    def close(self):
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.shms = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def interleave(iterables, width: int):
+    """
+    Yields the items of the iterables round-robin, taking items of at most `width` of them at a time and
+    moving on to the next iterable whenever one is exhausted.
+    """
+    pending = iter(iterables)
+    active = collections.deque(itertools.islice(pending, width))
+    while active:
+        iterable = active.popleft()
+        for item in iterable:
+            yield item
+            active.append(iterable)
+            break
+        else:
+            # The iterable is exhausted, its place goes to the next one
+            active.extend(itertools.islice(pending, 1))
+
+
+class BatchScheduler:
+    """
+    Runs many codc comparisons through one worker pool. The tiles of all jobs go through a single queue that
+    interleaves the tiles of `active_jobs` jobs at a time, so the workers stay busy across the end of one job and
+    the start of the next, and the results of at most that many jobs are held in memory. A job's network is
+    written on a background thread as soon as its last tile arrives.
+    """
+
+    REPORT_COLUMNS = [
+        "name",
+        "n_genes",
+        "pairs",
+        "wall_time",
+        "cpu_time",
+        "pairs_per_sec",
+        "pairs_per_cpu_sec",
+        "network",
+    ]
+
+    def __init__(self, analyzer, batch_size=1000, active_jobs=4):
+        """
+        Args:
+            analyzer (GeneExpressionAnalyzer): The analyzer used to compute the weights of the tiles.
+            batch_size (int): Number of gene pairs per tile.
+            active_jobs (int): Number of jobs whose tiles are interleaved at a time.
+        """
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.active_jobs = active_jobs
+
+    def compute_tile(self, tile, job_args):
+        """
+        Computes the weights of a tile (job, start, stop) of the condensed pair ordering of a job. Runs inside a
+        worker; `job_args` holds the arguments of `compute_condensed_range` of every job.
+
+        Returns:
+            tuple: The weights, the CPU time of the tile and the time at its start and end.
+        """
+        job, start, stop = tile
+        start_time = time.time()
+        cpu_start = time.thread_time()
+        weights = self.analyzer.compute_condensed_range((start, stop), *job_args[job])
+        return weights, time.thread_time() - cpu_start, start_time, time.time()
+
+    def job_tiles(self, job: int, n_pairs: int):
+        for start in range(0, n_pairs, self.batch_size):
+            yield job, start, min(start + self.batch_size, n_pairs)
+
+    def run(
+        self,
+        jobs: list,
+        inputs: SharedInputs,
+        max_workers=None,
+        backend="processes",
+        executor=None,
+        callback=None,
+        verbose=True,
+    ) -> list:
+        """
+        Computes and writes the networks of all jobs.
+
+        Args:
+            jobs (list): The jobs, as returned by `read_manifest`.
+            inputs (SharedInputs): The published input files of all jobs.
+            max_workers (int): Number of workers. Defaults to the number of CPUs.
+            backend (str): Execution backend: 'processes', 'threads' or 'serial'.
+            executor (Executor): An already running executor to submit the tiles to.
+            callback (callable): Called with the report row of every job as soon as it is written.
+            verbose (bool): Whether to print a progress bar.
+
+        Returns:
+            list: One report row per job with the columns listed in `REPORT_COLUMNS`, in the order in which the
+                  jobs finished.
+
+        Raises:
+            ValueError: If the input files of a job contain different genes.
+        """
+        job_args, n_pairs = [], []
+        for job in jobs:
+            genes = inputs.genes(job["input_file_1"])
+            if not np.array_equal(genes, inputs.genes(job["input_file_2"])):
+                raise ValueError(
+                    f"The input files of job {job['name']} contain different genes."
+                )
+            source1, shape1 = inputs.source(job["input_file_1"])
+            source2, shape2 = inputs.source(job["input_file_2"])
+            job_args.append(
+                (
+                    source1,
+                    source2,
+                    job["ties_method"],
+                    job["smoothing"],
+                    job["ks_stat_method"],
+                    shape1,
+                    shape2,
+                    np.float64,
+                )
+            )
+            n_pairs.append(len(genes) * (len(genes) - 1) // 2)
+
+        max_workers = max_workers or os.cpu_count()
+        weights = {}
+        stats = collections.defaultdict(
+            lambda: {"cpu": 0.0, "start": np.inf, "end": -np.inf}
+        )
+        remaining = [-(-count // self.batch_size) for count in n_pairs]
+        rows, writes = [], collections.deque()
+
+        def finish(job):
+            writes.append(
+                writer.submit(
+                    self.write_job,
+                    jobs[job],
+                    weights.pop(job, np.empty(0)),
+                    inputs,
+                    stats.pop(job, None),
+                )
+            )
+
+        def report(block=False):
+            # Reporting the written jobs in the order in which they finished
+            while writes and (block or writes[0].done()):
+                row = writes.popleft().result()
+                rows.append(row)
+                if callback:
+                    callback(row)
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = create_executor(backend, max_workers)
+            if backend == "processes":
+                warm_up(executor, max_workers)
+        writer = ThreadPoolExecutor(max_workers=1)
+        try:
+            for job, count in enumerate(remaining):
+                if count == 0:
+                    finish(job)
+            tiles = interleave(
+                (self.job_tiles(job, count) for job, count in enumerate(n_pairs)),
+                self.active_jobs,
+            )
+            progress = tqdm(
+                total=sum(remaining),
+                desc="Computing jobs",
+                unit="batch",
+                disable=not verbose,
+            )
+            for (job, start, stop), result in self.analyzer.submit_bounded(
+                executor, self.compute_tile, tiles, (job_args,), 2 * max_workers
+            ):
+                tile_weights, cpu, start_time, end_time = result
+                if job not in weights:
+                    weights[job] = np.empty(n_pairs[job])
+                weights[job][start:stop] = tile_weights
+                job_stats = stats[job]
+                job_stats["cpu"] += cpu
+                job_stats["start"] = min(job_stats["start"], start_time)
+                job_stats["end"] = max(job_stats["end"], end_time)
+                remaining[job] -= 1
+                if remaining[job] == 0:
+                    finish(job)
+                report()
+                progress.update(1)
+            progress.close()
+            report(block=True)
+        finally:
+            writer.shutdown()
+            if owns_executor:
+                executor.shutdown()
+        return rows
+
+    @staticmethod
+    def write_job(job: dict, weights: np.ndarray, inputs: SharedInputs, job_stats) -> dict:
+        """
+        Writes the network of a finished job to `network.<output_format>` in its output path.
+
+        Returns:
+            dict: The report row of the job.
+        """
+        gene_names = inputs.genes(job["input_file_1"])
+        network_df = MultiConditionAnalyzer.to_network(
+            weights, gene_names, CONDITION_LABEL
+        )
+        # Pairs that failed are left out, as in codc
+        network_df = network_df[network_df["Weight"].notna()]
+        os.makedirs(job["output_path"], exist_ok=True)
+        network_path = os.path.join(
+            job["output_path"], f"network.{job['output_format']}"
+        )
+        network_df.to_csv(network_path, sep="\t", index=False, header=True)
+
+        wall_time = job_stats["end"] - job_stats["start"] if job_stats else 0.0
+        cpu_time = job_stats["cpu"] if job_stats else 0.0
+        return {
+            "name": job["name"],
+            "n_genes": len(gene_names),
+            "pairs": len(network_df),
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "pairs_per_sec": len(network_df) / wall_time if wall_time else 0.0,
+            "pairs_per_cpu_sec": len(network_df) / cpu_time if cpu_time else 0.0,
+            "network": network_path,
+        }
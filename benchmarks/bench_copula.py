@@ -0,0 +1,151 @@
+"""
+Benchmarks for the copula pipeline.
+
+Every class follows the asv conventions: ``params``/``param_names`` describe the sweep, ``setup`` and
+``teardown`` are called around each parameter combination and every ``time_*`` method is one timed benchmark.
+The classes can therefore be run by asv directly, or by the bundled ``benchmarks/run.py`` runner.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from grid_copula import GridCopula
+
+
+def make_expression_frame(n_genes, n_samples, seed=0):
+    """
+    Builds a gene expression DataFrame in the CLI input layout (gene names in the first column,
+    one column per sample) filled with log-normal values.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(mean=1.0, sigma=1.0, size=(n_genes, n_samples))
+    df = pd.DataFrame(values, columns=[f"Sample{k}" for k in range(n_samples)])
+    df.insert(0, "Gene", [f"Gene{g}" for g in range(n_genes)])
+    return df
+
+
+class PseudoObservations:
+    params = [[50, 200, 1000]]
+    param_names = ["n_samples"]
+
+    def setup(self, n_samples):
+        self.copula = EmpiricalCopula()
+        self.data = np.random.default_rng(0).lognormal(size=(n_samples, 2))
+
+    def time_pseudo_observations(self, n_samples):
+        self.copula.pseudo_observations(self.data, "average")
+
+
+class EmpiricalDistributionFunction:
+    params = [[50, 200, 1000]]
+    param_names = ["n_samples"]
+
+    def setup(self, n_samples):
+        self.copula = EmpiricalCopula()
+        data = np.random.default_rng(0).lognormal(size=(n_samples, 2))
+        self.u = self.copula.pseudo_observations(data, "average")
+
+    def time_empirical_distribution_function(self, n_samples):
+        self.copula.empirical_distribution_function(self.u, self.u)
+
+
+class DominanceCounts:
+    params = [[2, 3, 5], [200, 1000]]
+    param_names = ["n_dimensions", "n_samples"]
+
+    def setup(self, n_dimensions, n_samples):
+        self.copula = EmpiricalCopula()
+        data = np.random.default_rng(0).lognormal(size=(n_samples, n_dimensions))
+        self.u = self.copula.pseudo_observations(data, "average")
+
+    def time_dominance_counts(self, n_dimensions, n_samples):
+        self.copula.dominance_counts(self.u, self.u)
+
+
+class GridPairWeight:
+    params = [[16, 64], [1000, 10000]]
+    param_names = ["grid_size", "n_samples"]
+
+    def setup(self, grid_size, n_samples):
+        copula = EmpiricalCopula()
+        self.grid = GridCopula(grid_size)
+        rng = np.random.default_rng(0)
+        self.bins1, self.bins2 = [
+            self.grid.bin_pseudo_observations(
+                copula.pseudo_observations(rng.lognormal(size=(n_samples, 2)), "average")
+            )
+            for _ in range(2)
+        ]
+
+    def time_grid_pair_weight(self, grid_size, n_samples):
+        self.grid.pair_weight(self.bins1, self.bins2)
+
+
+class Smoothing:
+    params = [["none", "beta", "checkerboard"], [50, 200]]
+    param_names = ["smoothing", "n_samples"]
+
+    def setup(self, smoothing, n_samples):
+        self.copula = EmpiricalCopula()
+        self.data = np.random.default_rng(0).lognormal(size=(n_samples, 2))
+        self.u = self.copula.pseudo_observations(self.data, "average")
+
+    def time_empirical_copula(self, smoothing, n_samples):
+        self.copula.empirical_copula(self.u, self.data, "average", smoothing)
+
+
+class ComputePairs:
+    params = [[20, 100], [50, 200]]
+    param_names = ["n_genes", "n_samples"]
+
+    def setup(self, n_genes, n_samples):
+        self.analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+        rng = np.random.default_rng(0)
+        self.data1 = rng.lognormal(size=(n_samples, n_genes))
+        self.data2 = rng.lognormal(size=(n_samples, n_genes))
+        self.shm1 = shared_memory.SharedMemory(create=True, size=self.data1.nbytes)
+        self.shm2 = shared_memory.SharedMemory(create=True, size=self.data2.nbytes)
+        np.ndarray(self.data1.shape, self.data1.dtype, buffer=self.shm1.buf)[:] = self.data1
+        np.ndarray(self.data2.shape, self.data2.dtype, buffer=self.shm2.buf)[:] = self.data2
+        # A single batch of 100 pairs, the default batch size of the CLI
+        self.indices = [
+            (i, j) for i in range(n_genes - 1) for j in range(i + 1, n_genes)
+        ][:100]
+
+    def teardown(self, n_genes, n_samples):
+        for shm in (self.shm1, self.shm2):
+            shm.close()
+            shm.unlink()
+
+    def time_compute_pairs(self, n_genes, n_samples):
+        self.analyzer.compute_pairs(
+            self.indices,
+            self.shm1.name,
+            self.shm2.name,
+            "average",
+            "none",
+            "asymp",
+            self.data1.shape,
+            self.data2.shape,
+            self.data1.dtype,
+        )
+
+
+class EndToEnd:
+    params = [[20, 50], [50, 200], [1, 2, 4]]
+    param_names = ["n_genes", "n_samples", "workers"]
+    timeout = 600
+
+    def setup(self, n_genes, n_samples, workers):
+        self.analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+        self.df1 = make_expression_frame(n_genes, n_samples, seed=1)
+        self.df2 = make_expression_frame(n_genes, n_samples, seed=2)
+
+    def time_compute_dc_copula_network_parallel(self, n_genes, n_samples, workers):
+        self.analyzer.compute_dc_copula_network_parallel(
+            self.df1, self.df2, max_workers=workers
+        )
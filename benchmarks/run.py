@@ -0,0 +1,237 @@
+"""
+Minimal runner for the asv-style benchmarks in this directory.
+
+Usage (from the project root):
+
+    python -m benchmarks.run --save benchmarks/results/baseline.json
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json --save current.json
+
+Each benchmark is timed with ``timeit`` (auto-ranged so one measurement takes at least ``--min_time``
+seconds) and repeated ``--repeat`` times. Results are written as JSON so they can be compared against a
+saved baseline, in which case the percentage change of the median time is reported for every benchmark.
+"""
+
+import contextlib
+import importlib
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+import click
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+
+def discover_benchmarks(pattern=None):
+    """
+    Collects every ``time_*`` method of every class defined in the ``bench_*.py`` modules.
+
+    Args:
+        pattern (str): Optional regular expression; only benchmarks whose name matches are returned.
+
+    Returns:
+        list: Tuples of (benchmark name, benchmark class, method name).
+    """
+    benchmarks = []
+    for module_path in sorted(BENCHMARK_DIR.glob("bench_*.py")):
+        module = importlib.import_module(f"benchmarks.{module_path.stem}")
+        for class_name, cls in vars(module).items():
+            if not isinstance(cls, type) or cls.__module__ != module.__name__:
+                continue
+            for method_name in sorted(vars(cls)):
+                if not method_name.startswith("time_"):
+                    continue
+                name = f"{module_path.stem}.{class_name}.{method_name}"
+                if pattern is None or re.search(pattern, name):
+                    benchmarks.append((name, cls, method_name))
+    return benchmarks
+
+
+def parameter_grid(cls):
+    """
+    Expands the asv ``params``/``param_names`` attributes of a benchmark class into a list of
+    parameter dictionaries. Classes without parameters yield a single empty combination.
+    """
+    params = getattr(cls, "params", [])
+    if not params:
+        return [{}]
+    if not isinstance(params[0], (list, tuple)):
+        params = [params]
+    names = getattr(cls, "param_names", [f"param{k}" for k in range(len(params))])
+    return [dict(zip(names, values)) for values in itertools.product(*params)]
+
+
+def result_key(name, params):
+    """Returns the identifier used to match a benchmark result against the baseline."""
+    if not params:
+        return name
+    rendered = ",".join(f"{key}={value}" for key, value in params.items())
+    return f"{name}[{rendered}]"
+
+
+def time_benchmark(cls, method_name, params, repeat, min_time):
+    """
+    Times a single benchmark for one parameter combination.
+
+    Returns:
+        dict: Per-call timing statistics in seconds together with the number of calls per measurement.
+    """
+    instance = cls()
+    args = list(params.values())
+    # The pipeline reports progress on stdout/stderr, keep it out of the benchmark output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+        devnull
+    ), contextlib.redirect_stderr(devnull):
+        if hasattr(instance, "setup"):
+            instance.setup(*args)
+        try:
+            timer = timeit.Timer(lambda: getattr(instance, method_name)(*args))
+            number = 1
+            while True:
+                elapsed = timer.timeit(number)
+                if elapsed >= min_time or number >= 1_000_000:
+                    break
+                number *= 10 if elapsed < min_time / 10 else 2
+            samples = [elapsed / number]
+            samples.extend(t / number for t in timer.repeat(repeat - 1, number))
+        finally:
+            if hasattr(instance, "teardown"):
+                instance.teardown(*args)
+
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "number": number,
+        "repeat": len(samples),
+    }
+
+
+def compare_results(current, baseline, threshold=10.0):
+    """
+    Compares two result documents benchmark by benchmark on their median time.
+
+    Args:
+        current (dict): Result document of the current run.
+        baseline (dict): Result document of the saved baseline.
+        threshold (float): Percentage slowdown above which a benchmark is flagged as a regression.
+
+    Returns:
+        list: One dictionary per benchmark present in both documents with the baseline and current median,
+              the percentage change and whether it counts as a regression.
+    """
+    baseline_by_key = {entry["key"]: entry for entry in baseline["results"]}
+    comparison = []
+    for entry in current["results"]:
+        reference = baseline_by_key.get(entry["key"])
+        if reference is None:
+            continue
+        change = (entry["median"] - reference["median"]) / reference["median"] * 100
+        comparison.append(
+            {
+                "key": entry["key"],
+                "baseline": reference["median"],
+                "current": entry["median"],
+                "change_percent": change,
+                "regression": change > threshold,
+            }
+        )
+    return comparison
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds / 1e-9:.1f}ns"
+
+
+@click.command()
+@click.option(
+    "--bench",
+    "-b",
+    type=str,
+    default=None,
+    help="Regular expression selecting the benchmarks to run.",
+)
+@click.option(
+    "--repeat", type=int, default=5, help="Number of measurements per benchmark."
+)
+@click.option(
+    "--min_time",
+    type=float,
+    default=0.2,
+    help="Minimum duration in seconds of a single measurement.",
+)
+@click.option(
+    "--save", type=str, default=None, help="Path of the JSON file to write results to."
+)
+@click.option(
+    "--baseline",
+    type=str,
+    default=None,
+    help="Path of a previously saved JSON result file to compare against.",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=10.0,
+    help="Slowdown in percent above which a benchmark is reported as a regression.",
+)
+@click.option(
+    "--fail_on_regression",
+    is_flag=True,
+    default=False,
+    help="Exit with a non-zero status if any regression is detected.",
+)
+def main(bench, repeat, min_time, save, baseline, threshold, fail_on_regression):
+    """Run the benchmark suite and optionally compare it against a saved baseline."""
+    document = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": [],
+    }
+
+    for name, cls, method_name in discover_benchmarks(bench):
+        for params in parameter_grid(cls):
+            key = result_key(name, params)
+            stats = time_benchmark(cls, method_name, params, repeat, min_time)
+            document["results"].append(
+                {"key": key, "name": name, "params": params, **stats}
+            )
+            print(f"{key:<90} {format_seconds(stats['median']):>12}", flush=True)
+
+    if save:
+        Path(save).parent.mkdir(parents=True, exist_ok=True)
+        with open(save, "w") as file:
+            json.dump(document, file, indent=2)
+        print(f"Saved benchmark results to {save}")
+
+    if baseline:
+        with open(baseline) as file:
+            comparison = compare_results(document, json.load(file), threshold)
+        print(f"\nComparison against {baseline} (median time):")
+        for row in comparison:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['key']:<90} {format_seconds(row['baseline']):>12} -> "
+                f"{format_seconds(row['current']):>12} {row['change_percent']:+8.1f}%{flag}"
+            )
+        if fail_on_regression and any(row["regression"] for row in comparison):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
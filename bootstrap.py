@@ -0,0 +1,340 @@
+from multiprocessing import shared_memory
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from scipy.stats import rankdata
+
+from analyzer import GeneExpressionAnalyzer
+from backends import create_executor
+from profiling import NullProfiler, batch_profiler
+
+# Upper bound of the elements compared at once per gene pair, bounds the memory of a batch of resamples
+MAX_BATCH_ELEMENTS = 4_000_000
+
+
+def ks_statistics(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Computes the two-sample Kolmogorov-Smirnov statistic of every row of `x` against the same row of `y`, with
+    the same result as the statistic of `scipy.stats.ks_2samp`.
+
+    Args:
+        x (np.ndarray): Array of shape (batch, n1).
+        y (np.ndarray): Array of shape (batch, n2).
+
+    Returns:
+        np.ndarray: The statistic of every row.
+    """
+    values = np.concatenate([x, y], axis=1)
+    cdf_x = np.sum(x[:, :, None] <= values[:, None, :], axis=1) / x.shape[1]
+    cdf_y = np.sum(y[:, :, None] <= values[:, None, :], axis=1) / y.shape[1]
+    return np.max(np.abs(cdf_x - cdf_y), axis=1)
+
+
+class SharedBootstrapSamples:
+    """
+    The expression data of both conditions and the drawn bootstrap resamples, published in shared memory. The
+    samples of every condition are resampled with replacement up front, but the pseudo-observations of the
+    resamples are computed by the workers for the genes of their tile only. The shared memory therefore stays
+    the size of the input data (plus one sample index per sample and resample) whatever the number of
+    resamples, instead of growing to resamples times samples times genes. Has to be released with `close` (or
+    by using it as a context manager).
+    """
+
+    def __init__(self, df1, df2, n_bootstraps, ties_method="average", seed=0):
+        """
+        Args:
+            df1 (pd.DataFrame): Expression data of the first condition, gene names in the first column.
+            df2 (pd.DataFrame): Expression data of the second condition, with the same genes as `df1`.
+            n_bootstraps (int): Number of resamples.
+            ties_method (str): Ranking method for ties within pseudo-observations.
+            seed (int): Seed of the random number generator drawing the resamples.
+        """
+        self.gene_names = df1.iloc[:, 0].values
+        assert np.array_equal(
+            self.gene_names, df2.iloc[:, 0].values
+        ), "Gene lists must match!"
+
+        rng = np.random.default_rng(seed)
+        self.ties_method = ties_method
+        self.resamples = []
+        arrays = []
+        for df in (df1, df2):
+            # Samples in rows and genes in columns
+            data = np.ascontiguousarray(df.iloc[:, 1:].values.T, dtype=np.float64)
+            n_samples = len(data)
+            self.resamples.append(
+                rng.integers(0, n_samples, size=(n_bootstraps, n_samples))
+            )
+            arrays.append(data)
+        arrays.extend(self.resamples)
+
+        # The data of both conditions, then the resamples of both conditions
+        self.shms = []
+        self.shapes = []
+        try:
+            for array in arrays:
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.shms.append(shm)
+                np.copyto(np.ndarray(array.shape, array.dtype, buffer=shm.buf), array)
+                self.shapes.append(array.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def n_genes(self):
+        return len(self.gene_names)
+
+    @property
+    def n_bootstraps(self):
+        return len(self.resamples[0])
+
+    @property
+    def nbytes(self):
+        return sum(shm.size for shm in self.shms)
+
+    def close(self):
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BootstrapAnalyzer:
+    """
+    Estimates the stability of every edge from the weight distribution over bootstrap resamples, in a single
+    run. Every task computes a tile of gene pairs, and all resamples of a pair are computed together with
+    batched copula and Kolmogorov-Smirnov kernels instead of one call per resample.
+    """
+
+    COLUMNS = [
+        "Target",
+        "Regulator",
+        "BootstrapMean",
+        "BootstrapStd",
+        "CILower",
+        "CIUpper",
+        "SelectionFrequency",
+    ]
+
+    def __init__(self, empirical_copula):
+        """
+        Args:
+            empirical_copula (EmpiricalCopula): Used to compute the empirical copulas.
+        """
+        self.empirical_copula = empirical_copula
+
+    def resampled_weights(self, u1: np.ndarray, u2: np.ndarray, smoothing="none") -> np.ndarray:
+        """
+        Computes the weight of one gene pair for every resample.
+
+        Args:
+            u1 (np.ndarray): Pseudo-observations of the pair in the first condition, shape (resamples, n1, 2).
+            u2 (np.ndarray): Pseudo-observations of the pair in the second condition, shape (resamples, n2, 2).
+
+        Returns:
+            np.ndarray: The weight of every resample.
+        """
+        if smoothing == "none":
+            ec1 = self.empirical_copula.batched_empirical_distribution_function(u1, u1)
+            ec2 = self.empirical_copula.batched_empirical_distribution_function(u2, u2)
+        else:
+            ec1 = np.array(
+                [self.empirical_copula.pseudo_observations_copula(u, u, smoothing) for u in u1]
+            )
+            ec2 = np.array(
+                [self.empirical_copula.pseudo_observations_copula(u, u, smoothing) for u in u2]
+            )
+        return ks_statistics(ec1, ec2)
+
+    def compute_tile(
+        self,
+        bounds,
+        shm_names,
+        shapes,
+        ties_method,
+        smoothing,
+        threshold,
+        confidence_level,
+        profile=False,
+    ):
+        """
+        Computes the bootstrap statistics of the gene pairs at the positions [start, stop) of the condensed pair
+        ordering. Runs inside a worker process and reads the expression data and the resamples from shared
+        memory. The pseudo-observations of the genes of the tile are computed for a chunk of resamples at a
+        time, so the memory of a tile does not grow with the number of resamples.
+
+        Returns:
+            np.ndarray: Array of shape (5, stop - start) with the mean, standard deviation, lower and upper
+                        confidence bound and selection frequency of every pair, NaN for pairs that failed. If
+                        `profile` is set, a tuple of the statistics and the profiler snapshot of the tile.
+        """
+        profiler = batch_profiler(profile)
+
+        with profiler.stage("attach_shared_memory"):
+            shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+            data1, data2, resamples1, resamples2 = [
+                np.ndarray(shape, dtype, buffer=shm.buf)
+                for shape, dtype, shm in zip(
+                    shapes, (np.float64, np.float64, np.int64, np.int64), shms
+                )
+            ]
+
+        n_bootstraps = len(resamples1)
+        n_samples = max(len(data1), len(data2))
+        # Resamples computed at once, so that a batch compares at most MAX_BATCH_ELEMENTS points
+        chunk = max(1, MAX_BATCH_ELEMENTS // (2 * n_samples * n_samples))
+        alpha = (1 - confidence_level) / 2
+
+        start, stop = bounds
+        pairs = GeneExpressionAnalyzer.condensed_to_pairs(
+            np.arange(start, stop), data1.shape[1]
+        )
+        genes, pair_columns = np.unique(pairs, return_inverse=True)
+        pair_columns = pair_columns.reshape(pairs.shape)
+        tile_data = [data1[:, genes], data2[:, genes]]
+
+        weights = np.empty((len(pairs), n_bootstraps))
+        failed = np.zeros(len(pairs), dtype=bool)
+        for b in range(0, n_bootstraps, chunk):
+            with profiler.stage("pseudo_observations"):
+                # Shape (resamples, samples, genes of the tile)
+                pseudo_observations1, pseudo_observations2 = [
+                    rankdata(data[resamples[b : b + chunk]], method=ties_method, axis=1)
+                    / (len(data) + 1)
+                    for data, resamples in zip(tile_data, (resamples1, resamples2))
+                ]
+            with profiler.stage("bootstrap_kernel"):
+                for k, columns in enumerate(pair_columns):
+                    if failed[k]:
+                        continue
+                    try:
+                        weights[k, b : b + chunk] = self.resampled_weights(
+                            pseudo_observations1[:, :, columns],
+                            pseudo_observations2[:, :, columns],
+                            smoothing,
+                        )
+                    except Exception as e:
+                        i, j = pairs[k]
+                        print(f"Error processing pair ({i}, {j}): {e}")
+                        failed[k] = True
+
+        statistics = np.full((5, len(pairs)), np.nan)
+        with profiler.stage("bootstrap_statistics"):
+            for k in np.flatnonzero(~failed):
+                lower, upper = np.quantile(weights[k], [alpha, 1 - alpha])
+                statistics[:, k] = (
+                    weights[k].mean(),
+                    weights[k].std(ddof=1) if n_bootstraps > 1 else 0.0,
+                    lower,
+                    upper,
+                    np.mean(weights[k] >= threshold),
+                )
+
+        del data1, data2, resamples1, resamples2, tile_data
+        for shm in shms:
+            shm.close()
+
+        if profiler.enabled:
+            profiler.pairs = len(pairs)
+            return statistics, profiler.snapshot()
+        return statistics
+
+    def compute_edge_stability(
+        self,
+        shared_samples,
+        smoothing="none",
+        threshold=0.5,
+        confidence_level=0.95,
+        batch_size=100,
+        max_workers=None,
+        executor=None,
+        max_in_flight=None,
+        profiler=None,
+        verbose=True,
+        backend="processes",
+    ) -> pd.DataFrame:
+        """
+        Computes the bootstrap statistics of every gene pair.
+
+        Args:
+            shared_samples (SharedBootstrapSamples): The resampled pseudo-observations of both conditions.
+            smoothing (str): Smoothing applied to the empirical copula: 'none', 'beta' or 'checkerboard'.
+            threshold (float): Weight above which an edge counts as selected in a resample.
+            confidence_level (float): Confidence level of the percentile confidence interval.
+            batch_size (int): Number of gene pairs per tile.
+            max_workers (int): Number of workers. Defaults to the number of CPUs.
+            executor (Executor): An already running executor to submit the tiles to.
+            max_in_flight (int): Maximum number of tiles submitted at any time. Defaults to twice the number of
+                                 workers.
+            profiler (RunProfiler): If given, the time spent in every stage is recorded into it.
+            verbose (bool): Whether to print a progress bar.
+            backend (str): Runs the tiles in worker 'processes', in 'threads' of this process or 'serial' in
+                           the calling thread. All of them read the samples from shared memory.
+
+        Returns:
+            pd.DataFrame: One row per gene pair with the columns listed in `COLUMNS`.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
+        gene_names = shared_samples.gene_names
+        n_pairs = shared_samples.n_genes * (shared_samples.n_genes - 1) // 2
+        max_workers = max_workers or os.cpu_count()
+        max_in_flight = max_in_flight or 2 * max_workers
+        collect_stats = profiler is not None
+
+        statistics = np.empty((5, n_pairs))
+        owns_executor = executor is None
+        if owns_executor:
+            executor = create_executor(backend, max_workers)
+        try:
+            progress = tqdm(
+                total=-(-n_pairs // batch_size),
+                desc=f"Bootstrapping ({shared_samples.n_bootstraps} resamples)",
+                unit="batch",
+                disable=not verbose,
+            )
+            tiles = (
+                (start, min(start + batch_size, n_pairs))
+                for start in range(0, n_pairs, batch_size)
+            )
+            args = (
+                [shm.name for shm in shared_samples.shms],
+                shared_samples.shapes,
+                shared_samples.ties_method,
+                smoothing,
+                threshold,
+                confidence_level,
+                collect_stats,
+            )
+            for (start, stop), tile_statistics in GeneExpressionAnalyzer.submit_bounded(
+                executor, self.compute_tile, tiles, args, max_in_flight, stage
+            ):
+                if collect_stats:
+                    tile_statistics, snapshot = tile_statistics
+                    profiler.add_batch(snapshot, received=time.time())
+                with stage("result_collection"):
+                    statistics[:, start:stop] = tile_statistics
+                progress.update(1)
+            progress.close()
+        finally:
+            if owns_executor:
+                executor.shutdown()
+
+        pairs = GeneExpressionAnalyzer.condensed_to_pairs(np.arange(n_pairs), len(gene_names))
+        return pd.DataFrame(
+            dict(
+                zip(
+                    self.COLUMNS,
+                    [gene_names[pairs[:, 1]], gene_names[pairs[:, 0]], *statistics],
+                )
+            )
+        )
@@ -1,14 +1,14 @@
 import subprocess
 
-import time
-import pandas as pd
-import csv
+import json
+import os
 
-import pandas as pd
 import click
 
-from analyzer import GeneExpressionAnalyzer
-from copula.empirical_copula import EmpiricalCopula
+from backends import BACKENDS
+
+# pandas, numpy, scipy and the modules of the computation take several hundred milliseconds to import. They are
+# imported inside the commands that need them, so that `--help` and commands like `r-performance` start quickly.
 
 
 class CustomFormatter(click.HelpFormatter):
@@ -19,6 +19,58 @@ class CustomFormatter(click.HelpFormatter):
                 self.write_wrapped_text(text)
 
 
+class BatchSize(click.ParamType):
+    """
+    A positive batch size, or 'auto' to choose it from a calibration run.
+    """
+
+    name = "batch_size"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int) or value == "auto":
+            return value
+        try:
+            batch_size = int(value)
+        except ValueError:
+            self.fail(f"{value!r} is neither an integer nor 'auto'.", param, ctx)
+        if batch_size < 1:
+            self.fail("The batch size must be positive.", param, ctx)
+        return batch_size
+
+
+class MemorySize(click.ParamType):
+    """
+    A memory size in bytes, given as a number with an optional unit such as 512M or 4G.
+    """
+
+    name = "memory_size"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+        from tuning import parse_memory_size
+
+        try:
+            return parse_memory_size(value)
+        except ValueError as e:
+            self.fail(str(e), param, ctx)
+
+
+def parse_conditions(ctx, param, values):
+    """
+    Parses the NAME=PATH values of the --condition option into a dictionary.
+    """
+    conditions = {}
+    for value in values:
+        name, separator, path = value.partition("=")
+        if not separator or not name or not path:
+            raise click.BadParameter(f"{value!r} is not of the form NAME=PATH.")
+        if name in conditions:
+            raise click.BadParameter(f"The condition {name} is given more than once.")
+        conditions[name] = path
+    return conditions
+
+
 @click.group()
 @click.pass_context
 def cli(ctx):
@@ -45,20 +97,34 @@ def cli(ctx):
 @click.option(
     "--input_file_1",
     type=str,
-    required=True,
+    default=None,
     help="Path to the TSV file containing gene expression data.",
 )
 @click.option(
     "--input_file_2",
     type=str,
-    required=True,
+    default=None,
     help="Path to the TSV file containing gene expression data.",
 )
+@click.option(
+    "--condition",
+    "conditions",
+    type=str,
+    multiple=True,
+    callback=parse_conditions,
+    help="A condition as NAME=PATH to a TSV file, given two or more times instead of --input_file_1 and --input_file_2 to compare several conditions in one run.",
+)
+@click.option(
+    "--reference",
+    type=str,
+    default=None,
+    help="With --condition, compare every condition against this one instead of all conditions against each other.",
+)
 @click.option(
     "--output_path",
     type=str,
     required=True,
-    help="Output path to store the resulting TSV file containing the differential coexpression network. The file name will be network.tsv",
+    help="Output path to store the resulting TSV file containing the differential coexpression network. The file name will be network.tsv (network_A_vs_B.tsv per comparison with --condition)",
 )
 @click.option(
     "--ties_method",
@@ -80,18 +146,162 @@ def cli(ctx):
 )
 @click.option(
     "--batch_size",
-    type=click.INT,
+    type=BatchSize(),
     default=100,
-    help="Batch size to perform the calculation in parallel.",
+    help="Batch size to perform the calculation in parallel, or 'auto' to choose it from a short calibration run.",
+)
+@click.option(
+    "--workers",
+    type=click.INT,
+    default=0,
+    help="Number of worker processes, 0 uses the number of CPUs. With --batch_size auto or --memory_limit this is an upper bound.",
+)
+@click.option(
+    "--memory_limit",
+    type=MemorySize(),
+    default=None,
+    help="Budget for the total memory of the run, e.g. 8G. The number of workers (and with --batch_size auto the batch size) is chosen to stay within it.",
+)
+@click.option(
+    "--metrics_file",
+    type=str,
+    default=None,
+    help="Periodically write machine-readable progress (pairs done, pairs/sec, ETA, worker heartbeats, memory) to this file.",
+)
+@click.option(
+    "--metrics_format",
+    type=click.Choice(["jsonl", "prometheus"]),
+    default="jsonl",
+    help="Format of the metrics file: appended JSON lines, or a Prometheus textfile that is replaced on every write.",
+)
+@click.option(
+    "--metrics_interval",
+    type=float,
+    default=10.0,
+    help="Seconds between two writes of the metrics file.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Record the time spent in every stage of the run and save it as profile.json in the output path.",
+)
+@click.option(
+    "--sparse_threshold",
+    type=float,
+    default=None,
+    help="Additionally save the edges with at least this weight as sparse CSR adjacency network.npz with the gene index network_genes.tsv.",
+)
+@click.option(
+    "--bootstraps",
+    type=int,
+    default=0,
+    help="Number of bootstrap resamples of the samples of every condition. If given, the mean, confidence interval and selection frequency of every edge are saved as edge_stability.tsv.",
+)
+@click.option(
+    "--bootstrap_threshold",
+    type=float,
+    default=0.5,
+    help="Weight above which an edge counts as selected in a bootstrap resample.",
+)
+@click.option(
+    "--confidence_level",
+    type=float,
+    default=0.95,
+    help="Confidence level of the bootstrap percentile confidence intervals.",
+)
+@click.option("--seed", type=int, default=0, help="Seed of the bootstrap resampling.")
+@click.option(
+    "--pipeline",
+    is_flag=True,
+    default=False,
+    help="Overlap loading, computing and writing: read both inputs concurrently, start the workers while loading and write the network batch by batch on a background thread.",
+)
+@click.option(
+    "--output_format",
+    type=click.Choice(["tsv", "tsv.gz", "npy"]),
+    default="tsv",
+    help="Format of the network file: network.tsv, gzip-compressed network.tsv.gz, or network.npy, a memory-mapped condensed float32 weight vector that the workers write into directly.",
+)
+@click.option(
+    "--eval_grid",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Evaluate the empirical copulas on a G x G grid instead of at every sample, approximating the weights in O(n + G^2) per pair for large sample counts.",
+)
+@click.option(
+    "--deduplicate",
+    is_flag=True,
+    default=False,
+    help="Compute the pairs of genes with identical ranks in both conditions (e.g. all-zero genes) only once and copy their weights to all member genes.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["auto"] + BACKENDS),
+    default="auto",
+    help="Run the batches in worker processes, in threads of this process or serially. auto chooses from the number of pairs and samples.",
+)
+@click.option(
+    "--aggregate",
+    type=click.Choice(["genes"]),
+    default=None,
+    help="Write per-gene aggregates of the weights (gene_aggregates.tsv) instead of the network. The workers fold the weights of every batch, so no edges are kept.",
+)
+@click.option(
+    "--aggregate_threshold",
+    type=float,
+    default=0.0,
+    help="Minimum weight of the pairs counted in the Degree and WeightedDegree of --aggregate genes.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="With --output_format npy, continue an interrupted run in the output path instead of starting over.",
+)
+@click.option(
+    "--index",
+    is_flag=True,
+    default=False,
+    help="Additionally write the network gene by gene to network_index/, a memory-mapped CSR layout from which codc query reads the edges of single genes.",
+)
+@click.option(
+    "--index_threshold",
+    type=float,
+    default=0.0,
+    help="Minimum weight of the edges written to the index of --index.",
 )
 def calculate_codc(
     input_file_1,
     input_file_2,
+    conditions,
+    reference,
     output_path,
     ties_method,
     smoothing,
     ks_stat_method,
     batch_size,
+    workers,
+    memory_limit,
+    metrics_file,
+    metrics_format,
+    metrics_interval,
+    profile,
+    sparse_threshold,
+    bootstraps,
+    bootstrap_threshold,
+    confidence_level,
+    seed,
+    pipeline,
+    output_format,
+    eval_grid,
+    deduplicate,
+    backend,
+    aggregate,
+    aggregate_threshold,
+    resume,
+    index,
+    index_threshold,
 ):
     """
     Compute a network of differential coexpression scores using the
@@ -99,28 +309,490 @@ def calculate_codc(
     helps in assessing the similarity in joint gene expression distributions
     between two conditions.
     """
-    # Loading data from TSV files
-    df1 = pd.read_csv(input_file_1, delimiter="\t")
-    df2 = pd.read_csv(input_file_2, delimiter="\t")
+    import numpy as np
+    import pandas as pd
 
-    # Initializing the EmpiricalCopula and GeneExpressionAnalyzer instances
-    empirical_copula = EmpiricalCopula()
-    analyzer = GeneExpressionAnalyzer(empirical_copula=empirical_copula)
+    from analyzer import (
+        CONDITION_LABEL,
+        PAIR_RESULT_DTYPE,
+        GeneExpressionAnalyzer,
+        expression_data_class,
+    )
+    from backends import choose_backend, create_executor
+    from copula.empirical_copula import EmpiricalCopula
+    from monitoring import ProgressMonitor
+    from profiling import NullProfiler, RunProfiler
+    from tuning import BatchTuner, format_memory_size
 
-    # Computing the network using the specified methods
-    network_df = analyzer.compute_dc_copula_network_parallel(
-        df1,
-        df2,
-        ties_method=ties_method,
-        smoothing=smoothing,
-        ks_stat_method=ks_stat_method,
-        batch_size=batch_size,
+    if deduplicate:
+        from deduplication import GeneClasses
+    if pipeline:
+        from pipeline import NetworkWriter, read_expression_files, warm_up
+
+    if conditions:
+        if input_file_1 or input_file_2:
+            raise click.UsageError(
+                "Use either --condition or --input_file_1 and --input_file_2."
+            )
+        if len(conditions) < 2:
+            raise click.UsageError("At least two conditions are required.")
+        if batch_size == "auto" or memory_limit is not None:
+            raise click.UsageError(
+                "--batch_size auto and --memory_limit are not supported with --condition."
+            )
+        if bootstraps:
+            raise click.UsageError("--bootstraps is not supported with --condition.")
+        if pipeline:
+            raise click.UsageError("--pipeline is not supported with --condition.")
+        if output_format != "tsv":
+            # The networks of all comparisons are written as plain TSV
+            raise click.UsageError(
+                f"--output_format {output_format} is not supported with --condition."
+            )
+    elif not (input_file_1 and input_file_2):
+        raise click.UsageError(
+            "Missing option --input_file_1 and --input_file_2 (or give --condition)."
+        )
+    elif reference:
+        raise click.UsageError("--reference requires --condition.")
+    if deduplicate and (conditions or pipeline or eval_grid):
+        raise click.UsageError(
+            "--deduplicate is not supported with --condition, --pipeline or --eval_grid."
+        )
+    if eval_grid:
+        if conditions or pipeline:
+            raise click.UsageError(
+                "--eval_grid is not supported with --condition or --pipeline."
+            )
+        if smoothing != "none":
+            raise click.UsageError("--eval_grid requires --smoothing none.")
+        if batch_size == "auto" or memory_limit is not None:
+            raise click.UsageError(
+                "--batch_size auto and --memory_limit are not supported with --eval_grid."
+            )
+    if aggregate and (
+        conditions or pipeline or eval_grid or deduplicate or sparse_threshold is not None
+    ):
+        raise click.UsageError(
+            "--aggregate is not supported with --condition, --pipeline, --eval_grid, --deduplicate or "
+            "--sparse_threshold."
+        )
+    if aggregate and (batch_size == "auto" or memory_limit is not None):
+        raise click.UsageError(
+            "--batch_size auto and --memory_limit are not supported with --aggregate."
+        )
+    if output_format == "npy" and (
+        conditions or pipeline or eval_grid or deduplicate or aggregate
+    ):
+        raise click.UsageError(
+            "--output_format npy is not supported with --condition, --pipeline, --eval_grid, --deduplicate "
+            "or --aggregate."
+        )
+    if output_format == "npy" and (batch_size == "auto" or memory_limit is not None):
+        # The tiles of a resumed run must match those of the interrupted one
+        raise click.UsageError(
+            "--batch_size auto and --memory_limit are not supported with --output_format npy."
+        )
+    if resume and output_format != "npy":
+        raise click.UsageError("--resume requires --output_format npy.")
+    if index and (conditions or aggregate):
+        raise click.UsageError("--index is not supported with --condition or --aggregate.")
+    if backend not in ("auto", "processes"):
+        if conditions or eval_grid:
+            raise click.UsageError(
+                f"--backend {backend} is not supported with --condition or --eval_grid."
+            )
+        if batch_size == "auto" or memory_limit is not None:
+            # The calibration runs measure the memory of worker processes
+            raise click.UsageError(
+                f"--backend {backend} is not supported with --batch_size auto or --memory_limit."
+            )
+    if backend == "auto" and (
+        pipeline or batch_size == "auto" or memory_limit is not None
+    ):
+        # The pipelined workers start before the size of the input is known
+        backend = "processes"
+
+    profiler = RunProfiler() if profile else None
+    monitor = (
+        ProgressMonitor(metrics_file, metrics_format, metrics_interval)
+        if metrics_file
+        else None
     )
+    stage = profiler.stage if profiler else NullProfiler().stage
+
+    if conditions:
+        calculate_multi_condition_codc(
+            conditions,
+            reference,
+            output_path,
+            ties_method,
+            smoothing,
+            ks_stat_method,
+            batch_size,
+            workers,
+            sparse_threshold,
+            profiler,
+            monitor,
+        )
+        return
+
+    executor = None
+    try:
+        if pipeline and batch_size != "auto" and memory_limit is None:
+            # Starting the workers while the inputs are loaded
+            executor = create_executor(backend, workers or os.cpu_count())
+            if backend == "processes":
+                warm_up(executor, workers or os.cpu_count())
 
-    # Saving the network to the specified output path
-    output_path = f"{output_path}/network.tsv"
-    network_df.to_csv(output_path, sep="\t", index=False, header=True)
-    print(f"Saved the computed network to {output_path}")
+        # Loading data from TSV files
+        with stage("load_input"):
+            if pipeline:
+                df1, df2 = read_expression_files(input_file_1, input_file_2)
+            else:
+                df1 = pd.read_csv(input_file_1, delimiter="\t")
+                df2 = pd.read_csv(input_file_2, delimiter="\t")
+
+        # Initializing the EmpiricalCopula and GeneExpressionAnalyzer instances
+        empirical_copula = EmpiricalCopula()
+        analyzer = GeneExpressionAnalyzer(empirical_copula=empirical_copula)
+        network_path = f"{output_path}/network.{output_format}"
+
+        if eval_grid:
+            from grid_copula import GridCopulaAnalyzer
+            from multi_condition import MultiConditionAnalyzer, SharedConditions
+
+            with stage("shared_memory_setup"):
+                shared_conditions = SharedConditions(
+                    {"1": df1, "2": df2}, empirical_copula, ties_method
+                )
+            with shared_conditions:
+                weights = GridCopulaAnalyzer(eval_grid).compute_condensed(
+                    shared_conditions,
+                    batch_size=batch_size,
+                    max_workers=workers or None,
+                    profiler=profiler,
+                    monitor=monitor,
+                )
+            with stage("result_collection"):
+                network_df = MultiConditionAnalyzer.to_network(
+                    weights, shared_conditions.gene_names, CONDITION_LABEL
+                )
+        else:
+            if backend == "auto":
+                n_genes = len(df1)
+                backend = choose_backend(
+                    n_genes * (n_genes - 1) // 2,
+                    max(df1.shape[1], df2.shape[1]) - 1,
+                    workers or None,
+                )
+                print(f"Using the {backend} backend")
+            with stage("shared_memory_setup"):
+                shared_data = expression_data_class(backend)(df1, df2)
+
+            with shared_data:
+                if batch_size == "auto" or memory_limit is not None:
+                    # Choosing the batch size and number of workers from a calibration run
+                    try:
+                        tuning = BatchTuner(analyzer).tune(
+                            shared_data,
+                            ties_method=ties_method,
+                            smoothing=smoothing,
+                            ks_stat_method=ks_stat_method,
+                            batch_size=None if batch_size == "auto" else batch_size,
+                            max_workers=workers or None,
+                            memory_limit=memory_limit,
+                        )
+                    except ValueError as e:
+                        raise click.UsageError(str(e))
+                    batch_size, workers = tuning["batch_size"], tuning["workers"]
+                    print(
+                        f"Calibrated {tuning['calibration']['seconds_per_pair'] * 1000:.2f} ms per pair: "
+                        f"using a batch size of {batch_size} with {workers} workers "
+                        f"(estimated memory {format_memory_size(tuning['estimated_memory'])})"
+                    )
+
+                if aggregate:
+                    from aggregation import GeneAggregateAnalyzer
+
+                    aggregates = GeneAggregateAnalyzer(analyzer).compute_aggregates(
+                        shared_data,
+                        threshold=aggregate_threshold,
+                        ties_method=ties_method,
+                        smoothing=smoothing,
+                        ks_stat_method=ks_stat_method,
+                        batch_size=batch_size,
+                        max_workers=workers or None,
+                        profiler=profiler,
+                        monitor=monitor,
+                        backend=backend,
+                    )
+                elif output_format == "npy":
+                    from condensed_store import CondensedStore, CondensedStoreAnalyzer
+
+                    options = {
+                        "ties_method": ties_method,
+                        "smoothing": smoothing,
+                        "ks_stat_method": ks_stat_method,
+                    }
+                    try:
+                        if resume:
+                            store = CondensedStore.resume(
+                                network_path, shared_data.gene_names, batch_size, options
+                            )
+                        else:
+                            store = CondensedStore.create(
+                                network_path, shared_data.gene_names, batch_size, options
+                            )
+                    except ValueError as e:
+                        raise click.UsageError(str(e))
+                    n_tiles = len(store.done)
+                    n_resumed = n_tiles - len(store.pending_tiles())
+                    if n_resumed:
+                        print(f"Resuming {network_path}: {n_resumed} of {n_tiles} batches are done")
+                    CondensedStoreAnalyzer(analyzer).compute_store(
+                        store,
+                        shared_data,
+                        max_workers=workers or None,
+                        profiler=profiler,
+                        monitor=monitor,
+                        backend=backend,
+                    )
+                else:
+                    # Computing the network using the specified methods, in pipelined mode every batch is handed to
+                    # the writer thread as soon as it arrives
+                    pairs, collected = None, []
+                    if deduplicate:
+                        # Computing one pair per pair of distinct rank signatures only
+                        with stage("deduplication"):
+                            gene_classes = GeneClasses(df1, df2, ties_method)
+                            pairs = gene_classes.pairs()
+                        print(
+                            f"Found {gene_classes.n_classes} distinct rank signatures among "
+                            f"{gene_classes.n_genes} genes: computing {len(pairs)} of {gene_classes.n_pairs} pairs "
+                            f"({gene_classes.n_pairs - len(pairs)} saved)"
+                        )
+
+                    writer = (
+                        NetworkWriter(network_path, shared_data.gene_names)
+                        if pipeline
+                        else None
+                    )
+                    on_batch = None
+                    if writer:
+                        on_batch = writer.write
+                    elif deduplicate:
+                        on_batch = collected.append
+                    try:
+                        network_df = analyzer.compute_dc_copula_network_parallel(
+                            df1,
+                            df2,
+                            ties_method=ties_method,
+                            smoothing=smoothing,
+                            ks_stat_method=ks_stat_method,
+                            batch_size=batch_size,
+                            max_workers=workers or None,
+                            profiler=profiler,
+                            executor=executor,
+                            shared_data=shared_data,
+                            monitor=monitor,
+                            pairs=pairs,
+                            on_batch=on_batch,
+                            backend=backend,
+                        )
+                    finally:
+                        if writer:
+                            with stage("write_output"):
+                                writer.close()
+
+                    if deduplicate:
+                        with stage("result_collection"):
+                            network_df = gene_classes.expand(
+                                np.concatenate(collected)
+                                if collected
+                                else np.empty(0, dtype=PAIR_RESULT_DTYPE),
+                                shared_data.gene_names,
+                            )
+    finally:
+        # The workers started for --pipeline are shut down also if loading or publishing the inputs fails
+        if executor:
+            executor.shutdown()
+
+    # Saving the network (or the per-gene aggregates) to the specified output path
+    if aggregate:
+        aggregates_path = f"{output_path}/gene_aggregates.tsv"
+        with stage("write_output"):
+            aggregates.to_table().to_csv(
+                aggregates_path, sep="\t", index=False, header=True
+            )
+        print(
+            f"Saved the aggregates of {len(aggregates.gene_names)} genes to {aggregates_path}"
+        )
+    elif output_format == "npy":
+        print(
+            f"Saved the condensed weights of {store.n_pairs} gene pairs to {network_path}"
+        )
+    else:
+        if not pipeline:
+            with stage("write_output"):
+                network_df.to_csv(network_path, sep="\t", index=False, header=True)
+        print(f"Saved the computed network to {network_path}")
+
+    if sparse_threshold is not None:
+        from sparse_network import SparseNetwork
+
+        sparse_path = f"{output_path}/network.npz"
+        with stage("write_sparse_output"):
+            if pipeline:
+                network = SparseNetwork.from_tsv(network_path, sparse_threshold)
+            elif output_format == "npy":
+                network = SparseNetwork.from_condensed(
+                    store.weights, store.gene_names, sparse_threshold
+                )
+            else:
+                network = SparseNetwork.from_network(
+                    network_df, sparse_threshold, gene_names=df1.iloc[:, 0].values
+                )
+            network.save(sparse_path)
+        print(
+            f"Saved {network.n_edges} edges with a weight of at least {sparse_threshold} to {sparse_path}"
+        )
+
+    if index:
+        from network_index import NetworkIndex
+
+        index_path = f"{output_path}/network_index"
+        gene_names = df1.iloc[:, 0].values
+        with stage("write_index"):
+            if pipeline:
+                network_index = NetworkIndex.from_tsv(
+                    index_path, network_path, gene_names, index_threshold
+                )
+            elif output_format == "npy":
+                network_index = NetworkIndex.from_condensed(
+                    index_path, store.weights, store.gene_names, index_threshold
+                )
+            else:
+                network_index = NetworkIndex.from_network(
+                    index_path, network_df, gene_names, index_threshold
+                )
+        print(
+            f"Indexed {network_index.n_edges} edges with a weight of at least {index_threshold} in {index_path}"
+        )
+
+    if bootstraps:
+        from bootstrap import BootstrapAnalyzer, SharedBootstrapSamples
+
+        with stage("bootstrap"):
+            with SharedBootstrapSamples(
+                df1, df2, bootstraps, ties_method, seed
+            ) as shared_samples:
+                stability_df = BootstrapAnalyzer(
+                    empirical_copula
+                ).compute_edge_stability(
+                    shared_samples,
+                    smoothing=smoothing,
+                    threshold=bootstrap_threshold,
+                    confidence_level=confidence_level,
+                    batch_size=batch_size,
+                    max_workers=workers or None,
+                    # Still auto with --eval_grid, which always runs in worker processes
+                    backend="processes" if backend == "auto" else backend,
+                )
+        stability_path = f"{output_path}/edge_stability.tsv"
+        with stage("write_output"):
+            stability_df.to_csv(stability_path, sep="\t", index=False, header=True)
+        print(
+            f"Saved the edge stability over {bootstraps} bootstrap resamples to {stability_path}"
+        )
+
+    if profiler:
+        save_profile(profiler, output_path)
+
+
+def save_profile(profiler, output_path):
+    profile_path = f"{output_path}/profile.json"
+    with open(profile_path, "w") as file:
+        json.dump(profiler.report(), file, indent=2)
+    print(f"Saved the run profile to {profile_path}")
+
+
+def calculate_multi_condition_codc(
+    conditions,
+    reference,
+    output_path,
+    ties_method,
+    smoothing,
+    ks_stat_method,
+    batch_size,
+    workers,
+    sparse_threshold,
+    profiler,
+    monitor,
+):
+    """
+    Computes one network per comparison of the given conditions. The pseudo-observations of every condition
+    are computed once and every tile of gene pairs computes the copula of a pair once per condition, shared
+    by all comparisons involving it.
+    """
+    import pandas as pd
+
+    from copula.empirical_copula import EmpiricalCopula
+    from multi_condition import MultiConditionAnalyzer, SharedConditions
+    from profiling import NullProfiler
+
+    stage = profiler.stage if profiler else NullProfiler().stage
+    empirical_copula = EmpiricalCopula()
+    analyzer = MultiConditionAnalyzer(empirical_copula)
+    try:
+        comparisons = analyzer.comparisons(list(conditions), reference)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--reference")
+
+    with stage("load_input"):
+        frames = {
+            name: pd.read_csv(path, delimiter="\t") for name, path in conditions.items()
+        }
+
+    with stage("shared_memory_setup"):
+        shared_conditions = SharedConditions(frames, empirical_copula, ties_method)
+    del frames
+
+    with shared_conditions:
+        weights = analyzer.compute_comparisons(
+            shared_conditions,
+            comparisons,
+            smoothing=smoothing,
+            ks_stat_method=ks_stat_method,
+            batch_size=batch_size,
+            max_workers=workers or None,
+            profiler=profiler,
+            monitor=monitor,
+        )
+
+    for (a, b), comparison_weights in weights.items():
+        network_path = f"{output_path}/network_{a}_vs_{b}.tsv"
+        with stage("write_output"):
+            network_df = analyzer.to_network(
+                comparison_weights,
+                shared_conditions.gene_names,
+                f"Diff Co-Exp of {a} and {b}",
+            )
+            network_df.to_csv(network_path, sep="\t", index=False, header=True)
+        print(f"Saved the computed network of {a} vs {b} to {network_path}")
+
+        if sparse_threshold is not None:
+            from sparse_network import SparseNetwork
+
+            sparse_path = f"{output_path}/network_{a}_vs_{b}.npz"
+            with stage("write_sparse_output"):
+                SparseNetwork.from_condensed(
+                    comparison_weights, shared_conditions.gene_names, sparse_threshold
+                ).save(sparse_path)
+            print(f"Saved the sparse network of {a} vs {b} to {sparse_path}")
+
+    if profiler:
+        save_profile(profiler, output_path)
 
 
 @cli.command("go-enrichment", short_help="Run the GO enrichment analysis.")
@@ -166,6 +838,30 @@ def calculate_codc(
     default=10,
     help="Number of categories to show in the bar plot.",
 )
+@click.option(
+    "--engine",
+    type=click.Choice(["r", "python"]),
+    default="r",
+    help="Enrichment implementation: the R script based on clusterProfiler, or the native Python engine, which needs --annotation_file and --obo_file.",
+)
+@click.option(
+    "--annotation_file",
+    type=str,
+    default=None,
+    help="Python engine: GO annotation file, a GAF file (key types SYMBOL, UNIPROT) or an NCBI gene2go file (key type ENTREZID).",
+)
+@click.option(
+    "--obo_file",
+    type=str,
+    default=None,
+    help="Python engine: GO ontology file in OBO format, e.g. go-basic.obo.",
+)
+@click.option(
+    "--cache_dir",
+    type=str,
+    default=None,
+    help="Python engine: directory of the cached annotation index (default ~/.cache/codc).",
+)
 def go_enrichment(
     input_file,
     output_path,
@@ -175,6 +871,10 @@ def go_enrichment(
     p_adjust_method,
     qvalue_cutoff,
     show_category,
+    engine,
+    annotation_file,
+    obo_file,
+    cache_dir,
 ):
     """
     Perform gene ontology (GO) enrichment analysis on a set of genes to identify
@@ -182,6 +882,34 @@ def go_enrichment(
     coexpression analysis. This analysis helps in understanding the biological functions
     that are potentially altered under different conditions.
     """
+    if engine == "python":
+        from enrichment import GOAnnotationIndex, network_genes, plot_enrichment
+
+        if not annotation_file or not obo_file:
+            raise click.UsageError(
+                "--engine python requires --annotation_file and --obo_file."
+            )
+        try:
+            index = GOAnnotationIndex.load(
+                annotation_file, obo_file, ontology, key_type, cache_dir
+            )
+            enrichment_df = index.enrich(
+                network_genes(input_file, threshold),
+                p_adjust_method=p_adjust_method,
+                qvalue_cutoff=qvalue_cutoff,
+            )
+        except ValueError as e:
+            raise click.UsageError(str(e))
+
+        os.makedirs(output_path, exist_ok=True)
+        result_path = os.path.join(output_path, "enrichment.tsv")
+        enrichment_df.to_csv(result_path, sep="\t", index=False, header=True)
+        print(f"Found {len(enrichment_df)} enriched {ontology} terms, saved to {result_path}")
+
+        plot_path = os.path.join(output_path, "ontology.png")
+        if plot_enrichment(enrichment_df, plot_path, ontology, show_category):
+            print(f"Plot saved to: {plot_path}")
+        return
 
     # Define the path to the R script here to avoid specifying it every time
     R_SCRIPT_PATH = "./go_enrichment_cli.R"
@@ -244,26 +972,94 @@ def go_enrichment(
     default=10,
     help="Number of times the performance measurement is to be executed.",
 )
+@click.option(
+    "--warmup",
+    type=int,
+    default=1,
+    help="Number of unrecorded warmup runs before the measured iterations of every configuration.",
+)
 @click.option(
     "--output_path",
     type=str,
     required=True,
-    help="Directory where the performance results will be saved as python_performance.csv.",
+    help="Directory where the performance results will be saved as python_performance.csv and python_performance.json.",
 )
 @click.option(
     "--batch_size",
     type=click.INT,
-    default=100,
-    help="Batch size to perform the calculation in parallel.",
+    multiple=True,
+    default=[100],
+    help="Batch size to perform the calculation in parallel. Can be given multiple times to sweep over values.",
+)
+@click.option(
+    "--workers",
+    type=click.INT,
+    multiple=True,
+    default=[0],
+    help="Number of worker processes, 0 uses the number of CPUs. Can be given multiple times.",
+)
+@click.option(
+    "--smoothing",
+    type=click.Choice(["none", "beta", "checkerboard"]),
+    multiple=True,
+    default=["none"],
+    help="Type of smoothing to apply to the empirical copula. Can be given multiple times.",
+)
+@click.option(
+    "--ties_method",
+    type=click.Choice(["average", "max"]),
+    multiple=True,
+    default=["average"],
+    help="Method for ranking ties within pseudo-observations. Can be given multiple times.",
+)
+@click.option(
+    "--ks_stat_method",
+    type=click.Choice(["asymp", "auto", "exact"]),
+    multiple=True,
+    default=["asymp"],
+    help="Mode parameter for the ks_2samp function. Can be given multiple times.",
+)
+@click.option(
+    "--n_genes",
+    type=click.INT,
+    multiple=True,
+    default=[0],
+    help="Dataset size as the number of leading genes of the inputs to use, 0 uses all genes. Can be given multiple times.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    multiple=True,
+    default=["processes"],
+    help="Execution backend of the workers. Can be given multiple times.",
 )
 def measure_python_performance(
-    input_file_1, input_file_2, output_path, iterations, batch_size
+    input_file_1,
+    input_file_2,
+    output_path,
+    iterations,
+    warmup,
+    batch_size,
+    workers,
+    smoothing,
+    ties_method,
+    ks_stat_method,
+    n_genes,
+    backend,
 ):
     """
     Measures and logs the execution time of differential coexpression network calculations
     over multiple runs specified by the user. This function evaluates the performance of the
-    empirical copula approach in python code.
+    empirical copula approach in python code. Every combination of the given parameter values
+    is measured with a warm worker pool, recording wall time, CPU time, peak memory of the
+    parent and the workers, and the throughput in pairs per second.
     """
+    import pandas as pd
+
+    from analyzer import GeneExpressionAnalyzer
+    from copula.empirical_copula import EmpiricalCopula
+    from performance import PerformanceSweep
+
     # Loading data from TSV files
     df1 = pd.read_csv(input_file_1, delimiter="\t")
     df2 = pd.read_csv(input_file_2, delimiter="\t")
@@ -272,38 +1068,36 @@ def measure_python_performance(
     empirical_copula = EmpiricalCopula()
     analyzer = GeneExpressionAnalyzer(empirical_copula=empirical_copula)
 
-    # Configuration for performance measurement
-    ties_method = "average"  # Could be parameterized if needed
-    smoothing = "none"  # Could be parameterized if needed
-    ks_stat_method = "asymp"  # Could be parameterized if needed
-
-    # Measuring execution times
-    execution_times = []
-    for i in range(iterations):
-        start_time = time.time()
-        network_df = analyzer.compute_dc_copula_network_parallel(
-            df1,
-            df2,
-            ties_method=ties_method,
-            smoothing=smoothing,
-            ks_stat_method=ks_stat_method,
-            batch_size=batch_size,
+    def report(row):
+        print(
+            f"n_genes={row['n_genes']} backend={row['backend']} workers={row['workers']} "
+            f"batch_size={row['batch_size']} "
+            f"smoothing={row['smoothing']} ties={row['ties_method']} ks={row['ks_stat_method']} "
+            f"iteration {row['iteration']}: {row['wall_time']:.4f} seconds, "
+            f"{row['pairs_per_sec']:.1f} pairs/sec",
+            flush=True,
         )
-        elapsed_time = time.time() - start_time
-        execution_times.append(elapsed_time)
-        print(f"Execution {i + 1}: {elapsed_time:.4f} seconds")
 
-    # Output path for CSV file
-    timings_csv = f"{output_path}/python_performance.csv"
+    # Measuring every configuration of the sweep
+    sweep = PerformanceSweep(analyzer, df1, df2, warmup=warmup, iterations=iterations)
+    rows = sweep.run(
+        gene_counts=[count or None for count in n_genes],
+        backends=backend,
+        workers=[count or None for count in workers],
+        batch_sizes=batch_size,
+        smoothings=smoothing,
+        ties_methods=ties_method,
+        ks_stat_methods=ks_stat_method,
+        callback=report,
+    )
 
-    # Storing execution times in a CSV file
-    with open(timings_csv, "w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Iteration", "Time"])
-        for idx, exec_time in enumerate(execution_times, start=1):
-            writer.writerow([idx, exec_time])
+    # Storing the measurements as tidy CSV and JSON files
+    timings_csv = f"{output_path}/python_performance.csv"
+    timings_json = f"{output_path}/python_performance.json"
+    sweep.write_csv(rows, timings_csv)
+    sweep.write_json(rows, timings_json)
 
-    print(f"Saved execution times to {timings_csv}")
+    print(f"Saved execution times to {timings_csv} and {timings_json}")
 
 
 @click.command(
@@ -371,10 +1165,672 @@ def measure_r_performance(input_file_1, input_file_2, iterations, output_path):
         click.echo(f"Error output: {e.stderr}")
 
 
+@click.command(
+    "compare",
+    short_help="Compare weights and speed of the R and the Python implementation.",
+)
+@click.option(
+    "--input_file_1",
+    type=str,
+    required=True,
+    help="Path to the first TSV file containing gene expression data.",
+)
+@click.option(
+    "--input_file_2",
+    type=str,
+    required=True,
+    help="Path to the second TSV file containing gene expression data.",
+)
+@click.option(
+    "--output_path",
+    type=str,
+    required=True,
+    help="Directory where comparison.tsv and comparison.json will be saved.",
+)
+@click.option(
+    "--n_pairs",
+    type=int,
+    default=0,
+    help="Number of randomly sampled gene pairs to compare, 0 compares all pairs.",
+)
+@click.option("--seed", type=int, default=0, help="Seed used to sample the gene pairs.")
+@click.option(
+    "--r_network_file",
+    type=str,
+    default=None,
+    help="Network previously computed by the R implementation. Its pairs are recomputed in Python instead of running Rscript.",
+)
+@click.option(
+    "--tolerance",
+    type=float,
+    default=1e-8,
+    help="Largest absolute weight difference considered equal.",
+)
+@click.option(
+    "--batch_size",
+    type=int,
+    default=100,
+    help="Batch size of the Python computation.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=0,
+    help="Number of worker processes of the Python computation, 0 uses all CPUs.",
+)
+def compare_implementations(
+    input_file_1,
+    input_file_2,
+    output_path,
+    n_pairs,
+    seed,
+    r_network_file,
+    tolerance,
+    batch_size,
+    workers,
+):
+    """
+    Runs the R and the Python implementation on the same gene pairs, of inputs of any size or of a random
+    sample of their pairs, and compares the results. The networks are joined on (Regulator, Target) and the
+    maximum and mean absolute weight differences are reported together with the wall time and throughput of
+    both implementations. Both use the empirical copula without smoothing and average ranks for ties.
+    """
+    import pandas as pd
+
+    from analyzer import GeneExpressionAnalyzer
+    from comparison import ImplementationComparison
+    from copula.empirical_copula import EmpiricalCopula
+
+    df1 = pd.read_csv(input_file_1, delimiter="\t")
+    df2 = pd.read_csv(input_file_2, delimiter="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    comparison = ImplementationComparison(analyzer, df1, df2)
+
+    if r_network_file:
+        r_network = pd.read_csv(r_network_file, sep="\t")
+        try:
+            pairs = comparison.pairs_of_network(r_network)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--r_network_file")
+        r_time = None
+    else:
+        pairs = comparison.sample_pairs(n_pairs or None, seed)
+
+    print(f"Comparing {len(pairs)} gene pairs...")
+    python_network, python_time = comparison.run_python(
+        pairs, batch_size=batch_size, max_workers=workers or None
+    )
+    if not r_network_file:
+        try:
+            r_network, r_time = comparison.run_r(input_file_1, input_file_2, pairs, output_path)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+
+    merged, summary = comparison.compare_networks(python_network, r_network, tolerance)
+    timings = comparison.timing_table(
+        {"python": (python_time, len(python_network)), "r": (r_time, len(r_network))}
+    )
+
+    print(
+        f"Matched pairs: {summary['pairs_matched']} "
+        f"(only Python: {summary['pairs_only_python']}, only R: {summary['pairs_only_r']})"
+    )
+    print(f"Max absolute weight difference: {summary['max_abs_difference']:.3g}")
+    print(f"Mean absolute weight difference: {summary['mean_abs_difference']:.3g}")
+    print(f"Pairs above tolerance {tolerance:g}: {summary['pairs_above_tolerance']}")
+    print(timings.to_string(index=False))
+
+    merged.to_csv(f"{output_path}/comparison.tsv", sep="\t", index=False)
+    comparison.write_report(summary, timings, f"{output_path}/comparison.json")
+    print(f"Saved comparison to {output_path}/comparison.tsv and {output_path}/comparison.json")
+
+
+@click.command(
+    "network-stats",
+    short_help="Compute weighted degrees, hubs and modules of a thresholded network.",
+)
+@click.option(
+    "--input_file",
+    type=str,
+    required=True,
+    help="Sparse network.npz written by codc --sparse_threshold, or a network.tsv which is read in chunks.",
+)
+@click.option(
+    "--output_path",
+    type=str,
+    required=True,
+    help="Directory where gene_degrees.tsv and modules.tsv will be saved.",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.6,
+    help="Weight threshold of the edges to keep.",
+)
+@click.option("--top", type=int, default=10, help="Number of hub genes to print.")
+@click.option(
+    "--min_module_size",
+    type=int,
+    default=2,
+    help="Smallest number of genes of a reported module (connected component).",
+)
+@click.option(
+    "--chunksize",
+    type=int,
+    default=1_000_000,
+    help="Number of rows of a network.tsv read at once; bounds the memory usage.",
+)
+def network_stats(input_file, output_path, threshold, top, min_module_size, chunksize):
+    """
+    Computes the weighted degree (differential connectivity) of every gene, the top hub genes and the
+    connected modules of the network of all edges with at least the threshold weight. The statistics are
+    computed on a sparse adjacency matrix, a network.tsv is streamed in chunks so that only the kept edges
+    are held in memory.
+    """
+    from sparse_network import SparseNetwork
+
+    if input_file.endswith(".npz"):
+        network = SparseNetwork.load(input_file).filter(threshold)
+    else:
+        network = SparseNetwork.from_tsv(input_file, threshold, chunksize=chunksize)
+    print(
+        f"Network with {len(network.gene_names)} genes and {network.n_edges} edges "
+        f"with a weight of at least {threshold}"
+    )
+
+    degrees = network.degrees()
+    modules = network.modules(min_module_size)
+    print(f"\nTop {top} hub genes:")
+    print(degrees.head(top).to_string(index=False))
+    print(
+        f"\nFound {modules['Module'].nunique()} modules with at least {min_module_size} genes"
+    )
+
+    degrees_path = f"{output_path}/gene_degrees.tsv"
+    modules_path = f"{output_path}/modules.tsv"
+    degrees.to_csv(degrees_path, sep="\t", index=False)
+    modules.to_csv(modules_path, sep="\t", index=False)
+    print(f"Saved gene degrees to {degrees_path} and modules to {modules_path}")
+
+
+@click.command(
+    "query",
+    short_help="Print the edges of genes from a network indexed with codc --index.",
+)
+@click.option(
+    "--index_path",
+    type=str,
+    required=True,
+    help="Directory network_index written by codc --index.",
+)
+@click.option(
+    "--gene",
+    "genes",
+    type=str,
+    multiple=True,
+    required=True,
+    help="Gene whose edges are returned; can be given several times.",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of edges with the highest weights returned per gene. Defaults to all edges.",
+)
+@click.option(
+    "--min_weight",
+    type=float,
+    default=None,
+    help="Minimum weight of the returned edges.",
+)
+@click.option(
+    "--output_file",
+    type=str,
+    default=None,
+    help="TSV file where the edges are saved instead of printing them.",
+)
+def query(index_path, genes, top, min_weight, output_file):
+    """
+    Returns the edges of the given genes sorted by decreasing weight, as a table with the columns Gene,
+    Partner and Weight. Only the edges of the queried genes are read from the memory-mapped index, so a
+    query takes time in the order of the degree of the genes whatever the size of the network.
+    """
+    import pandas as pd
+
+    from network_index import NetworkIndex
+
+    network_index = NetworkIndex.open(index_path)
+    try:
+        edges = pd.concat(
+            [network_index.edges(gene, top=top, min_weight=min_weight) for gene in genes],
+            ignore_index=True,
+        )
+    except KeyError as error:
+        raise click.BadParameter(
+            f"{error.args[0]} is not a gene of {index_path}.", param_hint="--gene"
+        )
+
+    if output_file:
+        edges.to_csv(output_file, sep="\t", index=False)
+        print(f"Saved {len(edges)} edges to {output_file}")
+    else:
+        click.echo(edges.to_csv(sep="\t", index=False), nl=False)
+
+
+@click.command(
+    "gene-sets",
+    short_help="Compute the differential coexpression of gene sets.",
+)
+@click.option(
+    "--input_file_1",
+    type=str,
+    required=True,
+    help="Path to the first input TSV file containing gene expression data for condition 1.",
+)
+@click.option(
+    "--input_file_2",
+    type=str,
+    required=True,
+    help="Path to the second input TSV file containing gene expression data for condition 2.",
+)
+@click.option(
+    "--gene_sets",
+    type=str,
+    required=True,
+    help="GMT file with one gene set per line: its name, a description and its genes, tab-separated.",
+)
+@click.option(
+    "--output_path",
+    type=str,
+    required=True,
+    help="Directory where gene_sets.tsv will be saved.",
+)
+@click.option(
+    "--ties_method",
+    type=click.Choice(["average", "max"]),
+    default="average",
+    help="Method for ranking ties within pseudo-observations.",
+)
+@click.option(
+    "--smoothing",
+    type=click.Choice(["none", "beta", "checkerboard"]),
+    default="none",
+    help="Type of smoothing to apply to the empirical copula.",
+)
+@click.option(
+    "--ks_stat_method",
+    type=click.Choice(["asymp", "auto", "exact"]),
+    default="asymp",
+    help="Mode parameter for the ks_2samp function, which determines how the Kolmogorov-Smirnov statistic is computed.",
+)
+@click.option("--batch_size", type=int, default=100, help="Number of gene sets per task.")
+@click.option(
+    "--workers",
+    type=click.INT,
+    default=0,
+    help="Number of worker processes, 0 uses the number of CPUs.",
+)
+def gene_set_codc(
+    input_file_1,
+    input_file_2,
+    gene_sets,
+    output_path,
+    ties_method,
+    smoothing,
+    ks_stat_method,
+    batch_size,
+    workers,
+):
+    """
+    Computes the differential coexpression of every gene set as the Kolmogorov-Smirnov distance between the
+    multivariate empirical copulas of its genes in both conditions, the generalization of the codc pair weight
+    to triplets and modules. A set of two genes has the same weight as the pair in network.tsv.
+    """
+    import pandas as pd
+
+    from copula.empirical_copula import EmpiricalCopula
+    from gene_sets import GeneSetAnalyzer, read_gene_sets
+    from multi_condition import SharedConditions
+
+    try:
+        named_sets = read_gene_sets(gene_sets)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--gene_sets")
+
+    df1 = pd.read_csv(input_file_1, delimiter="\t")
+    df2 = pd.read_csv(input_file_2, delimiter="\t")
+    empirical_copula = EmpiricalCopula()
+    analyzer = GeneSetAnalyzer(empirical_copula)
+    try:
+        indices = analyzer.index_gene_sets(named_sets, df1.iloc[:, 0].values)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--gene_sets")
+
+    sizes = [len(genes) for genes in indices]
+    print(
+        f"Computing {len(indices)} gene sets of {min(sizes, default=0)} to "
+        f"{max(sizes, default=0)} genes"
+    )
+    with SharedConditions(
+        {"1": df1, "2": df2}, empirical_copula, ties_method
+    ) as shared_conditions:
+        weights = analyzer.compute_gene_sets(
+            shared_conditions,
+            indices,
+            smoothing=smoothing,
+            ks_stat_method=ks_stat_method,
+            batch_size=batch_size,
+            max_workers=workers or None,
+        )
+
+    table_path = f"{output_path}/gene_sets.tsv"
+    analyzer.to_table(named_sets, weights).to_csv(table_path, sep="\t", index=False)
+    print(f"Saved the weights of {len(indices)} gene sets to {table_path}")
+
+
+@click.command(
+    "batch",
+    short_help="Run many codc comparisons from a manifest on one worker pool.",
+)
+@click.option(
+    "--manifest",
+    type=str,
+    required=True,
+    help="YAML file listing the jobs: input_file_1, input_file_2, output_path and optionally name, output_format, ties_method, smoothing and ks_stat_method, with optional defaults for all jobs.",
+)
+@click.option(
+    "--batch_size",
+    type=click.IntRange(min=1),
+    default=100,
+    help="Number of gene pairs per task submitted to the workers.",
+)
+@click.option(
+    "--workers",
+    type=click.INT,
+    default=0,
+    help="Number of workers shared by all jobs, 0 uses the number of CPUs.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="processes",
+    help="Execution backend of the worker pool.",
+)
+@click.option(
+    "--active_jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    help="Number of jobs whose tasks are interleaved at a time; the results of these jobs are held in memory.",
+)
+@click.option(
+    "--report_file",
+    type=str,
+    default=None,
+    help="TSV file the throughput of every job is written to.",
+)
+def batch_codc(manifest, batch_size, workers, backend, active_jobs, report_file):
+    """
+    Computes the codc networks of all jobs of a manifest in one invocation. Every input file is read and
+    published once however many jobs use it, and the tasks of all jobs share one worker pool, so jobs neither
+    reload data nor contend for cores. The wall time, CPU time and throughput of every job are reported.
+    """
+    import pandas as pd
+
+    from analyzer import GeneExpressionAnalyzer
+    from batch import BatchScheduler, SharedInputs, read_manifest
+    from copula.empirical_copula import EmpiricalCopula
+
+    try:
+        jobs = read_manifest(manifest)
+    except (OSError, ValueError) as e:
+        raise click.BadParameter(str(e), param_hint="--manifest")
+
+    paths = [job[key] for job in jobs for key in ("input_file_1", "input_file_2")]
+    scheduler = BatchScheduler(
+        GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula()),
+        batch_size=batch_size,
+        active_jobs=active_jobs,
+    )
+
+    def report(row):
+        print(
+            f"{row['name']}: {row['pairs']} pairs of {row['n_genes']} genes in {row['wall_time']:.2f} s "
+            f"({row['pairs_per_sec']:.1f} pairs/sec, {row['pairs_per_cpu_sec']:.1f} pairs/CPU sec), "
+            f"saved to {row['network']}",
+            flush=True,
+        )
+
+    with SharedInputs(paths, backend) as inputs:
+        print(
+            f"Loaded {inputs.n_files} distinct input files for {len(jobs)} jobs "
+            f"({len(paths) - inputs.n_files} repeated reads saved)"
+        )
+        try:
+            rows = scheduler.run(
+                jobs,
+                inputs,
+                max_workers=workers or None,
+                backend=backend,
+                callback=report,
+            )
+        except ValueError as e:
+            raise click.UsageError(str(e))
+
+    if report_file:
+        pd.DataFrame(rows, columns=BatchScheduler.REPORT_COLUMNS).to_csv(
+            report_file, sep="\t", index=False
+        )
+        print(f"Saved the report of {len(rows)} jobs to {report_file}")
+
+
+@click.command(
+    "serve",
+    short_help="Serve codc jobs from data and workers kept in memory.",
+)
+@click.option(
+    "--input_file_1",
+    type=str,
+    required=True,
+    help="Path to the first input TSV file containing gene expression data for condition 1.",
+)
+@click.option(
+    "--input_file_2",
+    type=str,
+    required=True,
+    help="Path to the second input TSV file containing gene expression data for condition 2.",
+)
+@click.option(
+    "--port",
+    type=click.IntRange(min=0, max=65535),
+    default=8000,
+    help="Port on localhost to listen on, 0 chooses a free port.",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=str,
+    default=None,
+    help="Listen on this Unix socket instead of a port on localhost.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="processes",
+    help="Execution backend of the worker pool.",
+)
+@click.option(
+    "--workers",
+    type=click.INT,
+    default=0,
+    help="Number of workers, 0 uses the number of CPUs.",
+)
+@click.option(
+    "--batch_size",
+    type=click.IntRange(min=1),
+    default=100,
+    help="Number of gene pairs per task submitted to the workers.",
+)
+def serve(input_file_1, input_file_2, port, socket_path, backend, workers, batch_size):
+    """
+    Loads both conditions once, keeps them in shared memory and the worker pool running, and serves jobs over
+    HTTP until it is stopped: full networks and networks of gene subsets (POST /network), single pair queries
+    (POST /pairs), GET /info and POST /shutdown. Small jobs are answered in milliseconds.
+    """
+    import pandas as pd
+
+    from analyzer import GeneExpressionAnalyzer
+    from copula.empirical_copula import EmpiricalCopula
+    from serve import CodcService, create_server
+
+    df1 = pd.read_csv(input_file_1, delimiter="\t")
+    df2 = pd.read_csv(input_file_2, delimiter="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    try:
+        service = CodcService(
+            df1,
+            df2,
+            analyzer,
+            backend=backend,
+            max_workers=workers or None,
+            batch_size=batch_size,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    with service:
+        server = create_server(service, port=port, socket_path=socket_path)
+        if socket_path:
+            address = f"unix socket {socket_path}"
+        else:
+            address = f"http://127.0.0.1:{server.server_address[1]}"
+        print(
+            f"Serving {service.shared_data.n_genes} genes with {service.max_workers} {backend} "
+            f"workers on {address}",
+            flush=True,
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    print("Stopped the service")
+
+
+@click.command(
+    "generate-data",
+    short_help="Generate synthetic paired gene expression data for scale testing.",
+)
+@click.option(
+    "--output_path",
+    type=str,
+    required=True,
+    help="Directory where condition_1.tsv, condition_2.tsv and planted_modules.tsv will be saved.",
+)
+@click.option("--n_genes", type=int, default=2000, help="Number of genes.")
+@click.option(
+    "--n_samples",
+    type=int,
+    default=100,
+    help="Number of samples of the first condition.",
+)
+@click.option(
+    "--n_samples_2",
+    type=int,
+    default=None,
+    help="Number of samples of the second condition (defaults to --n_samples).",
+)
+@click.option(
+    "--zero_fraction",
+    type=float,
+    default=0.0,
+    help="Probability of a value being zero, mimicking the zero-inflation (ties) of RNA-seq data.",
+)
+@click.option(
+    "--n_modules",
+    type=int,
+    default=0,
+    help="Number of differentially co-expressed gene modules to plant.",
+)
+@click.option(
+    "--module_size", type=int, default=10, help="Number of genes per planted module."
+)
+@click.option(
+    "--module_strength",
+    type=float,
+    default=0.8,
+    help="Share of variance explained by the module factor in the first condition, in [0,1].",
+)
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["tsv", "tsv.gz"]),
+    default="tsv",
+    help="Output format. Gzip-compressed TSV files are read directly by the codc command.",
+)
+@click.option(
+    "--chunk_size",
+    type=int,
+    default=1000,
+    help="Number of genes generated and written at once; bounds the memory usage.",
+)
+@click.option("--seed", type=int, default=0, help="Seed of the random number generator.")
+def generate_data(
+    output_path,
+    n_genes,
+    n_samples,
+    n_samples_2,
+    zero_fraction,
+    n_modules,
+    module_size,
+    module_strength,
+    file_format,
+    chunk_size,
+    seed,
+):
+    """
+    Generates a pair of synthetic gene expression datasets in the input format of the codc command.
+    Values are drawn per gene, optionally zero-inflated, and the genes of every planted module are
+    co-expressed in the first condition only. The planted modules are written to planted_modules.tsv
+    as ground truth.
+    """
+    from synthetic_data import SyntheticExpressionGenerator
+
+    try:
+        generator = SyntheticExpressionGenerator(
+            n_genes=n_genes,
+            n_samples=n_samples,
+            n_samples_2=n_samples_2,
+            zero_fraction=zero_fraction,
+            n_modules=n_modules,
+            module_size=module_size,
+            module_strength=module_strength,
+            seed=seed,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    for condition in (1, 2):
+        path = f"{output_path}/condition_{condition}.{file_format}"
+        generator.write_condition(path, condition, chunk_size, file_format)
+        print(f"Saved condition {condition} to {path}")
+
+    modules_path = f"{output_path}/planted_modules.tsv"
+    generator.write_modules(modules_path)
+    print(f"Saved planted modules to {modules_path}")
+
+
 cli.add_command(calculate_codc)
 cli.add_command(go_enrichment)
 cli.add_command(measure_python_performance)
 cli.add_command(measure_r_performance)
+cli.add_command(compare_implementations)
+cli.add_command(network_stats)
+cli.add_command(query)
+cli.add_command(gene_set_codc)
+cli.add_command(generate_data)
+cli.add_command(serve)
+cli.add_command(batch_codc)
 
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,212 @@
+import json
+import os
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+R_SCRIPT_PATH = "./R_performance_cli.R"
+
+
+class ImplementationComparison:
+    """
+    Runs the Python and the R implementation of the CODC computation on the same gene pairs and compares their
+    weights and speed. Large inputs can be compared on a random sample of the gene pairs.
+    """
+
+    def __init__(self, analyzer, df1, df2, r_script=R_SCRIPT_PATH):
+        """
+        Args:
+            analyzer (GeneExpressionAnalyzer): The analyzer used for the Python computation.
+            df1 (pd.DataFrame): Expression data of the first condition, gene names in the first column.
+            df2 (pd.DataFrame): Expression data of the second condition, with the same genes as `df1`.
+            r_script (str): Path to the R script of the reference implementation.
+        """
+        self.analyzer = analyzer
+        self.df1 = df1
+        self.df2 = df2
+        self.r_script = r_script
+        self.gene_names = df1.iloc[:, 0].values
+
+    def sample_pairs(self, n_pairs: int = None, seed: int = 0) -> np.ndarray:
+        """
+        Samples gene pairs uniformly without replacement, without materializing the list of all pairs.
+
+        Args:
+            n_pairs (int): Number of pairs to sample, None (or more than there are) selects all pairs.
+            seed (int): Seed of the random number generator.
+
+        Returns:
+            np.ndarray: Gene index pairs (i, j), i < j, in the order of the full computation.
+        """
+        n_genes = len(self.gene_names)
+        total = n_genes * (n_genes - 1) // 2
+        if n_pairs is None or n_pairs >= total:
+            condensed = np.arange(total)
+        else:
+            rng = np.random.default_rng(seed)
+            condensed = np.sort(rng.choice(total, size=n_pairs, replace=False))
+        return self.analyzer.condensed_to_pairs(condensed, n_genes)
+
+    def pairs_of_network(self, network: pd.DataFrame) -> np.ndarray:
+        """
+        Returns the gene index pairs (i, j), i < j, of the edges of a network, e.g. to recompute a stored
+        reference network.
+
+        Raises:
+            ValueError: If the network contains genes that are not part of the expression data.
+        """
+        index = pd.Index(self.gene_names)
+        regulators = index.get_indexer(network["Regulator"])
+        targets = index.get_indexer(network["Target"])
+        if (regulators < 0).any() or (targets < 0).any():
+            raise ValueError("The network contains genes that are not part of the expression data.")
+        pairs = np.sort(np.column_stack([regulators, targets]), axis=1)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def run_python(self, pairs: np.ndarray, batch_size: int = 100, max_workers: int = None):
+        """
+        Computes the given gene pairs with the Python implementation.
+
+        Returns:
+            tuple: The network and the wall time of the computation in seconds.
+        """
+        start = time.perf_counter()
+        network = self.analyzer.compute_dc_copula_network_parallel(
+            self.df1,
+            self.df2,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            verbose=False,
+            pairs=pairs,
+        )
+        return network, time.perf_counter() - start
+
+    def run_r(self, input_file_1: str, input_file_2: str, pairs: np.ndarray, output_path: str):
+        """
+        Computes the given gene pairs with the R implementation. The pairs are passed to the R script as a file
+        of gene names and the script writes the network and its execution time to `output_path`.
+
+        Returns:
+            tuple: The network and the execution time of the computation in seconds, as measured by R.
+
+        Raises:
+            RuntimeError: If the R script fails.
+        """
+        pairs_file = os.path.join(output_path, "compared_pairs.tsv")
+        network_file = os.path.join(output_path, "r_network.tsv")
+        pd.DataFrame(
+            {
+                "Regulator": self.gene_names[pairs[:, 0]],
+                "Target": self.gene_names[pairs[:, 1]],
+            }
+        ).to_csv(pairs_file, sep="\t", index=False)
+
+        command = [
+            "Rscript",
+            self.r_script,
+            f"--input_file_1={input_file_1}",
+            f"--input_file_2={input_file_2}",
+            "--iterations=1",
+            f"--output_path={output_path}",
+            f"--pairs_file={pairs_file}",
+            f"--output_network={network_file}",
+        ]
+        try:
+            process = subprocess.run(command, capture_output=True, text=True)
+        except FileNotFoundError:
+            raise RuntimeError("Rscript was not found, R must be installed to run the R implementation.")
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Failed to execute R script. Command tried: {' '.join(command)}\n{process.stderr}"
+            )
+
+        timings = pd.read_csv(os.path.join(output_path, "r_performance.csv"))
+        return pd.read_csv(network_file, sep="\t"), float(timings["Time"].iloc[0])
+
+    @staticmethod
+    def compare_networks(
+        python_network: pd.DataFrame, r_network: pd.DataFrame, tolerance: float = 1e-8
+    ):
+        """
+        Joins both networks on (Regulator, Target) and compares their weights. The weight of a pair does not
+        depend on the order of its genes, so both networks are brought into the same orientation first.
+
+        Args:
+            python_network (pd.DataFrame): Network of the Python implementation.
+            r_network (pd.DataFrame): Network of the R implementation.
+            tolerance (float): Largest absolute weight difference considered equal.
+
+        Returns:
+            tuple: The joined pairs with the columns Regulator, Target, Weight_python, Weight_r and Difference,
+                   and a dictionary summarizing the differences.
+        """
+
+        def oriented(network):
+            regulators = network["Regulator"].astype(str).values
+            targets = network["Target"].astype(str).values
+            swap = regulators > targets
+            return pd.DataFrame(
+                {
+                    "Regulator": np.where(swap, targets, regulators),
+                    "Target": np.where(swap, regulators, targets),
+                    "Weight": network["Weight"].values,
+                }
+            )
+
+        merged = oriented(python_network).merge(
+            oriented(r_network),
+            on=["Regulator", "Target"],
+            how="outer",
+            suffixes=("_python", "_r"),
+            indicator=True,
+        )
+        matched = merged["_merge"] == "both"
+        merged["Difference"] = (merged["Weight_python"] - merged["Weight_r"]).abs()
+        differences = merged.loc[matched, "Difference"]
+
+        summary = {
+            "pairs_python": len(python_network),
+            "pairs_r": len(r_network),
+            "pairs_matched": int(matched.sum()),
+            "pairs_only_python": int((merged["_merge"] == "left_only").sum()),
+            "pairs_only_r": int((merged["_merge"] == "right_only").sum()),
+            "max_abs_difference": float(differences.max()) if len(differences) else 0.0,
+            "mean_abs_difference": float(differences.mean()) if len(differences) else 0.0,
+            "tolerance": tolerance,
+            "pairs_above_tolerance": int((differences > tolerance).sum()),
+        }
+        return merged.drop(columns="_merge"), summary
+
+    @staticmethod
+    def timing_table(timings: dict) -> pd.DataFrame:
+        """
+        Builds the side-by-side timing table from the wall times and numbers of pairs of every implementation.
+
+        Args:
+            timings (dict): Maps the name of an implementation to a tuple (seconds, pairs). Implementations that
+                            were not run have None as seconds.
+        """
+        table = pd.DataFrame(
+            [
+                {"implementation": name, "pairs": pairs, "wall_time": seconds}
+                for name, (seconds, pairs) in timings.items()
+            ]
+        )
+        table["wall_time"] = table["wall_time"].astype(float)
+        table["pairs_per_sec"] = table["pairs"] / table["wall_time"]
+        table["speedup"] = table["wall_time"].max() / table["wall_time"]
+        return table
+
+    @staticmethod
+    def write_report(summary: dict, timings: pd.DataFrame, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "summary": summary,
+                    "timings": json.loads(timings.to_json(orient="records")),
+                },
+                file,
+                indent=2,
+            )
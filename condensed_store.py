@@ -0,0 +1,322 @@
+import json
+import os
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from analyzer import CONDITION_LABEL, GeneExpressionAnalyzer
+from backends import create_executor
+from multi_condition import MultiConditionAnalyzer
+from profiling import NullProfiler, batch_stats
+
+# The completion flags of the tiles are written to disk at most this often; flags lost in a crash only cause
+# their tiles to be computed again
+DONE_FLUSH_INTERVAL = 1.0
+
+
+class CondensedStore:
+    """
+    The weights of all gene pairs in the condensed layout of `compute_condensed`, stored as a memory-mapped
+    `.npy` file that the workers write their tiles into directly. Next to it, `<name>.json` holds the genes, the
+    options and the tile size of the run and `<name>.done.npy` one completion flag per tile, so an interrupted
+    run can be resumed and the weights of any pair can be read without loading the file. Pairs that were not
+    computed (yet) or failed are NaN.
+    """
+
+    def __init__(self, path: str, metadata: dict, mode: str = "r"):
+        self.path = path
+        self.metadata = metadata
+        self.gene_names = np.asarray(metadata["genes"], dtype=object)
+        self.weights = np.load(path, mmap_mode=mode)
+        self.done = np.load(self.done_path(path), mmap_mode=mode)
+        self._index = None
+
+    @staticmethod
+    def metadata_path(path: str) -> str:
+        return os.path.splitext(path)[0] + ".json"
+
+    @staticmethod
+    def done_path(path: str) -> str:
+        return os.path.splitext(path)[0] + ".done.npy"
+
+    @classmethod
+    def create(
+        cls, path: str, gene_names, batch_size: int, options: dict, dtype="float32"
+    ):
+        """
+        Creates an empty store, replacing an existing one.
+
+        Args:
+            path (str): Path of the weights file, e.g. network.npy.
+            gene_names (np.ndarray): Name of every gene index.
+            batch_size (int): Number of gene pairs per tile.
+            options (dict): The computation options of the run (ties method, smoothing, KS mode).
+            dtype (str): Data type of the stored weights.
+        """
+        n_genes = len(gene_names)
+        n_pairs = n_genes * (n_genes - 1) // 2
+        weights = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_pairs,))
+        weights[:] = np.nan
+        weights.flush()
+        np.save(cls.done_path(path), np.zeros(-(-n_pairs // batch_size), dtype=np.uint8))
+        metadata = {
+            "n_genes": n_genes,
+            "batch_size": batch_size,
+            "dtype": str(np.dtype(dtype)),
+            "options": options,
+            "genes": [str(gene) for gene in gene_names],
+        }
+        with open(cls.metadata_path(path), "w") as file:
+            json.dump(metadata, file)
+        return cls(path, metadata, mode="r+")
+
+    @classmethod
+    def open(cls, path: str, mode: str = "r"):
+        """
+        Opens an existing store, read-only by default.
+        """
+        with open(cls.metadata_path(path)) as file:
+            return cls(path, json.load(file), mode=mode)
+
+    @classmethod
+    def resume(cls, path: str, gene_names, batch_size: int, options: dict):
+        """
+        Opens an existing store to continue its run, or creates it if it does not exist.
+
+        Raises:
+            ValueError: If the existing store was created for other genes, options or tile size, or misses one of
+                        its files.
+        """
+        files = [path, cls.metadata_path(path), cls.done_path(path)]
+        missing = [file for file in files if not os.path.exists(file)]
+        if len(missing) == len(files):
+            return cls.create(path, gene_names, batch_size, options)
+        if missing:
+            raise ValueError(
+                f"{path} is an incomplete store (missing {', '.join(missing)}) and cannot be resumed."
+            )
+        store = cls.open(path, mode="r+")
+        if store.metadata["genes"] != [str(gene) for gene in gene_names]:
+            raise ValueError(f"{path} was computed for other genes and cannot be resumed.")
+        for key, value in (("batch_size", batch_size), ("options", options)):
+            if store.metadata[key] != value:
+                raise ValueError(
+                    f"{path} was computed with {key} {store.metadata[key]} instead of {value} and cannot "
+                    f"be resumed."
+                )
+        return store
+
+    @property
+    def n_genes(self):
+        return len(self.gene_names)
+
+    @property
+    def batch_size(self):
+        return self.metadata["batch_size"]
+
+    @property
+    def n_pairs(self):
+        return len(self.weights)
+
+    @property
+    def complete(self):
+        return bool(np.all(self.done))
+
+    def tile_bounds(self, tile: int) -> tuple:
+        start = tile * self.batch_size
+        return start, min(start + self.batch_size, self.n_pairs)
+
+    def pending_tiles(self) -> np.ndarray:
+        """
+        Returns the tiles that have not been computed yet.
+        """
+        return np.flatnonzero(self.done == 0)
+
+    def flush(self):
+        self.weights.flush()
+        self.done.flush()
+
+    def weight(self, gene_1, gene_2) -> float:
+        """
+        Returns the weight of a pair of genes (in either order), read from the file.
+
+        Raises:
+            KeyError: If a gene is not part of the store.
+        """
+        if self._index is None:
+            self._index = {gene: position for position, gene in enumerate(self.gene_names)}
+        i, j = sorted((self._index[gene_1], self._index[gene_2]))
+        if i == j:
+            raise KeyError(f"A pair needs two distinct genes, got {gene_1} twice.")
+        return float(self.weights[self.n_genes * i - i * (i + 1) // 2 + j - i - 1])
+
+    def to_network(self):
+        """
+        Returns the computed pairs as a network with the columns Target, Regulator, Condition and Weight.
+        """
+        network = MultiConditionAnalyzer.to_network(
+            np.asarray(self.weights, dtype=np.float64), self.gene_names, CONDITION_LABEL
+        )
+        return network[network["Weight"].notna()].reset_index(drop=True)
+
+
+class CondensedStoreAnalyzer:
+    """
+    Computes the weights of all gene pairs into a CondensedStore. Every worker writes the weights of its tile
+    into the memory-mapped file itself and only reports the completion of the tile, so no weights pass through
+    the parent process.
+    """
+
+    def __init__(self, analyzer):
+        """
+        Args:
+            analyzer (GeneExpressionAnalyzer): The analyzer used to compute the weights of the tiles.
+        """
+        self.analyzer = analyzer
+
+    def compute_tile(
+        self,
+        bounds,
+        store_file,
+        source1,
+        source2,
+        ties_method,
+        smoothing,
+        ks_stat_method,
+        data1_shape,
+        data2_shape,
+        dtype,
+        profile=False,
+    ):
+        """
+        Computes the weights of the gene pairs at the positions [start, stop) of the condensed pair ordering
+        with `GeneExpressionAnalyzer.compute_condensed_range` and writes them into the weights file. Runs inside
+        a worker.
+
+        Args:
+            store_file (tuple): The path, the offset of the data and the dtype of the weights file. Only the
+                                range of the tile is mapped, so that flushing it does not scan the whole file.
+
+        Returns:
+            dict: The profiler snapshot of the tile if `profile` is set, None otherwise.
+        """
+        weights = self.analyzer.compute_condensed_range(
+            bounds,
+            source1,
+            source2,
+            ties_method,
+            smoothing,
+            ks_stat_method,
+            data1_shape,
+            data2_shape,
+            dtype,
+            profile,
+        )
+        snapshot = None
+        if profile:
+            weights, snapshot = weights
+        path, offset, store_dtype = store_file
+        start, stop = bounds
+        tile = np.memmap(
+            path,
+            dtype=store_dtype,
+            mode="r+",
+            offset=offset + start * np.dtype(store_dtype).itemsize,
+            shape=(stop - start,),
+        )
+        tile[:] = weights
+        tile.flush()
+        del tile
+        return snapshot
+
+    def compute_store(
+        self,
+        store: CondensedStore,
+        shared_data,
+        max_workers=None,
+        executor=None,
+        max_in_flight=None,
+        profiler=None,
+        monitor=None,
+        verbose=True,
+        backend="processes",
+    ) -> int:
+        """
+        Computes the tiles of a store that are not done yet.
+
+        Args:
+            store (CondensedStore): The store, opened for writing. Its options are used for the computation.
+            shared_data (SharedExpressionData): The expression data of both conditions, as returned by
+                                                `expression_data_class(backend)`.
+            max_workers (int): Number of workers. Defaults to the number of CPUs.
+            executor (Executor): An already running executor to submit the tiles to.
+            max_in_flight (int): Maximum number of tiles submitted at any time. Defaults to twice the number of
+                                 workers.
+            profiler (RunProfiler): If given, the time spent in every stage is recorded into it.
+            monitor (ProgressMonitor): If given, the progress of the run is reported to it.
+            verbose (bool): Whether to print a progress bar.
+            backend (str): Runs the tiles in worker 'processes', in 'threads' of this process or 'serial' in
+                           the calling thread.
+
+        Returns:
+            int: The number of tiles computed by this call.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
+        max_workers = max_workers or os.cpu_count()
+        max_in_flight = max_in_flight or 2 * max_workers
+        collect_stats = batch_stats(profiler, monitor)
+        pending = store.pending_tiles()
+        options = store.metadata["options"]
+
+        if profiler:
+            profiler.start_compute()
+        if monitor:
+            n_pairs = sum(stop - start for start, stop in map(store.tile_bounds, pending))
+            monitor.start(n_pairs, shared_memory_bytes=shared_data.nbytes)
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = create_executor(backend, max_workers)
+        try:
+            progress = tqdm(
+                total=len(pending),
+                desc="Computing distances",
+                unit="batch",
+                disable=not verbose,
+            )
+            tiles = (store.tile_bounds(tile) for tile in pending)
+            args = (
+                (store.path, store.weights.offset, store.weights.dtype.str),
+                *shared_data.sources,
+                options["ties_method"],
+                options["smoothing"],
+                options["ks_stat_method"],
+                shared_data.data1_shape,
+                shared_data.data2_shape,
+                shared_data.dtype,
+                collect_stats,
+            )
+            last_flush = time.monotonic()
+            for (start, stop), snapshot in GeneExpressionAnalyzer.submit_bounded(
+                executor, self.compute_tile, tiles, args, max_in_flight, stage
+            ):
+                if profiler:
+                    profiler.add_batch(snapshot, received=time.time())
+                if monitor:
+                    monitor.record_batch(stop - start, snapshot["pid"], snapshot["end"])
+                store.done[start // store.batch_size] = 1
+                if time.monotonic() - last_flush > DONE_FLUSH_INTERVAL:
+                    store.done.flush()
+                    last_flush = time.monotonic()
+                progress.update(1)
+            progress.close()
+        finally:
+            store.done.flush()
+            if owns_executor:
+                executor.shutdown()
+            if profiler:
+                profiler.end_compute()
+            if monitor:
+                monitor.stop()
+        return len(pending)
@@ -2,6 +2,9 @@ import numpy as np
 from scipy.stats import rankdata, beta
 from typing import Optional
 
+# Number of set bits of every byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
 
 class EmpiricalCopula:
     """
@@ -89,18 +92,86 @@ class EmpiricalCopula:
         """
 
         num_samples = data.shape[0]  # Number of data points in the dataset
-        empirical_cdf = np.zeros(
-            len(evaluation_points)
-        )  # Initialize the array for empirical CDF values
-
-        # Calculate the empirical CDF for each evaluation point
-        for point_index, eval_point in enumerate(evaluation_points):
-            # Count how many data points are less than or equal to the evaluation point across all dimensions
-            empirical_cdf[point_index] = (
-                np.sum(np.all(data <= eval_point, axis=1)) / num_samples
+        return self.dominance_counts(evaluation_points, data) / num_samples
+
+    def dominance_counts(
+        self,
+        evaluation_points: np.ndarray,
+        data: np.ndarray,
+        chunk_size: int = 1024,
+    ) -> np.ndarray:
+        """
+        Counts for every evaluation point the data points that are less than or equal to it in all dimensions,
+        using bitset intersection instead of comparing every point with every data point in every dimension.
+
+        For every dimension the data points are sorted once, so that the data points below a value form a prefix
+        of that order, whose length is found with a binary search. For a chunk of evaluation points the prefix of
+        every point is built as a packed bitset over the data points, and the points dominated by an evaluation
+        point are the intersection of its prefixes of all dimensions. The bitsets are only built for the prefix
+        lengths of the current chunk, so the memory stays O(chunk_size * n) instead of holding the prefixes of
+        all n + 1 lengths, and the counts take O(m * d * n / 64) word operations, so it stays fast for triplets
+        and small gene modules.
+
+        Args:
+            evaluation_points (np.ndarray): Array of shape (m, d) with the points to count at.
+            data (np.ndarray): Array of shape (n, d) with the data points.
+            chunk_size (int): Number of evaluation points intersected at once, bounds the temporary memory to
+                              about chunk_size * n bytes.
+
+        Returns:
+            np.ndarray: The number of dominated data points of every evaluation point.
+        """
+        evaluation_points = np.asarray(evaluation_points)
+        data = np.asarray(data)
+        num_samples, num_dimensions = data.shape
+        counts = np.empty(len(evaluation_points), dtype=np.int64)
+
+        positions, prefix_lengths = [], []
+        for dimension_idx in range(num_dimensions):
+            order = np.argsort(data[:, dimension_idx], kind="stable")
+            position = np.empty(num_samples, dtype=np.int64)
+            position[order] = np.arange(num_samples)
+            positions.append(position)
+            prefix_lengths.append(
+                np.searchsorted(
+                    data[order, dimension_idx],
+                    evaluation_points[:, dimension_idx],
+                    side="right",
+                )
             )
 
-        return empirical_cdf
+        for start in range(0, len(evaluation_points), chunk_size):
+            stop = start + chunk_size
+            dominated = None
+            for position, lengths in zip(positions, prefix_lengths):
+                # The prefix of length c holds the data points at the first c positions of the sorted order
+                bitsets = np.packbits(position[None, :] < lengths[start:stop, None], axis=1)
+                if dominated is None:
+                    dominated = bitsets
+                else:
+                    dominated &= bitsets
+            counts[start:stop] = POPCOUNT[dominated].sum(axis=1)
+
+        return counts
+
+    def batched_empirical_distribution_function(
+        self, evaluation_points: np.ndarray, data: np.ndarray
+    ) -> np.ndarray:
+        """
+        Computes the empirical distribution functions of a batch of datasets at once, e.g. of many resamples of
+        the same gene pair, with the same result as `empirical_distribution_function` on every dataset.
+
+        Args:
+            evaluation_points (np.ndarray): Array of shape (batch, m, d) with the evaluation points of every dataset.
+            data (np.ndarray): Array of shape (batch, n, d) with the datasets.
+
+        Returns:
+            np.ndarray: Array of shape (batch, m) with the empirical CDF values at the evaluation points.
+        """
+        num_samples = data.shape[1]
+        # Compare every evaluation point with every data point of the same dataset in one operation
+        below = np.all(data[:, None, :, :] <= evaluation_points[:, :, None, :], axis=3)
+        return np.sum(below, axis=2) / num_samples
 
     def empirical_copula(
         self,
@@ -139,7 +210,32 @@ class EmpiricalCopula:
         data_pseudo_observations = self.pseudo_observations(
             data, ties_method=ties_method
         )
+        return self.pseudo_observations_copula(
+            evaluation_points, data_pseudo_observations, smoothing
+        )
 
+    def pseudo_observations_copula(
+        self,
+        evaluation_points: np.ndarray,
+        data_pseudo_observations: np.ndarray,
+        smoothing: Optional[str] = "none",
+    ) -> np.ndarray:
+        """
+        Computes the empirical copula from already computed pseudo-observations, e.g. when the ranks of every
+        gene are computed once and reused for all pairs it is part of.
+
+        Args:
+            evaluation_points (np.ndarray): Points at which the copula is to be evaluated.
+            data_pseudo_observations (np.ndarray): Pseudo-observations of the data, as returned by
+                                                   `pseudo_observations`.
+            smoothing (Optional[str]): 'none', 'beta' or 'checkerboard'.
+
+        Returns:
+            np.ndarray: An array containing the empirical copula values at each of the evaluation points.
+
+        Raises:
+            ValueError: If the smoothing method provided is not supported.
+        """
         # Compute the empirical distribution function based on the selected smoothing method
         if smoothing == "none":
             return self.empirical_distribution_function(
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from analyzer import CONDITION_LABEL, GeneExpressionAnalyzer
+
+
+class GeneClasses:
+    """
+    Groups genes whose ranks are identical in both conditions, e.g. genes that are all-zero or constant, or
+    genes that are monotone transformations of each other. The weight of a pair only depends on the ranks of
+    its genes, so all pairs between two classes have the same weight and only one representative pair per
+    pair of classes has to be computed. The weights are expanded back to all genes afterwards.
+    """
+
+    def __init__(self, df1, df2, ties_method="average"):
+        """
+        Args:
+            df1 (pd.DataFrame): Expression data of the first condition, gene names in the first column.
+            df2 (pd.DataFrame): Expression data of the second condition, with the same genes as `df1`.
+            ties_method (str): Ranking method for ties within pseudo-observations.
+        """
+        assert np.array_equal(
+            df1.iloc[:, 0].values, df2.iloc[:, 0].values
+        ), "Gene lists must match!"
+        # The rank signature of every gene: its ranks in the first condition followed by those in the second
+        signatures = np.hstack(
+            [
+                rankdata(df.iloc[:, 1:].values.astype(float), method=ties_method, axis=1)
+                for df in (df1, df2)
+            ]
+        )
+        _, first, classes = np.unique(
+            signatures, axis=0, return_index=True, return_inverse=True
+        )
+        # Number the classes in the order of their first gene, which is their representative
+        order = np.argsort(first)
+        renumber = np.empty_like(order)
+        renumber[order] = np.arange(len(order))
+        self.classes = renumber[classes.ravel()]
+        self.representatives = first[order]
+        self.sizes = np.bincount(self.classes)
+
+    @property
+    def n_genes(self):
+        return len(self.classes)
+
+    @property
+    def n_classes(self):
+        return len(self.representatives)
+
+    @property
+    def n_pairs(self):
+        return self.n_genes * (self.n_genes - 1) // 2
+
+    def pairs(self) -> np.ndarray:
+        """
+        Returns the gene index pairs to compute: the representatives of every pair of classes, followed by one
+        pair of two members of every class with more than one gene.
+        """
+        between = self.representatives[
+            GeneExpressionAnalyzer.condensed_to_pairs(
+                np.arange(self.n_classes * (self.n_classes - 1) // 2), self.n_classes
+            )
+        ]
+        repeated = np.flatnonzero(self.sizes > 1)
+        # The second member of a class is the first gene of the class after its representative
+        members = np.argsort(self.classes, kind="stable")
+        second = members[np.cumsum(self.sizes)[repeated] - self.sizes[repeated] + 1]
+        within = np.column_stack([self.representatives[repeated], second])
+        return np.vstack([between, within]).astype(np.int64)
+
+    def class_pair_index(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """
+        Returns the condensed position of every pair of distinct classes (a, b), in either order.
+        """
+        low, high = np.minimum(a, b), np.maximum(a, b)
+        return self.n_classes * low - low * (low + 1) // 2 + high - low - 1
+
+    def expand(self, results, gene_names, condition=CONDITION_LABEL) -> pd.DataFrame:
+        """
+        Expands the results of the pairs returned by `pairs` to all gene pairs.
+
+        Args:
+            results (np.ndarray): Structured array of PAIR_RESULT_DTYPE with the computed pairs, in any order.
+            gene_names (np.ndarray): Name of every gene index.
+            condition (str): Label of the Condition column.
+
+        Returns:
+            pd.DataFrame: One row per gene pair in the condensed order, with the columns Target, Regulator,
+                          Condition and Weight. Pairs whose representative failed are left out.
+        """
+        # Weights of all pairs of classes in the condensed layout, and the weight within every class
+        between = np.full(self.n_classes * (self.n_classes - 1) // 2, np.nan)
+        within = np.full(self.n_classes, np.nan)
+        a = self.classes[results["regulator"]]
+        b = self.classes[results["target"]]
+        same = a == b
+        within[a[same]] = results["weight"][same]
+        between[self.class_pair_index(a[~same], b[~same])] = results["weight"][~same]
+
+        pairs = GeneExpressionAnalyzer.condensed_to_pairs(
+            np.arange(self.n_pairs), self.n_genes
+        )
+        a, b = self.classes[pairs[:, 0]], self.classes[pairs[:, 1]]
+        same = a == b
+        weights = np.empty(self.n_pairs)
+        weights[same] = within[a[same]]
+        weights[~same] = between[self.class_pair_index(a[~same], b[~same])]
+        computed = ~np.isnan(weights)
+        expanded = np.empty(np.count_nonzero(computed), dtype=results.dtype)
+        expanded["regulator"] = pairs[computed, 0]
+        expanded["target"] = pairs[computed, 1]
+        expanded["weight"] = weights[computed]
+        return GeneExpressionAnalyzer.to_network(expanded, gene_names, condition)
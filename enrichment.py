@@ -0,0 +1,394 @@
+import gzip
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import hypergeom
+
+NAMESPACES = {
+    "biological_process": "BP",
+    "molecular_function": "MF",
+    "cellular_component": "CC",
+}
+GAF_ASPECTS = {"P": "BP", "F": "MF", "C": "CC"}
+GENE2GO_CATEGORIES = {"Process": "BP", "Function": "MF", "Component": "CC"}
+
+
+def open_text(path):
+    return gzip.open(path, "rt") if str(path).endswith(".gz") else open(path)
+
+
+def parse_obo(path: str) -> dict:
+    """
+    Parses the [Term] stanzas of a GO OBO file.
+
+    Args:
+        path (str): Path of the OBO file (optionally gzip-compressed).
+
+    Returns:
+        dict: Maps every non-obsolete GO id to a dictionary with its `name`, `ontology` (BP, MF or CC) and
+              `parents` (the targets of its is_a and part_of relations).
+    """
+    terms = {}
+    term = None
+    with open_text(path) as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith("["):
+                term = {"parents": []} if line == "[Term]" else None
+                continue
+            if term is None or ": " not in line:
+                continue
+            key, value = line.split(": ", 1)
+            if key == "id":
+                term["id"] = value
+                terms[value] = term
+            elif key == "name":
+                term["name"] = value
+            elif key == "namespace":
+                term["ontology"] = NAMESPACES.get(value)
+            elif key == "is_a":
+                term["parents"].append(value.split(" ! ")[0].strip())
+            elif key == "relationship" and value.startswith("part_of "):
+                term["parents"].append(value.split()[1])
+            elif key == "is_obsolete" and value == "true":
+                term["obsolete"] = True
+
+    return {
+        go_id: {
+            "name": term.get("name", ""),
+            "ontology": term.get("ontology"),
+            "parents": term["parents"],
+        }
+        for go_id, term in terms.items()
+        if not term.get("obsolete")
+    }
+
+
+def parse_annotations(path: str, key_type: str = "SYMBOL") -> pd.DataFrame:
+    """
+    Reads gene to GO term annotations from a GO annotation file (GAF 2.x) or an NCBI gene2go file.
+
+    Args:
+        path (str): Path of the annotation file (optionally gzip-compressed).
+        key_type (str): Gene identifier to use. 'SYMBOL' and 'UNIPROT' are read from GAF files (DB object symbol
+                        and DB object id), 'ENTREZID' from gene2go files.
+
+    Returns:
+        pd.DataFrame: The direct annotations with the columns gene, go_id and ontology. Annotations qualified
+                      with NOT are dropped.
+
+    Raises:
+        ValueError: If the key type is not available in the given file.
+    """
+    with open_text(path) as file:
+        first_line = file.readline()
+
+    if first_line.startswith("#tax_id"):
+        if key_type != "ENTREZID":
+            raise ValueError("gene2go files only provide the key type 'ENTREZID'.")
+        annotations = pd.read_csv(
+            path, sep="\t", usecols=[1, 2, 4, 7], dtype=str, header=0
+        )
+        annotations.columns = ["gene", "go_id", "qualifier", "category"]
+        annotations["ontology"] = annotations["category"].map(GENE2GO_CATEGORIES)
+    else:
+        gaf_columns = {"SYMBOL": 2, "UNIPROT": 1}
+        if key_type not in gaf_columns:
+            raise ValueError(
+                f"GAF files only provide the key types {', '.join(gaf_columns)}."
+            )
+        annotations = pd.read_csv(
+            path,
+            sep="\t",
+            comment="!",
+            header=None,
+            usecols=[gaf_columns[key_type], 3, 4, 8],
+            dtype=str,
+        )
+        annotations.columns = ["gene", "qualifier", "go_id", "aspect"]
+        annotations["ontology"] = annotations["aspect"].map(GAF_ASPECTS)
+
+    negated = annotations["qualifier"].fillna("").str.contains("NOT")
+    return annotations.loc[~negated, ["gene", "go_id", "ontology"]].drop_duplicates()
+
+
+def adjust_pvalues(pvalues: np.ndarray, method: str = "BH") -> np.ndarray:
+    """
+    Adjusts p-values for multiple testing, following R's p.adjust.
+
+    Args:
+        pvalues (np.ndarray): The raw p-values.
+        method (str): 'BH' (or 'fdr'), 'BY', 'bonferroni', 'holm' or 'none'.
+
+    Returns:
+        np.ndarray: The adjusted p-values, in the order of `pvalues`.
+
+    Raises:
+        ValueError: If the method is not supported.
+    """
+    pvalues = np.asarray(pvalues, dtype=float)
+    n = len(pvalues)
+    if n == 0 or method == "none":
+        return pvalues.copy()
+    if method == "bonferroni":
+        return np.minimum(pvalues * n, 1.0)
+
+    if method in ("BH", "fdr", "BY"):
+        # Step-up: p_(i) * n / i, made monotone from the largest p-value downwards
+        order = np.argsort(pvalues)[::-1]
+        scale = np.sum(1.0 / np.arange(1, n + 1)) if method == "BY" else 1.0
+        ranks = np.arange(n, 0, -1)
+        adjusted = np.minimum.accumulate(scale * n / ranks * pvalues[order])
+    elif method == "holm":
+        # Step-down: p_(i) * (n - i + 1), made monotone from the smallest p-value upwards
+        order = np.argsort(pvalues)
+        adjusted = np.maximum.accumulate((n - np.arange(n)) * pvalues[order])
+    else:
+        raise ValueError(f"Unsupported p-value adjustment method: {method}")
+
+    result = np.empty(n)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+class GOAnnotationIndex:
+    """
+    Gene to GO term annotations of one ontology, propagated to all ancestor terms (true path rule) and stored as
+    a sparse term x gene membership matrix for vectorized enrichment tests.
+    """
+
+    def __init__(self, terms: list, names: list, genes: list, membership: sparse.csr_matrix):
+        """
+        Args:
+            terms (list): GO ids, one per row of `membership`.
+            names (list): GO term names, one per row of `membership`.
+            genes (list): Gene identifiers, one per column of `membership`.
+            membership (sparse.csr_matrix): Boolean matrix, True where a gene is annotated with a term.
+        """
+        self.terms = np.asarray(terms, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.genes = np.asarray(genes, dtype=object)
+        self.membership = membership
+        self.gene_index = {gene: index for index, gene in enumerate(genes)}
+
+    @classmethod
+    def build(cls, annotation_file: str, obo_file: str, ontology: str, key_type: str = "SYMBOL"):
+        """
+        Builds the index of one ontology from an annotation file and the GO OBO file.
+        """
+        terms = parse_obo(obo_file)
+        annotations = parse_annotations(annotation_file, key_type)
+        annotations = annotations[
+            (annotations["ontology"] == ontology) & annotations["go_id"].isin(terms)
+        ]
+
+        # Ancestors of every term within the ontology, computed once per term
+        ancestors = {}
+
+        def ancestors_of(go_id):
+            if go_id not in ancestors:
+                ancestors[go_id] = {go_id}
+                for parent in terms[go_id]["parents"]:
+                    if parent in terms and terms[parent]["ontology"] == ontology:
+                        ancestors[go_id] |= ancestors_of(parent)
+            return ancestors[go_id]
+
+        if annotations.empty:
+            return cls([], [], [], sparse.csr_matrix((0, 0), dtype=bool))
+
+        genes, gene_codes = np.unique(annotations["gene"].values, return_inverse=True)
+        go_ids, go_codes = np.unique(annotations["go_id"].values, return_inverse=True)
+
+        # Row indices of the ancestors of every annotated term, stored back to back
+        term_codes = {}
+        ancestor_rows = [
+            [term_codes.setdefault(ancestor, len(term_codes)) for ancestor in ancestors_of(go_id)]
+            for go_id in go_ids
+        ]
+        lengths = np.array([len(rows) for rows in ancestor_rows])
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        flat_rows = np.concatenate(ancestor_rows).astype(np.int64)
+
+        # Every annotation expands into one entry per ancestor of its term
+        counts = lengths[go_codes]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = flat_rows[np.repeat(starts[go_codes], counts) + offsets]
+        cols = np.repeat(gene_codes, counts)
+
+        membership = sparse.coo_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(term_codes), len(genes)),
+        ).tocsr()
+        # Duplicate entries (a gene reaching a term through several paths) were summed up
+        membership.data = np.ones_like(membership.data, dtype=bool)
+        term_ids = list(term_codes)
+        return cls(
+            term_ids,
+            [terms[go_id]["name"] for go_id in term_ids],
+            list(genes),
+            membership,
+        )
+
+    @classmethod
+    def load(
+        cls,
+        annotation_file: str,
+        obo_file: str,
+        ontology: str,
+        key_type: str = "SYMBOL",
+        cache_dir: str = None,
+    ):
+        """
+        Returns the index of one ontology, from the on-disk cache if the annotation and OBO files did not change
+        since it was built, otherwise builds and caches it.
+
+        Args:
+            cache_dir (str): Directory of the cache. Defaults to $XDG_CACHE_HOME/codc (~/.cache/codc).
+        """
+        cache_dir = cache_dir or os.path.join(
+            os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "codc"
+        )
+        fingerprint = "|".join(
+            [ontology, key_type]
+            + [
+                f"{os.path.abspath(path)}:{os.stat(path).st_mtime_ns}:{os.stat(path).st_size}"
+                for path in (annotation_file, obo_file)
+            ]
+        )
+        cache_path = os.path.join(
+            cache_dir, f"go_index_{hashlib.sha1(fingerprint.encode()).hexdigest()}.pkl"
+        )
+
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as file:
+                return pickle.load(file)
+
+        index = cls.build(annotation_file, obo_file, ontology, key_type)
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent runs never read a partial cache
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+        return index
+
+    def enrich(
+        self,
+        genes,
+        p_adjust_method: str = "BH",
+        pvalue_cutoff: float = 0.05,
+        qvalue_cutoff: float = 0.2,
+        min_size: int = 10,
+        max_size: int = 500,
+    ) -> pd.DataFrame:
+        """
+        Over-representation analysis of `genes` with a one-sided hypergeometric test per GO term, using all
+        annotated genes of the ontology as the universe (the defaults of clusterProfiler's enrichGO).
+
+        Args:
+            genes (iterable): The genes to test. Genes without annotation in the ontology are ignored.
+            p_adjust_method (str): Multiple testing correction, see `adjust_pvalues`.
+            pvalue_cutoff (float): Cutoff applied to both the raw and the adjusted p-values.
+            qvalue_cutoff (float): Cutoff applied to the q-values. The q-values are the BH-adjusted p-values,
+                                   i.e. Storey's q-values with the conservative estimate pi0 = 1.
+            min_size (int): Minimum number of annotated universe genes of a tested term.
+            max_size (int): Maximum number of annotated universe genes of a tested term.
+
+        Returns:
+            pd.DataFrame: The significant terms, sorted by p-value, with the columns of enrichGO: ID, Description,
+                          GeneRatio, BgRatio, pvalue, p.adjust, qvalue, geneID and Count.
+        """
+        columns = ["ID", "Description", "GeneRatio", "BgRatio", "pvalue", "p.adjust", "qvalue", "geneID", "Count"]
+        gene_codes = np.unique(
+            [self.gene_index[gene] for gene in genes if gene in self.gene_index]
+        ).astype(int)
+        universe_size = len(self.genes)
+        query_size = len(gene_codes)
+        if query_size == 0:
+            return pd.DataFrame(columns=columns)
+
+        term_sizes = np.asarray(self.membership.sum(axis=1)).ravel()
+        tested = (term_sizes >= min_size) & (term_sizes <= max_size)
+        query = np.zeros(universe_size, dtype=np.int64)
+        query[gene_codes] = 1
+        overlaps = self.membership.astype(np.int64) @ query
+        # Like enrichGO, only terms annotated to at least one query gene are tested
+        tested_terms = np.flatnonzero(tested & (overlaps > 0))
+
+        pvalues = hypergeom.sf(
+            overlaps[tested_terms] - 1, universe_size, term_sizes[tested_terms], query_size
+        )
+        adjusted = adjust_pvalues(pvalues, p_adjust_method)
+        qvalues = adjust_pvalues(pvalues, "BH")
+        significant = (
+            (pvalues <= pvalue_cutoff) & (adjusted <= pvalue_cutoff) & (qvalues <= qvalue_cutoff)
+        )
+
+        rows = tested_terms[significant]
+        query_membership = self.membership[rows][:, gene_codes]
+        gene_ids = [
+            "/".join(self.genes[gene_codes[query_membership[k].indices]])
+            for k in range(len(rows))
+        ]
+        result = pd.DataFrame(
+            {
+                "ID": self.terms[rows],
+                "Description": self.names[rows],
+                "GeneRatio": [f"{count}/{query_size}" for count in overlaps[rows]],
+                "BgRatio": [f"{size}/{universe_size}" for size in term_sizes[rows]],
+                "pvalue": pvalues[significant],
+                "p.adjust": adjusted[significant],
+                "qvalue": qvalues[significant],
+                "geneID": gene_ids,
+                "Count": overlaps[rows],
+            },
+            columns=columns,
+        )
+        return result.sort_values(by=["pvalue", "ID"]).reset_index(drop=True)
+
+
+def network_genes(network_file: str, threshold: float) -> np.ndarray:
+    """
+    Returns the unique genes of all edges of a network file whose weight is at least `threshold`.
+    """
+    network = pd.read_csv(
+        network_file, sep="\t", usecols=["Target", "Regulator", "Weight"]
+    )
+    edges = network[network["Weight"] >= threshold]
+    return pd.unique(np.concatenate([edges["Target"].values, edges["Regulator"].values]))
+
+
+def plot_enrichment(result: pd.DataFrame, path: str, ontology: str, show_category: int = 10) -> bool:
+    """
+    Saves a bar plot of the gene counts of the `show_category` most significant terms, colored by adjusted
+    p-value, similar to the enrichplot bar plot. Requires matplotlib, which is optional.
+
+    Returns:
+        bool: Whether the plot was saved.
+    """
+    if result.empty:
+        return False
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    top = result.head(show_category).iloc[::-1]
+    fig, ax = plt.subplots(figsize=(2000 / 300, 1600 / 300), dpi=300)
+    colors = plt.cm.coolwarm_r(
+        (top["p.adjust"] - top["p.adjust"].min()) / (np.ptp(top["p.adjust"]) or 1)
+    )
+    ax.barh(top["Description"], top["Count"], color=colors)
+    ax.set_xlabel("Count")
+    ax.set_title(f"GO Enrichment Analysis - {ontology} Ontology")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return True
@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from scipy.stats import ks_2samp
+
+from analyzer import GeneExpressionAnalyzer
+
+
+def read_gene_sets(path: str) -> dict:
+    """
+    Reads gene sets from a GMT file: one set per line with its name, a description and its genes, all
+    tab-separated.
+
+    Returns:
+        dict: Maps the name of every set to the list of its genes.
+
+    Raises:
+        ValueError: If a line has no genes or a set name is given more than once.
+    """
+    gene_sets = {}
+    with open(path) as file:
+        for line_number, line in enumerate(file, start=1):
+            fields = [field.strip() for field in line.rstrip("\n").split("\t")]
+            if not any(fields):
+                continue
+            name, genes = fields[0], [gene for gene in fields[2:] if gene]
+            if not genes:
+                raise ValueError(f"Line {line_number} of {path} has no genes.")
+            if name in gene_sets:
+                raise ValueError(f"The gene set {name} is given more than once in {path}.")
+            gene_sets[name] = genes
+    return gene_sets
+
+
+class GeneSetAnalyzer:
+    """
+    Computes the differential coexpression weight of gene sets: the Kolmogorov-Smirnov statistic between the
+    d-dimensional empirical copulas of the genes of a set in both conditions, the generalization of the pair
+    weight to triplets and small modules. The pseudo-observations are computed once per gene and condition
+    and every task computes a batch of sets.
+    """
+
+    def __init__(self, empirical_copula):
+        """
+        Args:
+            empirical_copula (EmpiricalCopula): Used to compute the empirical copulas.
+        """
+        self.empirical_copula = empirical_copula
+
+    @staticmethod
+    def index_gene_sets(gene_sets: dict, gene_names) -> list:
+        """
+        Converts the genes of every set into gene indices.
+
+        Raises:
+            ValueError: If a set has fewer than two distinct genes or contains a gene of neither condition.
+        """
+        index = pd.Index(gene_names)
+        indices = []
+        for name, genes in gene_sets.items():
+            genes = list(dict.fromkeys(genes))
+            positions = index.get_indexer(genes)
+            if np.any(positions < 0):
+                missing = [gene for gene, position in zip(genes, positions) if position < 0]
+                raise ValueError(
+                    f"The gene set {name} contains genes missing from the input: {', '.join(missing)}."
+                )
+            if len(positions) < 2:
+                raise ValueError(f"The gene set {name} needs at least two distinct genes.")
+            indices.append(positions)
+        return indices
+
+    def set_weight(self, u1: np.ndarray, u2: np.ndarray, smoothing, ks_stat_method):
+        """
+        Computes the weight of a gene set from its pseudo-observations in both conditions, samples in rows and
+        genes in columns.
+        """
+        ec1 = self.empirical_copula.pseudo_observations_copula(u1, u1, smoothing)
+        ec2 = self.empirical_copula.pseudo_observations_copula(u2, u2, smoothing)
+        ks_stat, _ = ks_2samp(ec1, ec2, method=ks_stat_method)
+        return ks_stat
+
+    def compute_batch(self, batch, shm_names, shapes, smoothing, ks_stat_method):
+        """
+        Computes the weights of a batch of gene sets. Runs inside a worker process and reads the
+        pseudo-observations from shared memory.
+
+        Args:
+            batch (tuple): The position of the first set of the batch and the gene indices of every set.
+
+        Returns:
+            np.ndarray: The weight of every set, NaN for sets that failed.
+        """
+        shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+        conditions = [np.ndarray(shape, buffer=shm.buf) for shape, shm in zip(shapes, shms)]
+
+        _, gene_sets = batch
+        weights = np.empty(len(gene_sets))
+        for k, genes in enumerate(gene_sets):
+            try:
+                weights[k] = self.set_weight(
+                    conditions[0][:, genes],
+                    conditions[1][:, genes],
+                    smoothing,
+                    ks_stat_method,
+                )
+            except Exception as e:
+                print(f"Error processing gene set {k}: {e}")
+                weights[k] = np.nan
+
+        del conditions
+        for shm in shms:
+            shm.close()
+        return weights
+
+    def compute_gene_sets(
+        self,
+        shared_conditions,
+        gene_sets: list,
+        smoothing="none",
+        ks_stat_method="asymp",
+        batch_size=100,
+        max_workers=None,
+        executor=None,
+        max_in_flight=None,
+        verbose=True,
+    ) -> np.ndarray:
+        """
+        Computes the weight of every gene set.
+
+        Args:
+            shared_conditions (SharedConditions): The pseudo-observations of both conditions.
+            gene_sets (list): The gene indices of every set, as returned by `index_gene_sets`.
+            smoothing (str): Smoothing applied to the empirical copula: 'none', 'beta' or 'checkerboard'.
+            ks_stat_method (str): Mode of the ks_2samp function.
+            batch_size (int): Number of gene sets per task.
+            max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+            executor (ProcessPoolExecutor): An already running executor to submit the batches to.
+            max_in_flight (int): Maximum number of batches submitted at any time. Defaults to twice the number of
+                                 workers.
+            verbose (bool): Whether to print a progress bar.
+
+        Returns:
+            np.ndarray: The weight of every set, in the order of `gene_sets`.
+        """
+        max_workers = max_workers or os.cpu_count()
+        max_in_flight = max_in_flight or 2 * max_workers
+        weights = np.empty(len(gene_sets))
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            progress = tqdm(
+                total=-(-len(gene_sets) // batch_size),
+                desc="Computing gene sets",
+                unit="batch",
+                disable=not verbose,
+            )
+            batches = (
+                (start, gene_sets[start : start + batch_size])
+                for start in range(0, len(gene_sets), batch_size)
+            )
+            args = (
+                [shm.name for shm in shared_conditions.shms],
+                shared_conditions.shapes,
+                smoothing,
+                ks_stat_method,
+            )
+            for (start, batch_sets), batch_weights in GeneExpressionAnalyzer.submit_bounded(
+                executor, self.compute_batch, batches, args, max_in_flight
+            ):
+                weights[start : start + len(batch_sets)] = batch_weights
+                progress.update(1)
+            progress.close()
+        finally:
+            if owns_executor:
+                executor.shutdown()
+        return weights
+
+    @staticmethod
+    def to_table(gene_sets: dict, weights: np.ndarray) -> pd.DataFrame:
+        """
+        Returns the weights as a table with the columns GeneSet, Size, Genes and Weight, sorted by decreasing
+        weight.
+        """
+        table = pd.DataFrame(
+            {
+                "GeneSet": list(gene_sets),
+                "Size": [len(dict.fromkeys(genes)) for genes in gene_sets.values()],
+                "Genes": [",".join(dict.fromkeys(genes)) for genes in gene_sets.values()],
+                "Weight": weights,
+            }
+        )
+        return table.sort_values("Weight", ascending=False, kind="stable").reset_index(
+            drop=True
+        )
@@ -0,0 +1,233 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from analyzer import GeneExpressionAnalyzer
+from profiling import NullProfiler, batch_profiler, batch_stats
+
+# Pseudo-observations are multiples of 1 / (n + 1); without the tolerance rounding errors could move a value
+# that lies exactly on a grid line into the next bin
+BIN_TOLERANCE = 1e-9
+
+
+class GridCopula:
+    """
+    Approximates the differential coexpression weight of a gene pair by evaluating the empirical copulas on a
+    fixed G x G grid instead of at every sample. The pseudo-observations of every gene are binned into G
+    intervals of [0, 1]; the copula of a pair at all grid points follows from the 2-D histogram of the bins
+    and its cumulative sums, in O(n + G^2) instead of O(n^2).
+
+    The copula value of every sample is replaced by the value at the upper corner of its grid cell, which
+    overestimates it by the fraction of samples that lie in the same row or column of cells above it: about
+    2 / G without ties. The Kolmogorov-Smirnov statistic is computed between the distributions of these values,
+    each grid cell weighted by its number of samples. With G >= n + 1 every sample has its own grid line and the
+    weights are exact.
+    """
+
+    def __init__(self, grid_size: int):
+        """
+        Args:
+            grid_size (int): Number of grid intervals G per dimension.
+
+        Raises:
+            ValueError: If the grid size is smaller than 1.
+        """
+        if grid_size < 1:
+            raise ValueError(f"The grid size must be at least 1, got {grid_size}.")
+        self.grid_size = grid_size
+
+    def bin_pseudo_observations(self, pseudo_observations: np.ndarray) -> np.ndarray:
+        """
+        Returns the grid interval (1 to G) of every pseudo-observation: the value lies in ((b - 1) / G, b / G].
+        """
+        bins = np.ceil(pseudo_observations * self.grid_size - BIN_TOLERANCE)
+        return np.clip(bins, 1, self.grid_size).astype(np.int32)
+
+    def grid_copula(self, bins_x: np.ndarray, bins_y: np.ndarray):
+        """
+        Computes the empirical copula of a pair at the grid points from the bins of both genes.
+
+        Returns:
+            tuple: The copula values at the grid points (a / G, b / G), shape (G + 1, G + 1), and the number of
+                   samples in every grid cell, of the same shape.
+        """
+        size = self.grid_size + 1
+        counts = np.bincount(bins_x * size + bins_y, minlength=size * size).reshape(
+            size, size
+        )
+        return counts.cumsum(axis=0).cumsum(axis=1) / len(bins_x), counts
+
+    def pair_weight(self, bins1: np.ndarray, bins2: np.ndarray) -> float:
+        """
+        Computes the approximate weight of a gene pair.
+
+        Args:
+            bins1 (np.ndarray): Bins of both genes in the first condition, shape (n1, 2).
+            bins2 (np.ndarray): Bins of both genes in the second condition, shape (n2, 2).
+
+        Returns:
+            float: The Kolmogorov-Smirnov statistic between the grid copula values of both conditions.
+        """
+        values, weights = [], []
+        for bins, sign in ((bins1, 1.0), (bins2, -1.0)):
+            copula, counts = self.grid_copula(bins[:, 0], bins[:, 1])
+            occupied = counts > 0
+            values.append(copula[occupied])
+            weights.append(sign * counts[occupied] / len(bins))
+        values = np.concatenate(values)
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        difference = np.cumsum(np.concatenate(weights)[order])
+        # The distribution functions are compared after the last sample of every distinct value
+        last_of_value = np.append(values[1:] != values[:-1], True)
+        return float(np.max(np.abs(difference[last_of_value])))
+
+
+class GridCopulaAnalyzer:
+    """
+    Computes the approximate weights of all gene pairs with `GridCopula` in parallel. The pseudo-observations of
+    both conditions are read from a `SharedConditions` and every tile bins the genes it needs once.
+    """
+
+    def __init__(self, grid_size: int):
+        """
+        Args:
+            grid_size (int): Number of grid intervals G per dimension.
+        """
+        self.grid_copula = GridCopula(grid_size)
+
+    def compute_tile(self, bounds, shm_names, shapes, profile=False):
+        """
+        Computes the weights of the gene pairs at the positions [start, stop) of the condensed pair ordering.
+        Runs inside a worker process and reads the pseudo-observations from shared memory.
+
+        Returns:
+            np.ndarray: The weight of every pair, NaN for pairs that failed. If `profile` is set, a tuple of the
+                        weights and the profiler snapshot of the tile.
+        """
+        profiler = batch_profiler(profile)
+
+        with profiler.stage("attach_shared_memory"):
+            shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+            conditions = [
+                np.ndarray(shape, buffer=shm.buf) for shape, shm in zip(shapes, shms)
+            ]
+
+        start, stop = bounds
+        pairs = GeneExpressionAnalyzer.condensed_to_pairs(
+            np.arange(start, stop), shapes[0][1]
+        )
+        with profiler.stage("binning"):
+            genes, pair_columns = np.unique(pairs, return_inverse=True)
+            pair_columns = pair_columns.reshape(pairs.shape)
+            bins1, bins2 = [
+                self.grid_copula.bin_pseudo_observations(condition[:, genes])
+                for condition in conditions
+            ]
+
+        weights = np.empty(len(pairs))
+        with profiler.stage("grid_copula"):
+            for k, columns in enumerate(pair_columns):
+                try:
+                    weights[k] = self.grid_copula.pair_weight(
+                        bins1[:, columns], bins2[:, columns]
+                    )
+                except Exception as e:
+                    i, j = pairs[k]
+                    print(f"Error processing pair ({i}, {j}): {e}")
+                    weights[k] = np.nan
+
+        del conditions
+        for shm in shms:
+            shm.close()
+
+        if profiler.enabled:
+            profiler.pairs = len(pairs)
+            return weights, profiler.snapshot()
+        return weights
+
+    def compute_condensed(
+        self,
+        shared_conditions,
+        batch_size=1000,
+        max_workers=None,
+        executor=None,
+        max_in_flight=None,
+        profiler=None,
+        monitor=None,
+        verbose=True,
+    ) -> np.ndarray:
+        """
+        Computes the approximate weight of every gene pair of two conditions.
+
+        Args:
+            shared_conditions (SharedConditions): The pseudo-observations of both conditions.
+            batch_size (int): Number of gene pairs per tile.
+            max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+            executor (ProcessPoolExecutor): An already running executor to submit the tiles to.
+            max_in_flight (int): Maximum number of tiles submitted at any time. Defaults to twice the number of
+                                 workers.
+            profiler (RunProfiler): If given, the time spent in every stage is recorded into it.
+            monitor (ProgressMonitor): If given, the progress of the run is reported to it.
+            verbose (bool): Whether to print a progress bar.
+
+        Returns:
+            np.ndarray: The weights in the condensed layout of `compute_condensed`.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
+        n_genes = shared_conditions.n_genes
+        n_pairs = n_genes * (n_genes - 1) // 2
+        max_workers = max_workers or os.cpu_count()
+        max_in_flight = max_in_flight or 2 * max_workers
+        collect_stats = batch_stats(profiler, monitor)
+
+        weights = np.empty(n_pairs)
+        if profiler:
+            profiler.start_compute()
+        if monitor:
+            monitor.start(n_pairs, shared_memory_bytes=shared_conditions.nbytes)
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            progress = tqdm(
+                total=-(-n_pairs // batch_size),
+                desc=f"Computing distances (grid {self.grid_copula.grid_size})",
+                unit="batch",
+                disable=not verbose,
+            )
+            tiles = (
+                (start, min(start + batch_size, n_pairs))
+                for start in range(0, n_pairs, batch_size)
+            )
+            args = (
+                [shm.name for shm in shared_conditions.shms],
+                shared_conditions.shapes,
+                collect_stats,
+            )
+            for (start, stop), tile_weights in GeneExpressionAnalyzer.submit_bounded(
+                executor, self.compute_tile, tiles, args, max_in_flight, stage
+            ):
+                if collect_stats:
+                    tile_weights, snapshot = tile_weights
+                if profiler:
+                    profiler.add_batch(snapshot, received=time.time())
+                if monitor:
+                    monitor.record_batch(stop - start, snapshot["pid"], snapshot["end"])
+                with stage("result_collection"):
+                    weights[start:stop] = tile_weights
+                progress.update(1)
+            progress.close()
+        finally:
+            if owns_executor:
+                executor.shutdown()
+            if profiler:
+                profiler.end_compute()
+            if monitor:
+                monitor.stop()
+        return weights
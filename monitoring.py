@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+
+from profiling import current_rss_bytes
+
+
+class ProgressMonitor:
+    """
+    Periodically writes machine-readable progress of a run to a file, so long-running jobs can be watched from
+    outside (e.g. by a Prometheus node exporter textfile collector or by tailing a JSON lines file).
+
+    The computation only updates a few counters through `record_batch`; formatting and writing happens on a
+    background thread every `interval` seconds, off the hot path.
+    """
+
+    FORMAT_JSONL = "jsonl"
+    FORMAT_PROMETHEUS = "prometheus"
+
+    def __init__(self, path: str, file_format: str = FORMAT_JSONL, interval: float = 10.0):
+        """
+        Args:
+            path (str): File the metrics are written to. JSON lines are appended, the Prometheus textfile is
+                        replaced atomically on every write.
+            file_format (str): 'jsonl' or 'prometheus'.
+            interval (float): Seconds between two writes.
+        """
+        if file_format not in (self.FORMAT_JSONL, self.FORMAT_PROMETHEUS):
+            raise ValueError(f"Unsupported metrics format: {file_format}")
+        self.path = path
+        self.file_format = file_format
+        self.interval = interval
+
+        self.pairs_total = 0
+        self.pairs_done = 0
+        self.shared_memory_bytes = 0
+        self.heartbeats = {}
+        self.start_time = None
+        self.finished = False
+        self._last_sample = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, pairs_total: int, shared_memory_bytes: int = 0) -> None:
+        """
+        Starts the background writer for a run of `pairs_total` gene pairs.
+        """
+        self.pairs_total = pairs_total
+        self.pairs_done = 0
+        self.shared_memory_bytes = shared_memory_bytes
+        self.heartbeats = {}
+        self.finished = False
+        self.start_time = time.time()
+        self._last_sample = (self.start_time, 0)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="codc-progress-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def record_batch(self, pairs: int, pid: int = None, finished: float = None) -> None:
+        """
+        Records a finished batch. Called on the hot path, so it only updates counters.
+
+        Args:
+            pairs (int): Number of gene pairs of the batch.
+            pid (int): Process id of the worker that computed the batch.
+            finished (float): Time at which the worker finished the batch.
+        """
+        self.pairs_done += pairs
+        if pid is not None:
+            self.heartbeats[pid] = finished or time.time()
+
+    def stop(self) -> None:
+        """
+        Stops the background writer and writes the final state of the run.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.finished = True
+        self.write()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current progress of the run.
+        """
+        now = time.time()
+        pairs_done = self.pairs_done
+        elapsed = now - self.start_time if self.start_time else 0.0
+
+        # Throughput since the previous write, falling back to the average of the whole run
+        last_time, last_pairs = self._last_sample or (now, 0)
+        self._last_sample = (now, pairs_done)
+        if now > last_time and pairs_done > last_pairs:
+            pairs_per_sec = (pairs_done - last_pairs) / (now - last_time)
+        else:
+            pairs_per_sec = pairs_done / elapsed if elapsed else 0.0
+
+        remaining = self.pairs_total - pairs_done
+        return {
+            "timestamp": now,
+            "elapsed_seconds": elapsed,
+            "pairs_done": pairs_done,
+            "pairs_total": self.pairs_total,
+            "pairs_per_sec": pairs_per_sec,
+            "eta_seconds": remaining / pairs_per_sec if pairs_per_sec else None,
+            "workers": {
+                str(pid): heartbeat for pid, heartbeat in dict(self.heartbeats).items()
+            },
+            "parent_rss_bytes": current_rss_bytes(),
+            "shared_memory_bytes": self.shared_memory_bytes,
+            "finished": self.finished,
+        }
+
+    def write(self) -> None:
+        snapshot = self.snapshot()
+        if self.file_format == self.FORMAT_JSONL:
+            with open(self.path, "a") as file:
+                file.write(json.dumps(snapshot) + "\n")
+        else:
+            # Write to a temporary file first, collectors must never read a partially written file
+            temporary_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary_path, "w") as file:
+                file.write(self.format_prometheus(snapshot))
+            os.replace(temporary_path, self.path)
+
+    @staticmethod
+    def format_prometheus(snapshot: dict) -> str:
+        """
+        Renders a snapshot in the Prometheus text exposition format.
+        """
+        gauges = [
+            ("codc_pairs_done", "Gene pairs computed so far.", snapshot["pairs_done"]),
+            ("codc_pairs_total", "Gene pairs of the run.", snapshot["pairs_total"]),
+            (
+                "codc_pairs_per_second",
+                "Recent throughput in gene pairs per second.",
+                snapshot["pairs_per_sec"],
+            ),
+            (
+                "codc_eta_seconds",
+                "Estimated seconds until the run finishes.",
+                snapshot["eta_seconds"] if snapshot["eta_seconds"] is not None else "NaN",
+            ),
+            (
+                "codc_parent_rss_bytes",
+                "Resident memory of the parent process.",
+                snapshot["parent_rss_bytes"],
+            ),
+            (
+                "codc_shared_memory_bytes",
+                "Size of the shared memory holding the expression data.",
+                snapshot["shared_memory_bytes"],
+            ),
+            ("codc_finished", "1 once the run has finished.", int(snapshot["finished"])),
+            ("codc_last_update_timestamp_seconds", "Time of this update.", snapshot["timestamp"]),
+        ]
+        lines = []
+        for name, description, value in gauges:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name} {value}"]
+        lines += [
+            "# HELP codc_worker_last_heartbeat_timestamp_seconds Time at which a worker last finished a batch.",
+            "# TYPE codc_worker_last_heartbeat_timestamp_seconds gauge",
+        ]
+        lines += [
+            f'codc_worker_last_heartbeat_timestamp_seconds{{pid="{pid}"}} {heartbeat}'
+            for pid, heartbeat in snapshot["workers"].items()
+        ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,304 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from scipy.stats import ks_2samp
+
+from analyzer import GeneExpressionAnalyzer
+from profiling import NullProfiler, batch_profiler, batch_stats
+
+
+class SharedConditions:
+    """
+    The pseudo-observations of K conditions published in shared memory. The ranks of every gene are computed
+    once per condition here, instead of once per pair and comparison in the workers. Has to be released with
+    `close` (or by using it as a context manager).
+    """
+
+    def __init__(self, frames: dict, empirical_copula, ties_method="average"):
+        """
+        Args:
+            frames (dict): Maps the name of every condition to its expression data, gene names in the first
+                           column. All conditions must contain the same genes in the same order.
+            empirical_copula (EmpiricalCopula): Used to compute the pseudo-observations.
+            ties_method (str): Ranking method for ties within pseudo-observations.
+        """
+        self.names = list(frames)
+        self.gene_names = frames[self.names[0]].iloc[:, 0].values
+        for df in frames.values():
+            assert np.array_equal(
+                self.gene_names, df.iloc[:, 0].values
+            ), "Gene lists must match!"
+
+        self.shms = []
+        self.shapes = []
+        try:
+            for df in frames.values():
+                # Samples in rows and genes in columns
+                pseudo_observations = empirical_copula.pseudo_observations(
+                    df.iloc[:, 1:].values.T.astype(float), ties_method
+                )
+                shm = shared_memory.SharedMemory(
+                    create=True, size=pseudo_observations.nbytes
+                )
+                self.shms.append(shm)
+                np.copyto(
+                    np.ndarray(pseudo_observations.shape, buffer=shm.buf),
+                    pseudo_observations,
+                )
+                self.shapes.append(pseudo_observations.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def n_genes(self):
+        return len(self.gene_names)
+
+    @property
+    def nbytes(self):
+        return sum(shm.size for shm in self.shms)
+
+    def index(self, name: str) -> int:
+        return self.names.index(name)
+
+    def close(self):
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MultiConditionAnalyzer:
+    """
+    Computes the differential coexpression networks of several comparisons between K conditions in one run.
+    Every task computes a tile of gene pairs for all comparisons at once: the copula vector of a pair is
+    computed once per condition and shared by every comparison that involves the condition.
+    """
+
+    def __init__(self, empirical_copula):
+        """
+        Args:
+            empirical_copula (EmpiricalCopula): Used to compute the empirical copulas.
+        """
+        self.empirical_copula = empirical_copula
+
+    @staticmethod
+    def comparisons(names, reference=None) -> list:
+        """
+        Returns the comparisons between the given conditions: every condition against `reference`, or every pair
+        of conditions if no reference is given.
+
+        Raises:
+            ValueError: If the reference is not one of the conditions.
+        """
+        if reference is None:
+            return list(itertools.combinations(names, 2))
+        if reference not in names:
+            raise ValueError(f"The reference condition {reference} is not one of {', '.join(names)}.")
+        return [(reference, name) for name in names if name != reference]
+
+    def compute_tile(
+        self,
+        bounds,
+        shm_names,
+        shapes,
+        comparisons,
+        smoothing,
+        ks_stat_method,
+        profile=False,
+    ):
+        """
+        Computes the weights of the gene pairs at the positions [start, stop) of the condensed pair ordering for
+        every comparison. Runs inside a worker process and reads the pseudo-observations from shared memory.
+
+        Args:
+            bounds (tuple): The range (start, stop) of condensed positions to compute.
+            shm_names (list): Names of the shared memory of every condition.
+            shapes (list): Shapes (samples, genes) of the pseudo-observations of every condition.
+            comparisons (list): Pairs of condition indices to compare.
+            profile (bool | str): If True, the time spent in every stage is recorded and returned alongside the
+                                  weights; with 'progress' only the progress of the batch (see `batch_profiler`).
+
+        Returns:
+            np.ndarray: Array of shape (len(comparisons), stop - start), NaN for pairs that failed. If `profile`
+                        is set, a tuple of the weights and the profiler snapshot of the tile.
+        """
+        profiler = batch_profiler(profile)
+
+        with profiler.stage("attach_shared_memory"):
+            shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+            conditions = [
+                np.ndarray(shape, buffer=shm.buf) for shape, shm in zip(shapes, shms)
+            ]
+
+        start, stop = bounds
+        pairs = GeneExpressionAnalyzer.condensed_to_pairs(
+            np.arange(start, stop), shapes[0][1]
+        )
+        involved = sorted({condition for comparison in comparisons for condition in comparison})
+        weights = np.empty((len(comparisons), len(pairs)))
+        for k, (i, j) in enumerate(pairs):
+            try:
+                with profiler.stage("empirical_copula"):
+                    copulas = {}
+                    for condition in involved:
+                        u = conditions[condition][:, [i, j]]
+                        copulas[condition] = self.empirical_copula.pseudo_observations_copula(
+                            u, u, smoothing
+                        )
+                with profiler.stage("ks_test"):
+                    for m, (a, b) in enumerate(comparisons):
+                        weights[m, k], _ = ks_2samp(
+                            copulas[a], copulas[b], method=ks_stat_method
+                        )
+            except Exception as e:
+                print(f"Error processing pair ({i}, {j}): {e}")
+                weights[:, k] = np.nan
+
+        del conditions
+        for shm in shms:
+            shm.close()
+
+        if profiler.enabled:
+            profiler.pairs = len(pairs)
+            return weights, profiler.snapshot()
+        return weights
+
+    def compute_comparisons(
+        self,
+        shared_conditions,
+        comparisons,
+        smoothing="none",
+        ks_stat_method="asymp",
+        batch_size=1000,
+        max_workers=None,
+        executor=None,
+        max_in_flight=None,
+        profiler=None,
+        monitor=None,
+        verbose=True,
+    ) -> dict:
+        """
+        Computes the condensed weights of every gene pair for every comparison.
+
+        Args:
+            shared_conditions (SharedConditions): The pseudo-observations of the conditions.
+            comparisons (list): Pairs of condition names to compare.
+            smoothing (str): Smoothing applied to the empirical copula: 'none', 'beta' or 'checkerboard'.
+            ks_stat_method (str): Mode of the ks_2samp function.
+            batch_size (int): Number of gene pairs per tile.
+            max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+            executor (ProcessPoolExecutor): An already running executor to submit the tiles to.
+            max_in_flight (int): Maximum number of tiles submitted at any time. Defaults to twice the number of
+                                 workers.
+            profiler (RunProfiler): If given, the time spent in every stage is recorded into it.
+            monitor (ProgressMonitor): If given, the progress of the run is reported to it.
+            verbose (bool): Whether to print the run summary and a progress bar.
+
+        Returns:
+            dict: Maps every comparison to its weights in the condensed layout of `compute_condensed`.
+        """
+        stage = profiler.stage if profiler else NullProfiler().stage
+        n_genes = shared_conditions.n_genes
+        n_pairs = n_genes * (n_genes - 1) // 2
+        n_batches = -(-n_pairs // batch_size)
+        max_workers = max_workers or os.cpu_count()
+        max_in_flight = max_in_flight or 2 * max_workers
+        collect_stats = batch_stats(profiler, monitor)
+
+        if verbose:
+            print(f"Starting DC Copula coexpression calculation:")
+            print(f"-------------------------")
+            print(f" - Number of conditions: {len(shared_conditions.names)}")
+            print(f" - Number of comparisons: {len(comparisons)}")
+            print(f" - Number of gene pairs to be analyzed: {n_pairs}")
+            print(f" - Batch size: {batch_size}")
+            print(f" - Number of batches: {n_batches}")
+            print(f" - Number of workers: {max_workers}")
+            print(f" - Smoothing technique: {smoothing}")
+            print(f" - KS statistic mode: {ks_stat_method}")
+            print(f"-------------------------")
+
+        weights = np.empty((len(comparisons), n_pairs))
+        if profiler:
+            profiler.start_compute()
+        if monitor:
+            monitor.start(n_pairs, shared_memory_bytes=shared_conditions.nbytes)
+
+        owns_executor = executor is None
+        if owns_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            progress = tqdm(
+                total=n_batches,
+                desc="Computing distances",
+                unit="batch",
+                disable=not verbose,
+            )
+            tiles = (
+                (start, min(start + batch_size, n_pairs))
+                for start in range(0, n_pairs, batch_size)
+            )
+            args = (
+                [shm.name for shm in shared_conditions.shms],
+                shared_conditions.shapes,
+                [
+                    (shared_conditions.index(a), shared_conditions.index(b))
+                    for a, b in comparisons
+                ],
+                smoothing,
+                ks_stat_method,
+                collect_stats,
+            )
+            for (start, stop), tile_weights in GeneExpressionAnalyzer.submit_bounded(
+                executor, self.compute_tile, tiles, args, max_in_flight, stage
+            ):
+                if collect_stats:
+                    tile_weights, snapshot = tile_weights
+                if profiler:
+                    profiler.add_batch(snapshot, received=time.time())
+                if monitor:
+                    monitor.record_batch(stop - start, snapshot["pid"], snapshot["end"])
+                with stage("result_collection"):
+                    weights[:, start:stop] = tile_weights
+                progress.update(1)
+            progress.close()
+        finally:
+            if owns_executor:
+                executor.shutdown()
+            if profiler:
+                profiler.end_compute()
+            if monitor:
+                monitor.stop()
+
+        return dict(zip(comparisons, weights))
+
+    @staticmethod
+    def to_network(weights: np.ndarray, gene_names, condition: str) -> pd.DataFrame:
+        """
+        Converts condensed weights into a network with the columns Target, Regulator, Condition and Weight, in
+        the order of `compute_dc_copula_network_parallel`.
+        """
+        pairs = GeneExpressionAnalyzer.condensed_to_pairs(
+            np.arange(len(weights)), len(gene_names)
+        )
+        return pd.DataFrame(
+            {
+                "Target": gene_names[pairs[:, 1]],
+                "Regulator": gene_names[pairs[:, 0]],
+                "Condition": condition,
+                "Weight": weights,
+            }
+        )
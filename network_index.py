@@ -0,0 +1,255 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from analyzer import GeneExpressionAnalyzer
+
+
+class NetworkIndex:
+    """
+    A differential coexpression network stored gene by gene in a directory of memory-mapped `.npy` files, so
+    that the edges of a single gene can be read without loading the network. The layout is a CSR adjacency:
+    every edge is stored under both of its genes, `neighbors.npy` and `weights.npy` hold the partner and the
+    weight of the edges of gene 0, then gene 1 and so on, each gene's edges sorted by decreasing weight, and the
+    edges of gene `g` are found at positions [indptr[g], indptr[g + 1]) given by `indptr.npy`. The weights keep
+    the data type of the network they were built from, float64 for a network.tsv and float32 for a network.npy,
+    so that they match the network exactly. `index.json` holds the genes and the weight threshold of the index.
+
+    Reading the edges of a gene costs O(degree), and its top edges or its edges above a weight only touch the
+    part of its edges that is returned.
+    """
+
+    METADATA_FILE = "index.json"
+
+    def __init__(self, path: str, metadata: dict):
+        self.path = path
+        self.metadata = metadata
+        self.gene_names = np.asarray(metadata["genes"], dtype=object)
+        self.indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode="r")
+        self.neighbors = np.load(os.path.join(path, "neighbors.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+        self._index = {gene: position for position, gene in enumerate(self.gene_names)}
+
+    @property
+    def n_edges(self):
+        return len(self.neighbors) // 2
+
+    @property
+    def threshold(self):
+        return self.metadata["threshold"]
+
+    @classmethod
+    def open(cls, path: str):
+        """
+        Opens the index written to the directory `path`.
+        """
+        with open(os.path.join(path, cls.METADATA_FILE)) as file:
+            return cls(path, json.load(file))
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        gene_names,
+        edge_chunks,
+        threshold: float,
+        chunk_size: int = 10_000_000,
+        dtype=np.float64,
+    ):
+        """
+        Writes the index of a network given in chunks of edges to the directory `path`, replacing an existing
+        index. The edges are read twice, once to count the edges of every gene and once to write them to their
+        place, and the edges of every gene are then sorted in blocks of about `chunk_size` edges, so neither the
+        network nor the index has to fit into the memory.
+
+        Args:
+            path (str): Directory of the index, created if it does not exist.
+            gene_names (np.ndarray): Name of every gene index.
+            edge_chunks (callable): Returns a new iterator over chunks (rows, cols, weights) with the gene indices
+                                    and the weight of edges, each edge given once.
+            threshold (float): Smallest weight of an indexed edge. Edges without a weight (NaN) are left out.
+            chunk_size (int): Number of edges sorted at once.
+            dtype (str): Data type of the stored weights, that of the weights of the network.
+        """
+        n_genes = len(gene_names)
+        os.makedirs(path, exist_ok=True)
+
+        degrees = np.zeros(n_genes, dtype=np.int64)
+        for rows, cols, weights in cls._kept_edges(edge_chunks(), threshold):
+            degrees += np.bincount(rows, minlength=n_genes)
+            degrees += np.bincount(cols, minlength=n_genes)
+        indptr = np.concatenate([[0], np.cumsum(degrees)])
+        np.save(os.path.join(path, "indptr.npy"), indptr)
+
+        n_entries = int(indptr[-1])
+        neighbors = np.lib.format.open_memmap(
+            os.path.join(path, "neighbors.npy"), mode="w+", dtype=np.int32, shape=(n_entries,)
+        )
+        stored_weights = np.lib.format.open_memmap(
+            os.path.join(path, "weights.npy"), mode="w+", dtype=dtype, shape=(n_entries,)
+        )
+        # Next free position of the edges of every gene
+        cursor = indptr[:-1].copy()
+        for rows, cols, weights in cls._kept_edges(edge_chunks(), threshold):
+            genes = np.concatenate([rows, cols])
+            order = np.argsort(genes, kind="stable")
+            genes = genes[order]
+            counts = np.bincount(genes, minlength=n_genes)
+            # Rank of every edge among the edges of its gene in this chunk
+            first = np.concatenate([[0], np.cumsum(counts)])[genes]
+            positions = cursor[genes] + np.arange(len(genes)) - first
+            neighbors[positions] = np.concatenate([cols, rows])[order]
+            stored_weights[positions] = np.concatenate([weights, weights])[order]
+            cursor += counts
+
+        # Sorting the edges of every gene by decreasing weight, block by block of whole genes
+        start_gene = 0
+        while start_gene < n_genes:
+            stop_gene = max(
+                int(np.searchsorted(indptr, indptr[start_gene] + chunk_size, side="right")) - 1,
+                start_gene + 1,
+            )
+            start, stop = indptr[start_gene], indptr[stop_gene]
+            block_genes = np.repeat(
+                np.arange(start_gene, stop_gene), degrees[start_gene:stop_gene]
+            )
+            block_neighbors = np.array(neighbors[start:stop])
+            block_weights = np.array(stored_weights[start:stop])
+            order = np.lexsort((block_neighbors, -block_weights, block_genes))
+            neighbors[start:stop] = block_neighbors[order]
+            stored_weights[start:stop] = block_weights[order]
+            start_gene = stop_gene
+        neighbors.flush()
+        stored_weights.flush()
+        del neighbors, stored_weights
+
+        metadata = {
+            "n_genes": n_genes,
+            "threshold": threshold,
+            "dtype": str(np.dtype(dtype)),
+            "genes": [str(gene) for gene in gene_names],
+        }
+        with open(os.path.join(path, cls.METADATA_FILE), "w") as file:
+            json.dump(metadata, file)
+        return cls(path, metadata)
+
+    @staticmethod
+    def _kept_edges(edge_chunks, threshold):
+        for rows, cols, weights in edge_chunks:
+            weights = np.asarray(weights)
+            kept = weights >= threshold
+            yield (
+                np.asarray(rows, dtype=np.int64)[kept],
+                np.asarray(cols, dtype=np.int64)[kept],
+                weights[kept],
+            )
+
+    @classmethod
+    def from_network(cls, path: str, network: pd.DataFrame, gene_names, threshold: float):
+        """
+        Writes the index of the edges of a network DataFrame with the columns Target, Regulator and Weight.
+        """
+        index = pd.Index(gene_names)
+
+        def edge_chunks():
+            yield (
+                index.get_indexer(network["Regulator"]),
+                index.get_indexer(network["Target"]),
+                network["Weight"].values,
+            )
+
+        return cls.build(
+            path, gene_names, edge_chunks, threshold, dtype=network["Weight"].dtype
+        )
+
+    @classmethod
+    def from_tsv(
+        cls, path: str, network_path: str, gene_names, threshold: float, chunksize: int = 1_000_000
+    ):
+        """
+        Writes the index of a network TSV file written by the codc command, which is read in chunks of
+        `chunksize` rows.
+        """
+        index = pd.Index(gene_names)
+
+        def edge_chunks():
+            for chunk in pd.read_csv(
+                network_path,
+                sep="\t",
+                usecols=["Target", "Regulator", "Weight"],
+                chunksize=chunksize,
+            ):
+                yield (
+                    index.get_indexer(chunk["Regulator"]),
+                    index.get_indexer(chunk["Target"]),
+                    chunk["Weight"].values,
+                )
+
+        return cls.build(path, gene_names, edge_chunks, threshold)
+
+    @classmethod
+    def from_condensed(
+        cls, path: str, weights: np.ndarray, gene_names, threshold: float, chunk_size: int = 10_000_000
+    ):
+        """
+        Writes the index of a condensed weight array as returned by `compute_condensed`. The array is scanned
+        in chunks, so it can be a memory-mapped file larger than the memory.
+        """
+        n_genes = len(gene_names)
+
+        def edge_chunks():
+            for start in range(0, len(weights), chunk_size):
+                chunk = np.asarray(weights[start : start + chunk_size])
+                positions = np.flatnonzero(chunk >= threshold)
+                pairs = GeneExpressionAnalyzer.condensed_to_pairs(positions + start, n_genes)
+                yield pairs[:, 0], pairs[:, 1], chunk[positions]
+
+        return cls.build(
+            path, gene_names, edge_chunks, threshold, chunk_size, dtype=weights.dtype
+        )
+
+    def degree(self, gene) -> int:
+        """
+        Returns the number of indexed edges of a gene.
+
+        Raises:
+            KeyError: If the gene is not part of the index.
+        """
+        position = self._index[gene]
+        return int(self.indptr[position + 1] - self.indptr[position])
+
+    def edges(self, gene, top: int = None, min_weight: float = None) -> pd.DataFrame:
+        """
+        Returns the edges of a gene sorted by decreasing weight.
+
+        Args:
+            gene (str): Name of the gene.
+            top (int): If given, only the `top` edges with the highest weights are returned.
+            min_weight (float): If given, only the edges with at least this weight are returned.
+
+        Returns:
+            pd.DataFrame: The columns Gene, Partner and Weight.
+
+        Raises:
+            KeyError: If the gene is not part of the index.
+        """
+        position = self._index[gene]
+        start, stop = int(self.indptr[position]), int(self.indptr[position + 1])
+        if top is not None:
+            stop = min(stop, start + top)
+        weights = self.weights[start:stop]
+        if min_weight is not None:
+            # The weights are sorted in decreasing order, so the kept edges are a prefix. The bound is compared in
+            # the data type of the weights, so that a weight copied from the network keeps its edge
+            bound = -np.asarray(min_weight, dtype=weights.dtype)
+            stop = start + int(np.searchsorted(-weights, bound, side="right"))
+            weights = weights[: stop - start]
+        return pd.DataFrame(
+            {
+                "Gene": gene,
+                "Partner": self.gene_names[self.neighbors[start:stop]],
+                "Weight": np.array(weights),
+            }
+        )
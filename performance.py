@@ -0,0 +1,192 @@
+import csv
+import itertools
+import json
+import os
+import time
+from analyzer import expression_data_class
+from backends import create_executor
+from profiling import RunProfiler, peak_rss_bytes, reset_peak_rss
+
+
+class PerformanceSweep:
+    """
+    Measures the CODC computation over a grid of parameters. The worker pool and the shared memory are created
+    once per dataset size, backend and worker count and reused by every configuration, so that explicit warmup iterations
+    absorb the start-up costs and the measured iterations only contain the warm cost of a run.
+    """
+
+    COLUMNS = [
+        "n_genes",
+        "n_samples_1",
+        "n_samples_2",
+        "backend",
+        "workers",
+        "batch_size",
+        "smoothing",
+        "ties_method",
+        "ks_stat_method",
+        "iteration",
+        "wall_time",
+        "parent_cpu_time",
+        "worker_cpu_time",
+        "cpu_time",
+        "parent_peak_rss",
+        "worker_peak_rss",
+        "pairs",
+        "pairs_per_sec",
+    ]
+
+    def __init__(self, analyzer, df1, df2, warmup=1, iterations=10):
+        """
+        Args:
+            analyzer (GeneExpressionAnalyzer): The analyzer used to compute the networks.
+            df1 (pd.DataFrame): Expression data of the first condition.
+            df2 (pd.DataFrame): Expression data of the second condition.
+            warmup (int): Number of unrecorded runs before the measured ones of every configuration.
+            iterations (int): Number of measured runs of every configuration.
+        """
+        self.analyzer = analyzer
+        self.df1 = df1
+        self.df2 = df2
+        self.warmup = warmup
+        self.iterations = iterations
+
+    def run(
+        self,
+        gene_counts=(None,),
+        backends=("processes",),
+        workers=(None,),
+        batch_sizes=(100,),
+        smoothings=("none",),
+        ties_methods=("average",),
+        ks_stat_methods=("asymp",),
+        callback=None,
+    ):
+        """
+        Runs every combination of the given parameter values.
+
+        Args:
+            gene_counts (tuple): Numbers of genes (the first n genes of the inputs); None uses all genes.
+            backends (tuple): Execution backends: 'processes', 'threads' or 'serial'.
+            workers (tuple): Numbers of worker processes; None uses the number of CPUs.
+            batch_sizes (tuple): Batch sizes.
+            smoothings (tuple): Smoothing methods.
+            ties_methods (tuple): Ties methods.
+            ks_stat_methods (tuple): KS statistic modes.
+            callback (callable): Called with every measured row as soon as it is available.
+
+        Returns:
+            list: One dictionary per measured iteration with the columns listed in `COLUMNS`.
+        """
+        rows = []
+        for n_genes in gene_counts:
+            df1 = self.df1 if n_genes is None else self.df1.iloc[:n_genes]
+            df2 = self.df2 if n_genes is None else self.df2.iloc[:n_genes]
+            for backend in backends:
+                with expression_data_class(backend)(df1, df2) as shared_data:
+                    for n_workers in workers:
+                        n_workers = n_workers or os.cpu_count()
+                        with create_executor(backend, n_workers) as executor:
+                            for config in itertools.product(
+                                batch_sizes, smoothings, ties_methods, ks_stat_methods
+                            ):
+                                batch_size, smoothing, ties_method, ks_stat_method = config
+                                for iteration in range(-self.warmup, self.iterations):
+                                    row = self.measure(
+                                        df1,
+                                        df2,
+                                        shared_data,
+                                        executor,
+                                        backend=backend,
+                                        n_workers=n_workers,
+                                        batch_size=batch_size,
+                                        smoothing=smoothing,
+                                        ties_method=ties_method,
+                                        ks_stat_method=ks_stat_method,
+                                    )
+                                    # Negative iterations are warmup runs and are not recorded
+                                    if iteration < 0:
+                                        continue
+                                    row["iteration"] = iteration + 1
+                                    rows.append(row)
+                                    if callback:
+                                        callback(row)
+        return rows
+
+    def measure(
+        self,
+        df1,
+        df2,
+        shared_data,
+        executor,
+        backend,
+        n_workers,
+        batch_size,
+        smoothing,
+        ties_method,
+        ks_stat_method,
+    ):
+        """
+        Runs and measures a single computation with a warm executor and shared memory. With the thread and
+        serial backends the workers run in this process, so their CPU time is subtracted from that of the parent.
+
+        Returns:
+            dict: The measured row (without the iteration number).
+        """
+        profiler = RunProfiler()
+        reset_peak_rss()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        network_df = self.analyzer.compute_dc_copula_network_parallel(
+            df1,
+            df2,
+            ties_method=ties_method,
+            smoothing=smoothing,
+            ks_stat_method=ks_stat_method,
+            batch_size=batch_size,
+            max_workers=n_workers,
+            profiler=profiler,
+            executor=executor,
+            shared_data=shared_data,
+            verbose=False,
+            backend=backend,
+        )
+        wall_time = time.perf_counter() - wall_start
+        parent_cpu_time = time.process_time() - cpu_start
+        worker_cpu_time = sum(batch["cpu"] for batch in profiler.batches)
+        if backend != "processes":
+            parent_cpu_time = max(parent_cpu_time - worker_cpu_time, 0.0)
+
+        return {
+            "n_genes": shared_data.n_genes,
+            "n_samples_1": shared_data.data1_shape[0],
+            "n_samples_2": shared_data.data2_shape[0],
+            "backend": backend,
+            "workers": n_workers,
+            "batch_size": batch_size,
+            "smoothing": smoothing,
+            "ties_method": ties_method,
+            "ks_stat_method": ks_stat_method,
+            "wall_time": wall_time,
+            "parent_cpu_time": parent_cpu_time,
+            "worker_cpu_time": worker_cpu_time,
+            "cpu_time": parent_cpu_time + worker_cpu_time,
+            "parent_peak_rss": peak_rss_bytes(),
+            "worker_peak_rss": max(
+                (batch["max_rss"] for batch in profiler.batches), default=0
+            ),
+            "pairs": len(network_df),
+            "pairs_per_sec": len(network_df) / wall_time,
+        }
+
+    @classmethod
+    def write_csv(cls, rows, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=cls.COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    @staticmethod
+    def write_json(rows, path):
+        with open(path, "w") as file:
+            json.dump(rows, file, indent=2)
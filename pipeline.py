@@ -0,0 +1,122 @@
+import gzip
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker
+
+import pandas as pd
+
+from analyzer import CONDITION_LABEL, GeneExpressionAnalyzer
+
+NETWORK_COLUMNS = ["Target", "Regulator", "Condition", "Weight"]
+
+
+def read_expression_files(*paths) -> list:
+    """
+    Reads the expression TSV files concurrently. The parser of pandas releases the GIL while it parses, so the
+    files are read in parallel on separate threads.
+
+    Returns:
+        list: One DataFrame per path.
+    """
+    with ThreadPoolExecutor(max_workers=len(paths)) as readers:
+        return list(readers.map(lambda path: pd.read_csv(path, delimiter="\t"), paths))
+
+
+def warm_up(executor, n_workers: int) -> None:
+    """
+    Starts the worker processes of `executor` in the background, so that they are ready when the first
+    batches are submitted instead of being started after the inputs are loaded. Call it before the executor
+    has started any worker.
+    """
+    # The workers have to share the resource tracker of this process, otherwise every worker starts its own
+    # tracker, which warns about (and unlinks) the shared memory it attached to when the worker exits
+    resource_tracker.ensure_running()
+    for _ in range(n_workers):
+        executor.submit(os.getpid)
+
+
+class NetworkWriter:
+    """
+    Writes the network batch by batch on a background thread, so that formatting the rows as TSV and
+    compressing them overlaps with the computation of the following batches. The batches are the packed pair
+    results of the workers, gene names and the condition label are attached here. Paths ending with .gz are
+    written gzip-compressed.
+    """
+
+    def __init__(
+        self, path: str, gene_names, condition=CONDITION_LABEL, max_pending: int = 16
+    ):
+        """
+        Args:
+            path (str): Path of the network file.
+            gene_names (np.ndarray): Name of every gene index.
+            condition (str): Label of the Condition column.
+            max_pending (int): Maximum number of batches waiting to be written. The computation is paused while
+                               the queue is full, so that a slow disk does not fill the memory.
+        """
+        self.path = path
+        self.gene_names = gene_names
+        self.condition = condition
+        self.rows = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        if path.endswith(".gz"):
+            self._file = gzip.open(path, "wt", compresslevel=6, newline="")
+        else:
+            self._file = open(path, "w", newline="")
+        self._thread = threading.Thread(
+            target=self._run, name="codc-network-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, records) -> None:
+        """
+        Queues the results of a batch, a structured array of PAIR_RESULT_DTYPE, for writing.
+
+        Raises:
+            RuntimeError: If writing a previous batch failed.
+        """
+        if self._error:
+            raise RuntimeError(f"Writing {self.path} failed: {self._error}")
+        self._queue.put(records)
+
+    def close(self) -> None:
+        """
+        Writes the remaining batches and closes the file.
+
+        Raises:
+            RuntimeError: If writing failed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error:
+            raise RuntimeError(f"Writing {self.path} failed: {self._error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self) -> None:
+        header = True
+        while True:
+            records = self._queue.get()
+            if records is None:
+                if header and not self._error:
+                    self._file.write("\t".join(NETWORK_COLUMNS) + "\n")
+                return
+            if self._error:
+                continue
+            try:
+                GeneExpressionAnalyzer.to_network(
+                    records, self.gene_names, self.condition
+                ).to_csv(self._file, sep="\t", index=False, header=header)
+                header = False
+                self.rows += len(records)
+            except Exception as e:
+                # Keep draining the queue, the error is raised in the producer
+                self._error = e
@@ -0,0 +1,304 @@
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def peak_rss_bytes() -> int:
+    """
+    Returns the peak resident set size of the calling process in bytes. On Linux this is the high water mark
+    since the last call to `reset_peak_rss`, elsewhere the peak since the process started.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def current_rss_bytes() -> int:
+    """
+    Returns the current resident set size of the calling process in bytes, or its peak where the current value
+    is not available.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_rss_bytes()
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size of the calling process to its current value, so that the peak of a single
+    section can be measured in a long-lived process. Only supported on Linux.
+
+    Returns:
+        bool: Whether the peak could be reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class StageProfiler:
+    """
+    Accumulates wall-clock and CPU time per named stage. One instance is used per batch inside a worker, its
+    snapshot is small enough to be sent back to the parent together with the batch results.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self.pairs = 0
+        # Worker processes are reused across batches, report the peak memory of this batch only. Batches of the
+        # thread and serial backends run in the parent, whose peak must not be lost
+        if multiprocessing.parent_process() is not None:
+            reset_peak_rss()
+        self.start = time.time()
+        # CPU time of the calling thread, so that batches running in threads of one process are not counted
+        # several times; a worker process runs one batch at a time
+        self._cpu_start = time.thread_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(
+                name,
+                time.perf_counter() - wall_start,
+                time.thread_time() - cpu_start,
+            )
+
+    def add(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        stage = self.stages.setdefault(name, [0.0, 0.0, 0])
+        stage[0] += wall
+        stage[1] += cpu
+        stage[2] += calls
+
+    def snapshot(self) -> dict:
+        """
+        Returns the accumulated timings as a plain dictionary, together with the id of the process, the
+        start and end time of the profiled section, its total CPU time and the peak memory of the process.
+        """
+        return {
+            "pid": os.getpid(),
+            "start": self.start,
+            "end": time.time(),
+            "cpu": time.thread_time() - self._cpu_start,
+            "pairs": self.pairs,
+            "max_rss": peak_rss_bytes(),
+            "stages": {
+                name: {"wall": wall, "cpu": cpu, "calls": calls}
+                for name, (wall, cpu, calls) in self.stages.items()
+            },
+        }
+
+
+class NullProfiler:
+    """
+    Drop-in replacement for StageProfiler that records nothing, used when profiling is disabled.
+    """
+
+    enabled = False
+    pairs = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def add(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        pass
+
+
+class ProgressProfiler(NullProfiler):
+    """
+    Records no stages, only what a ProgressMonitor needs of a batch: the number of pairs, the id of the process
+    and the end time. Used by the workers when the progress of a run is monitored but not profiled.
+    """
+
+    enabled = True
+
+    def snapshot(self) -> dict:
+        return {"pid": os.getpid(), "end": time.time(), "pairs": self.pairs}
+
+
+PROFILE_PROGRESS = "progress"
+
+
+def batch_profiler(profile):
+    """
+    Returns the profiler of a batch inside a worker.
+
+    Args:
+        profile (bool | str): True for the stage timings of a StageProfiler, 'progress' for the progress of a
+                              ProgressProfiler, False for a NullProfiler.
+    """
+    if profile == PROFILE_PROGRESS:
+        return ProgressProfiler()
+    return StageProfiler() if profile else NullProfiler()
+
+
+def batch_stats(profiler, monitor):
+    """
+    Returns the `profile` argument of the workers of a run: stage timings if the run is profiled, only the
+    progress of every batch if it is monitored without profiling, False otherwise.
+    """
+    if profiler is not None:
+        return True
+    return PROFILE_PROGRESS if monitor is not None else False
+
+
+class RunProfiler:
+    """
+    Collects the timings of a complete run: the stages of the parent process (loading, shared memory setup,
+    scheduling, writing, ...) and the per-batch snapshots returned by the workers. `report` aggregates them into a
+    JSON-serializable dictionary with throughput, per-worker utilization and straggler statistics.
+    """
+
+    def __init__(self):
+        self.parent = StageProfiler()
+        self.batches = []
+        self.compute_start = None
+        self.compute_end = None
+
+    def stage(self, name: str):
+        return self.parent.stage(name)
+
+    def start_compute(self) -> None:
+        self.compute_start = time.time()
+
+    def end_compute(self) -> None:
+        self.compute_end = time.time()
+
+    def add_batch(self, snapshot: dict, received: float) -> None:
+        """
+        Records the snapshot of one finished batch.
+
+        Args:
+            snapshot (dict): The snapshot returned by the worker's StageProfiler.
+            received (float): Time at which the parent received the batch results, used to measure the delay
+                              of transferring the results back to the parent.
+        """
+        snapshot["received"] = received
+        self.batches.append(snapshot)
+
+    def report(self) -> dict:
+        """
+        Aggregates everything recorded so far.
+
+        Returns:
+            dict: A JSON-serializable run report.
+        """
+        parent = self.parent.snapshot()
+        total_pairs = sum(batch["pairs"] for batch in self.batches)
+        compute_wall = (
+            (self.compute_end or time.time()) - self.compute_start
+            if self.compute_start
+            else 0.0
+        )
+
+        worker_stages = {}
+        workers = {}
+        for batch in self.batches:
+            for name, stage in batch["stages"].items():
+                total = worker_stages.setdefault(
+                    name, {"wall": 0.0, "cpu": 0.0, "calls": 0}
+                )
+                for key in total:
+                    total[key] += stage[key]
+            worker = workers.setdefault(
+                batch["pid"],
+                {
+                    "pid": batch["pid"],
+                    "batches": 0,
+                    "pairs": 0,
+                    "busy_wall": 0.0,
+                    "busy_cpu": 0.0,
+                    "max_rss": 0,
+                },
+            )
+            worker["batches"] += 1
+            worker["pairs"] += batch["pairs"]
+            worker["busy_wall"] += batch["end"] - batch["start"]
+            worker["busy_cpu"] += batch["cpu"]
+            worker["max_rss"] = max(worker["max_rss"], batch["max_rss"])
+
+        for worker in workers.values():
+            worker["utilization"] = (
+                worker["busy_wall"] / compute_wall if compute_wall else 0.0
+            )
+
+        durations = np.array([batch["end"] - batch["start"] for batch in self.batches])
+        transfer = np.array(
+            [batch["received"] - batch["end"] for batch in self.batches]
+        )
+        busy = np.array([worker["busy_wall"] for worker in workers.values()])
+
+        return {
+            "wall_time": parent["end"] - parent["start"],
+            "compute_wall_time": compute_wall,
+            "pairs": total_pairs,
+            "pairs_per_sec": total_pairs / compute_wall if compute_wall else 0.0,
+            "parent": {
+                "cpu": parent["cpu"],
+                "max_rss": parent["max_rss"],
+                "stages": parent["stages"],
+            },
+            "worker_stages": worker_stages,
+            "workers": sorted(workers.values(), key=lambda worker: worker["pid"]),
+            "batches": {
+                "count": len(durations),
+                **self._distribution(durations),
+                "result_transfer": self._distribution(transfer),
+            },
+            "stragglers": {
+                # Ratio of the busiest worker to the average one, 1.0 means perfect balance
+                "worker_imbalance": float(busy.max() / busy.mean()) if busy.size else 0.0,
+                # Batches that took more than twice the median batch duration
+                "slow_batches": int(np.sum(durations > 2 * np.median(durations)))
+                if durations.size
+                else 0,
+                # Time between the first and the last worker finishing its final batch
+                "tail_time": float(
+                    max(batch["end"] for batch in self.batches)
+                    - min(
+                        max(b["end"] for b in self.batches if b["pid"] == pid)
+                        for pid in workers
+                    )
+                )
+                if self.batches
+                else 0.0,
+            },
+        }
+
+    @staticmethod
+    def _distribution(values: np.ndarray) -> dict:
+        if not values.size:
+            return {"min": 0.0, "median": 0.0, "p95": 0.0, "max": 0.0, "total": 0.0}
+        return {
+            "min": float(values.min()),
+            "median": float(np.median(values)),
+            "p95": float(np.percentile(values, 95)),
+            "max": float(values.max()),
+            "total": float(values.sum()),
+        }
@@ -0,0 +1,307 @@
+import json
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import TCPServer
+
+import numpy as np
+import pandas as pd
+
+from analyzer import PAIR_RESULT_DTYPE, GeneExpressionAnalyzer, expression_data_class
+from backends import create_executor
+from pipeline import warm_up
+
+# Allowed values of the computation options of a job, the first one is the default
+JOB_OPTIONS = {
+    "ties_method": ["average", "max"],
+    "smoothing": ["none", "beta", "checkerboard"],
+    "ks_stat_method": ["asymp", "auto", "exact"],
+}
+# Jobs with at most this many pairs are computed in the thread handling the request: sending them to a worker
+# would cost more than computing them
+INLINE_MAX_PAIRS = 64
+
+
+class CodcService:
+    """
+    Keeps the expression data of two conditions published and a worker pool running between jobs, so that a
+    job only pays for the computation of its pairs: no interpreter start, no parsing of the inputs, no start of
+    the workers and no publishing of the data. Jobs are full runs, runs on a subset of the genes or queries of
+    individual pairs; they may arrive concurrently and share the pool.
+    """
+
+    def __init__(
+        self,
+        df1,
+        df2,
+        analyzer,
+        backend="processes",
+        max_workers=None,
+        batch_size=100,
+    ):
+        """
+        Args:
+            df1 (pd.DataFrame): Expression data of the first condition, gene names in the first column.
+            df2 (pd.DataFrame): Expression data of the second condition, with the same genes as `df1`.
+            analyzer (GeneExpressionAnalyzer): The analyzer used to compute the weights.
+            backend (str): Execution backend of the pool: 'processes', 'threads' or 'serial'.
+            max_workers (int): Number of workers. Defaults to the number of CPUs.
+            batch_size (int): Number of gene pairs per task submitted to the pool.
+
+        Raises:
+            ValueError: If the genes of both conditions differ.
+        """
+        if not np.array_equal(df1.iloc[:, 0].values, df2.iloc[:, 0].values):
+            raise ValueError("The genes of both conditions must match.")
+        self.analyzer = analyzer
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.n_samples = (df1.shape[1] - 1, df2.shape[1] - 1)
+
+        self.executor = create_executor(backend, self.max_workers)
+        if backend == "processes":
+            warm_up(self.executor, self.max_workers)
+        self.shared_data = expression_data_class(backend)(df1, df2)
+        self.gene_index = pd.Index(self.shared_data.gene_names)
+
+    def close(self):
+        self.executor.shutdown()
+        self.shared_data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def info(self) -> dict:
+        """
+        Returns the size of the loaded data and the configuration of the pool.
+        """
+        return {
+            "n_genes": self.shared_data.n_genes,
+            "n_samples": list(self.n_samples),
+            "backend": self.backend,
+            "workers": self.max_workers,
+            "batch_size": self.batch_size,
+        }
+
+    @staticmethod
+    def job_options(job: dict) -> dict:
+        """
+        Returns the computation options of a job, filled in with their defaults.
+
+        Raises:
+            ValueError: If an option has an unsupported value.
+        """
+        options = {}
+        for name, allowed in JOB_OPTIONS.items():
+            value = job.get(name, allowed[0])
+            if value not in allowed:
+                raise ValueError(
+                    f"Unsupported {name} {value!r}, expected one of {', '.join(allowed)}."
+                )
+            options[name] = value
+        return options
+
+    def gene_indices(self, genes) -> np.ndarray:
+        """
+        Converts gene names into gene indices.
+
+        Raises:
+            ValueError: If a gene is not part of the loaded data.
+        """
+        positions = self.gene_index.get_indexer(list(genes))
+        if np.any(positions < 0):
+            missing = [gene for gene, position in zip(genes, positions) if position < 0]
+            raise ValueError(f"Unknown genes: {', '.join(map(str, missing))}.")
+        return positions
+
+    def compute(self, pairs: np.ndarray, options: dict) -> np.ndarray:
+        """
+        Computes the weights of gene index pairs, inline for small jobs and on the pool otherwise.
+
+        Returns:
+            np.ndarray: Structured array of PAIR_RESULT_DTYPE, pairs that failed are left out.
+        """
+        args = (
+            *self.shared_data.sources,
+            options["ties_method"],
+            options["smoothing"],
+            options["ks_stat_method"],
+            self.shared_data.data1_shape,
+            self.shared_data.data2_shape,
+            self.shared_data.dtype,
+        )
+        if len(pairs) <= INLINE_MAX_PAIRS:
+            return self.analyzer.compute_pairs(pairs.tolist(), *args)
+        results = []
+        self.analyzer.compute_dc_copula_network_parallel(
+            None,
+            None,
+            batch_size=self.batch_size,
+            max_workers=self.max_workers,
+            executor=self.executor,
+            shared_data=self.shared_data,
+            verbose=False,
+            pairs=pairs,
+            on_batch=results.append,
+            **options,
+        )
+        return (
+            np.concatenate(results) if results else np.empty(0, dtype=PAIR_RESULT_DTYPE)
+        )
+
+    def network(self, job: dict) -> pd.DataFrame:
+        """
+        Runs a network job: all pairs of the loaded genes, or all pairs among the genes listed in `genes`.
+
+        Returns:
+            pd.DataFrame: The network in the format of `codc`.
+        """
+        options = self.job_options(job)
+        genes = job.get("genes")
+        if genes is None:
+            n_genes = self.shared_data.n_genes
+            indices = np.arange(n_genes)
+        else:
+            # Sorted, so that every pair is reported with the same regulator and target as in a full run
+            indices = np.unique(self.gene_indices(genes))
+            n_genes = len(indices)
+        pairs = indices[
+            GeneExpressionAnalyzer.condensed_to_pairs(
+                np.arange(n_genes * (n_genes - 1) // 2), n_genes
+            )
+        ].reshape(-1, 2)
+        return GeneExpressionAnalyzer.to_network(
+            self.compute(pairs, options), self.shared_data.gene_names
+        )
+
+    def pairs(self, job: dict) -> list:
+        """
+        Runs a pair query: the weights of the gene pairs listed in `pairs` as [regulator, target] names.
+
+        Returns:
+            list: One dictionary per computed pair with the keys Regulator, Target and Weight.
+        """
+        options = self.job_options(job)
+        names = job.get("pairs")
+        if not names or any(len(pair) != 2 for pair in names):
+            raise ValueError(
+                "pairs must be a non-empty list of [regulator, target] gene names."
+            )
+        pairs = self.gene_indices([gene for pair in names for gene in pair])
+        pairs = pairs.reshape(-1, 2)
+        if np.any(pairs[:, 0] == pairs[:, 1]):
+            raise ValueError("The genes of a pair must differ.")
+        gene_names = self.shared_data.gene_names
+        return [
+            {
+                "Regulator": str(gene_names[regulator]),
+                "Target": str(gene_names[target]),
+                "Weight": float(weight),
+            }
+            for regulator, target, weight in self.compute(pairs, options).tolist()
+        ]
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the jobs of a CodcService over HTTP:
+
+    - `GET /info`: the loaded data and the pool, as JSON.
+    - `POST /network`: a network job, answered with the network as TSV.
+    - `POST /pairs`: a pair query, answered with the weights as JSON.
+    - `POST /shutdown`: stops the service.
+
+    Jobs are JSON objects with the optional computation options `ties_method`, `smoothing` and
+    `ks_stat_method`. Invalid jobs are answered with status 400 and a JSON error message.
+    """
+
+    def do_GET(self):
+        if self.path == "/info":
+            self.send_json(self.server.service.info())
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}.")
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            job = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(job, dict):
+                raise ValueError("The job must be a JSON object.")
+            if self.path == "/network":
+                self.send_body(
+                    self.server.service.network(job).to_csv(sep="\t", index=False),
+                    "text/tab-separated-values",
+                )
+            elif self.path == "/pairs":
+                self.send_json({"pairs": self.server.service.pairs(job)})
+            elif self.path == "/shutdown":
+                self.send_json({"status": "shutting down"})
+                # shutdown waits for serve_forever to return, which this request blocks
+                threading.Thread(target=self.server.shutdown).start()
+            else:
+                self.send_error_json(404, f"Unknown path {self.path}.")
+        except (TypeError, ValueError) as e:
+            self.send_error_json(400, str(e))
+
+    def send_json(self, payload, status=200):
+        self.send_body(json.dumps(payload), "application/json", status)
+
+    def send_error_json(self, status, message):
+        self.send_json({"error": message}, status)
+
+    def send_body(self, body: str, content_type: str, status=200):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Requests are not logged, small jobs take only milliseconds
+        pass
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    """
+    HTTP server listening on a Unix socket, reachable e.g. with `curl --unix-socket <path>`.
+    """
+
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind expects a (host, port) address
+        TCPServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler formats the client address as (host, port)
+        return request, ("local", 0)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def create_server(service: CodcService, port: int = None, socket_path: str = None):
+    """
+    Creates the HTTP server of a service, listening on a Unix socket if `socket_path` is given and on
+    localhost:`port` otherwise. Port 0 chooses a free port.
+
+    Returns:
+        ThreadingHTTPServer: The server, start it with `serve_forever`.
+    """
+    if socket_path:
+        server = UnixHTTPServer(socket_path, ServiceRequestHandler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port or 0), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
@@ -0,0 +1,214 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from analyzer import GeneExpressionAnalyzer
+
+
+class SparseNetwork:
+    """
+    A thresholded differential coexpression network stored as a symmetric SciPy CSR adjacency matrix, with the
+    weight of every kept gene pair in both triangles, and the gene names of its rows.
+
+    Degree, hub and module queries work on the sparse matrix directly. Networks can be built from a long
+    network DataFrame, from a network TSV file read in chunks, or from a condensed weight array, so that the
+    full network never has to be held in memory.
+    """
+
+    GENES_SUFFIX = "_genes.tsv"
+
+    def __init__(self, gene_names, adjacency):
+        """
+        Args:
+            gene_names (np.ndarray): Name of the gene of every row and column.
+            adjacency (scipy.sparse.csr_matrix): Symmetric weighted adjacency matrix.
+        """
+        self.gene_names = np.asarray(gene_names)
+        self.adjacency = sparse.csr_matrix(adjacency)
+
+    @property
+    def n_edges(self):
+        return self.adjacency.nnz // 2
+
+    @classmethod
+    def from_edges(cls, gene_names, rows, cols, weights):
+        """
+        Builds the network from the gene indices and weights of its edges, each edge given once.
+        """
+        n_genes = len(gene_names)
+        adjacency = sparse.coo_matrix(
+            (
+                np.concatenate([weights, weights]),
+                (np.concatenate([rows, cols]), np.concatenate([cols, rows])),
+            ),
+            shape=(n_genes, n_genes),
+        ).tocsr()
+        return cls(gene_names, adjacency)
+
+    @classmethod
+    def from_network(cls, network: pd.DataFrame, threshold: float, gene_names=None):
+        """
+        Builds the network from the edges of a network DataFrame whose weight is at least `threshold`.
+
+        Args:
+            network (pd.DataFrame): Network with the columns Target, Regulator and Weight.
+            threshold (float): Smallest weight of a kept edge.
+            gene_names (np.ndarray): All genes of the network, including those without a kept edge. Defaults to
+                                     the genes of the network in order of appearance.
+        """
+        if gene_names is None:
+            gene_names = pd.unique(
+                np.concatenate([network["Regulator"].values, network["Target"].values])
+            )
+        edges = network[network["Weight"] >= threshold]
+        index = pd.Index(gene_names)
+        return cls.from_edges(
+            gene_names,
+            index.get_indexer(edges["Regulator"]),
+            index.get_indexer(edges["Target"]),
+            edges["Weight"].values,
+        )
+
+    @classmethod
+    def from_tsv(cls, path: str, threshold: float, chunksize: int = 1_000_000):
+        """
+        Builds the network from a network TSV file written by the codc command. The file is read in chunks of
+        `chunksize` rows and only the edges above the threshold are kept, so files larger than the memory can
+        be processed.
+        """
+        genes = {}
+        rows, cols, weights = [], [], []
+        for chunk in pd.read_csv(
+            path,
+            sep="\t",
+            usecols=["Target", "Regulator", "Weight"],
+            chunksize=chunksize,
+        ):
+            # Every gene gets an index, also those without a kept edge
+            for gene in pd.unique(
+                np.concatenate([chunk["Regulator"].values, chunk["Target"].values])
+            ):
+                genes.setdefault(gene, len(genes))
+            edges = chunk[chunk["Weight"] >= threshold]
+            rows.append(edges["Regulator"].map(genes).values)
+            cols.append(edges["Target"].map(genes).values)
+            weights.append(edges["Weight"].values)
+        return cls.from_edges(
+            np.array(list(genes), dtype=object),
+            np.concatenate(rows) if rows else np.array([], dtype=np.int64),
+            np.concatenate(cols) if cols else np.array([], dtype=np.int64),
+            np.concatenate(weights) if weights else np.array([]),
+        )
+
+    @classmethod
+    def from_condensed(
+        cls, weights: np.ndarray, gene_names, threshold: float, chunk_size: int = 10_000_000
+    ):
+        """
+        Builds the network from a condensed weight array as returned by `compute_condensed`. The array is
+        scanned in chunks, so it can be a memory-mapped file larger than the memory.
+        """
+        n_genes = len(gene_names)
+        rows, cols, kept = [], [], []
+        for start in range(0, len(weights), chunk_size):
+            chunk = np.asarray(weights[start : start + chunk_size])
+            positions = np.flatnonzero(chunk >= threshold)
+            pairs = GeneExpressionAnalyzer.condensed_to_pairs(positions + start, n_genes)
+            rows.append(pairs[:, 0])
+            cols.append(pairs[:, 1])
+            kept.append(chunk[positions])
+        return cls.from_edges(
+            gene_names,
+            np.concatenate(rows) if rows else np.array([], dtype=np.int64),
+            np.concatenate(cols) if cols else np.array([], dtype=np.int64),
+            np.concatenate(kept) if kept else np.array([]),
+        )
+
+    @classmethod
+    def genes_path(cls, path: str) -> str:
+        """
+        Returns the path of the gene index that belongs to the adjacency matrix saved at `path`.
+        """
+        return os.path.splitext(path)[0] + cls.GENES_SUFFIX
+
+    def save(self, path: str) -> None:
+        """
+        Saves the adjacency matrix as compressed `.npz` file and the gene index next to it, e.g. network.npz
+        and network_genes.tsv.
+        """
+        sparse.save_npz(path, self.adjacency)
+        pd.DataFrame({"Gene": self.gene_names}).to_csv(
+            self.genes_path(path), sep="\t", index=False
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Loads a network saved with `save`.
+        """
+        gene_names = pd.read_csv(cls.genes_path(path), sep="\t")["Gene"].values
+        return cls(gene_names, sparse.load_npz(path))
+
+    def filter(self, threshold: float):
+        """
+        Returns the network with only the edges whose weight is at least `threshold`.
+        """
+        # Masking the kept entries instead of zeroing the others, so that edges with a weight of 0 are kept
+        adjacency = self.adjacency.tocoo()
+        kept = adjacency.data >= threshold
+        adjacency = sparse.csr_matrix(
+            (adjacency.data[kept], (adjacency.row[kept], adjacency.col[kept])),
+            shape=adjacency.shape,
+        )
+        return SparseNetwork(self.gene_names, adjacency)
+
+    def degrees(self) -> pd.DataFrame:
+        """
+        Returns the degree and the weighted degree (differential connectivity) of every gene, sorted by
+        decreasing weighted degree.
+        """
+        degrees = pd.DataFrame(
+            {
+                "Gene": self.gene_names,
+                "Degree": np.diff(self.adjacency.indptr),
+                "WeightedDegree": np.asarray(self.adjacency.sum(axis=1)).ravel(),
+            }
+        )
+        return degrees.sort_values(
+            ["WeightedDegree", "Degree"], ascending=False, kind="stable"
+        ).reset_index(drop=True)
+
+    def hubs(self, top: int = 10) -> pd.DataFrame:
+        """
+        Returns the `top` genes with the highest weighted degree.
+        """
+        return self.degrees().head(top)
+
+    def modules(self, min_size: int = 2) -> pd.DataFrame:
+        """
+        Returns the connected modules of at least `min_size` genes. Modules are numbered from 1 by decreasing
+        size.
+
+        Returns:
+            pd.DataFrame: One row per gene of a module with the columns Gene, Module and ModuleSize.
+        """
+        _, labels = connected_components(self.adjacency, directed=False)
+        sizes = np.bincount(labels)
+        kept = np.flatnonzero(sizes >= min_size)
+        # Number the kept components by decreasing size
+        order = kept[np.argsort(-sizes[kept], kind="stable")]
+        module_of_label = np.zeros(len(sizes), dtype=np.int64)
+        module_of_label[order] = np.arange(1, len(order) + 1)
+
+        genes = np.flatnonzero(module_of_label[labels] > 0)
+        modules = pd.DataFrame(
+            {
+                "Gene": self.gene_names[genes],
+                "Module": module_of_label[labels[genes]],
+                "ModuleSize": sizes[labels[genes]],
+            }
+        )
+        return modules.sort_values(["Module", "Gene"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,168 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+
+
+class SyntheticExpressionGenerator:
+    """
+    Generates paired gene expression datasets in the CLI input format (gene names in rows, samples in columns)
+    for scale testing. Genes are written in chunks so arbitrarily large inputs can be produced with memory
+    proportional to ``chunk_size * n_samples``.
+
+    A number of gene modules is planted into the data: the genes of a module share a latent factor in the first
+    condition and are independent in the second one, so every pair within a module is differentially co-expressed.
+    """
+
+    FORMAT_TSV = "tsv"
+    FORMAT_TSV_GZ = "tsv.gz"
+
+    def __init__(
+        self,
+        n_genes: int,
+        n_samples: int,
+        n_samples_2: int = None,
+        zero_fraction: float = 0.0,
+        n_modules: int = 0,
+        module_size: int = 10,
+        module_strength: float = 0.8,
+        seed: int = 0,
+    ):
+        """
+        Initializes the generator.
+
+        Args:
+            n_genes (int): Number of genes of both conditions.
+            n_samples (int): Number of samples of the first condition.
+            n_samples_2 (int): Number of samples of the second condition. Defaults to `n_samples`.
+            zero_fraction (float): Probability of a value being a dropout (exactly zero), which mimics the
+                                   zero-inflation and therefore the tie density of RNA-seq data.
+            n_modules (int): Number of differentially co-expressed modules to plant.
+            module_size (int): Number of genes per planted module.
+            module_strength (float): Share of variance of a module gene explained by the module factor in the first
+                                     condition, in [0, 1].
+            seed (int): Seed of the random number generator.
+
+        Raises:
+            ValueError: If the parameters are out of range or the modules do not fit into the genes.
+        """
+        if n_genes < 2 or n_samples < 2:
+            raise ValueError("At least 2 genes and 2 samples are required.")
+        if not 0 <= zero_fraction < 1:
+            raise ValueError("'zero_fraction' must be in [0,1).")
+        if not 0 <= module_strength <= 1:
+            raise ValueError("'module_strength' must be in [0,1].")
+        if n_modules * module_size > n_genes:
+            raise ValueError("The planted modules do not fit into the number of genes.")
+
+        self.n_genes = n_genes
+        self.n_samples = n_samples
+        self.n_samples_2 = n_samples_2 or n_samples
+        self.zero_fraction = zero_fraction
+        self.n_modules = n_modules
+        self.module_size = module_size
+        self.module_strength = module_strength
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        # Module index of every gene, -1 for genes that are not part of a module
+        self.module_membership = np.full(n_genes, -1, dtype=np.int32)
+        members = rng.choice(n_genes, size=n_modules * module_size, replace=False)
+        self.module_membership[members] = np.repeat(
+            np.arange(n_modules, dtype=np.int32), module_size
+        )
+        # Per-gene location and scale, comparable to log-transformed expression values
+        self.gene_means = rng.gamma(shape=2.0, scale=1.5, size=n_genes)
+        self.gene_scales = rng.uniform(0.5, 2.0, size=n_genes)
+        # Latent module factors, shared by all genes of a module in the first condition only
+        self.module_factors = rng.standard_normal((n_modules, self.n_samples))
+
+    def gene_names(self, start: int, stop: int) -> list:
+        width = len(str(self.n_genes))
+        return [f"GENE{index:0{width}d}" for index in range(start, stop)]
+
+    def generate_chunk(
+        self, start: int, stop: int, condition: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Generates the expression values of the genes in [start, stop) for one condition.
+
+        Args:
+            start (int): Index of the first gene of the chunk.
+            stop (int): Index after the last gene of the chunk.
+            condition (int): 1 or 2. Planted modules are only co-expressed in condition 1.
+            rng (np.random.Generator): Random number generator to draw from.
+
+        Returns:
+            np.ndarray: A (stop - start, n_samples) array of non-negative expression values, zero only for dropouts.
+        """
+        n_samples = self.n_samples if condition == 1 else self.n_samples_2
+        values = rng.standard_normal((stop - start, n_samples))
+
+        if condition == 1 and self.n_modules:
+            membership = self.module_membership[start:stop]
+            in_module = membership >= 0
+            values[in_module] = (
+                np.sqrt(self.module_strength)
+                * self.module_factors[membership[in_module]]
+                + np.sqrt(1 - self.module_strength) * values[in_module]
+            )
+
+        values = (
+            self.gene_means[start:stop, None] + self.gene_scales[start:stop, None] * values
+        )
+        # A softplus keeps the values positive without clipping them, which would tie all clipped values at
+        # zero; zeros (and their ties) only come from the dropouts
+        np.logaddexp(0.0, values, out=values)
+        if self.zero_fraction:
+            values[rng.random(values.shape) < self.zero_fraction] = 0.0
+        return values
+
+    def write_condition(
+        self,
+        path: str,
+        condition: int,
+        chunk_size: int = 1000,
+        file_format: str = FORMAT_TSV,
+    ) -> None:
+        """
+        Streams the dataset of one condition to `path`, `chunk_size` genes at a time.
+
+        Args:
+            path (str): Output file path.
+            condition (int): 1 or 2.
+            chunk_size (int): Number of genes generated and written at once.
+            file_format (str): 'tsv' or 'tsv.gz'. Both are read directly by the `codc` command.
+        """
+        n_samples = self.n_samples if condition == 1 else self.n_samples_2
+        rng = np.random.default_rng([self.seed, condition])
+        header = ["Gene"] + [f"C{condition}_S{k + 1}" for k in range(n_samples)]
+
+        if file_format == self.FORMAT_TSV_GZ:
+            handle = gzip.open(path, "wt", compresslevel=1, newline="")
+        else:
+            handle = open(path, "w", newline="")
+
+        with handle:
+            handle.write("\t".join(header) + "\n")
+            for start in range(0, self.n_genes, chunk_size):
+                stop = min(start + chunk_size, self.n_genes)
+                chunk = pd.DataFrame(
+                    self.generate_chunk(start, stop, condition, rng),
+                    index=self.gene_names(start, stop),
+                )
+                # Enough digits that distinct values stay distinct, so the ties in the file are the dropouts
+                chunk.to_csv(handle, sep="\t", header=False, float_format="%.12g")
+
+    def write_modules(self, path: str) -> None:
+        """
+        Writes the planted modules (ground truth) as a TSV file with one row per module gene.
+        """
+        members = np.flatnonzero(self.module_membership >= 0)
+        modules = pd.DataFrame(
+            {
+                "Gene": [self.gene_names(index, index + 1)[0] for index in members],
+                "Module": self.module_membership[members],
+            }
+        ).sort_values(by=["Module", "Gene"])
+        modules.to_csv(path, sep="\t", index=False, header=True)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from aggregation import GeneAggregateAnalyzer, GeneAggregates
+from analyzer import GeneExpressionAnalyzer, expression_data_class
+from copula.empirical_copula import EmpiricalCopula
+from sparse_network import SparseNetwork
+
+
+@pytest.mark.parametrize("backend", ["processes", "serial"])
+def test_aggregates_match_network(backend):
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    network_df = analyzer.compute_dc_copula_network_parallel(df1, df2, verbose=False)
+
+    with expression_data_class(backend)(df1, df2) as shared_data:
+        aggregates = GeneAggregateAnalyzer(analyzer).compute_aggregates(
+            shared_data, threshold=0.3, batch_size=4, verbose=False, backend=backend
+        )
+    table = aggregates.to_table().set_index("Gene")
+
+    degrees = (
+        SparseNetwork.from_network(network_df, 0.3, gene_names=df1.iloc[:, 0].values)
+        .degrees()
+        .set_index("Gene")
+    )
+    np.testing.assert_array_equal(table["Degree"], degrees.loc[table.index, "Degree"])
+    np.testing.assert_allclose(
+        table["WeightedDegree"], degrees.loc[table.index, "WeightedDegree"]
+    )
+    max_weight = pd.concat(
+        [
+            network_df.groupby("Regulator")["Weight"].max(),
+            network_df.groupby("Target")["Weight"].max(),
+        ]
+    ).groupby(level=0).max()
+    np.testing.assert_allclose(table["MaxWeight"], max_weight.loc[table.index])
+
+
+def test_fold_ignores_failed_pairs():
+    pairs = np.array([[0, 2], [0, 3], [2, 3]])
+    weights = np.array([0.5, np.nan, 0.2])
+    aggregates = GeneAggregates(["A", "B", "C", "D"])
+    aggregates.merge(*GeneAggregates.fold(pairs, weights, threshold=0.3))
+    aggregates.merge(*GeneAggregates.fold(pairs[:1], np.array([0.7]), threshold=0.3))
+
+    np.testing.assert_array_equal(aggregates.degree, [2, 0, 2, 0])
+    np.testing.assert_allclose(aggregates.weighted_degree, [1.2, 0.0, 1.2, 0.0])
+    np.testing.assert_allclose(aggregates.max_weight, [0.7, np.nan, 0.7, 0.2])
+    assert list(aggregates.to_table()["Gene"]) == ["A", "C", "B", "D"]
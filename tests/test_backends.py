@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer, LocalExpressionData
+from backends import (
+    SERIAL_MAX_WORK,
+    SerialExecutor,
+    choose_backend,
+    create_executor,
+)
+from copula.empirical_copula import EmpiricalCopula
+
+
+@pytest.fixture
+def setup_data():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    return df1, df2, analyzer
+
+
+@pytest.mark.parametrize("backend", ["threads", "serial"])
+def test_backends_match_processes(setup_data, backend):
+    df1, df2, analyzer = setup_data
+    expected = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, batch_size=7, max_workers=2, verbose=False
+    )
+    network_df = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, batch_size=7, max_workers=2, verbose=False, backend=backend
+    )
+    # Worker processes finish their batches in any order
+    pd.testing.assert_frame_equal(
+        network_df.sort_values(["Regulator", "Target"]).reset_index(drop=True),
+        expected.sort_values(["Regulator", "Target"]).reset_index(drop=True),
+    )
+
+    data1, data2 = df1.iloc[:, 1:].values, df2.iloc[:, 1:].values
+    np.testing.assert_allclose(
+        analyzer.compute_condensed(data1, data2, batch_size=7, backend=backend),
+        analyzer.compute_condensed(data1, data2, batch_size=7),
+    )
+
+
+def test_local_expression_data_does_not_copy(setup_data):
+    df1, df2, _ = setup_data
+    data1 = df1.iloc[:, 1:].values.astype(float)
+    data2 = df2.iloc[:, 1:].values.astype(float)
+    with LocalExpressionData.from_arrays(data1, data2) as local_data:
+        assert np.shares_memory(local_data.data1, data1)
+        assert local_data.data1_shape == data1.T.shape
+        assert local_data.sources[1] is local_data.data2
+
+
+def test_serial_executor_runs_immediately():
+    executor = SerialExecutor()
+    assert executor.submit(pow, 2, 10).result() == 1024
+    future = executor.submit(int, "not a number")
+    assert future.done()
+    with pytest.raises(ValueError):
+        future.result()
+
+
+def test_create_executor_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        create_executor("gpu")
+
+
+def test_choose_backend():
+    assert choose_backend(10, 100, max_workers=4) == "serial"
+    assert choose_backend(10**6, 100, max_workers=1) == "serial"
+    assert choose_backend(SERIAL_MAX_WORK, 100, max_workers=4) == "processes"
+    assert choose_backend(SERIAL_MAX_WORK, 5000, max_workers=4) == "threads"
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from batch import BatchScheduler, SharedInputs, interleave, read_manifest
+from copula.empirical_copula import EmpiricalCopula
+
+INPUT_FILES = (
+    "./tests/data/BRCA_normal_subset.tsv",
+    "./tests/data/BRCA_tumor_subset.tsv",
+)
+
+
+def write_manifest(tmp_path, text):
+    path = tmp_path / "jobs.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_read_manifest(tmp_path):
+    jobs = read_manifest(
+        write_manifest(
+            tmp_path,
+            """
+defaults:
+  smoothing: beta
+jobs:
+  - name: first
+    input_file_1: a.tsv
+    input_file_2: b.tsv
+    output_path: out/first
+  - input_file_1: a.tsv
+    input_file_2: c.tsv
+    output_path: out/second
+    smoothing: none
+""",
+        )
+    )
+    assert [job["name"] for job in jobs] == ["first", "job2"]
+    assert [job["smoothing"] for job in jobs] == ["beta", "none"]
+    assert jobs[0]["ties_method"] == "average"
+
+
+@pytest.mark.parametrize(
+    "jobs, message",
+    [
+        ("[]", "non-empty list"),
+        ("[{input_file_1: a.tsv, input_file_2: b.tsv}]", "misses the option output_path"),
+        ("[{input_file_1: a, input_file_2: b, output_path: o, workers: 2}]", "unknown options"),
+        ("[{input_file_1: a, input_file_2: b, output_path: o, smoothing: x}]", "smoothing"),
+        (
+            "[{input_file_1: a, input_file_2: b, output_path: o},"
+            " {input_file_1: a, input_file_2: c, output_path: o}]",
+            "output_path",
+        ),
+    ],
+)
+def test_read_manifest_rejects_invalid_jobs(tmp_path, jobs, message):
+    with pytest.raises(ValueError, match=message):
+        read_manifest(write_manifest(tmp_path, f"jobs: {jobs}\n"))
+
+
+def test_interleave():
+    items = interleave([iter("abc"), iter("d"), iter("ef"), iter("g")], width=2)
+    assert "".join(items) == "adbcefg"
+
+
+@pytest.mark.parametrize("backend", ["processes", "serial"])
+def test_batch_matches_codc(tmp_path, backend):
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    df1, df2 = (pd.read_csv(path, sep="\t") for path in INPUT_FILES)
+    jobs = [
+        {
+            "name": smoothing,
+            "input_file_1": INPUT_FILES[0],
+            "input_file_2": INPUT_FILES[1],
+            "output_path": str(tmp_path / smoothing),
+            "output_format": "tsv",
+            "ties_method": "average",
+            "smoothing": smoothing,
+            "ks_stat_method": "asymp",
+        }
+        for smoothing in ("none", "beta")
+    ]
+    reported = []
+    with SharedInputs(
+        [job[key] for job in jobs for key in ("input_file_1", "input_file_2")],
+        backend,
+    ) as inputs:
+        assert inputs.n_files == 2
+        rows = BatchScheduler(analyzer, batch_size=4, active_jobs=2).run(
+            jobs, inputs, max_workers=1, backend=backend, callback=reported.append
+        )
+
+    assert rows == reported
+    assert sorted(row["name"] for row in rows) == ["beta", "none"]
+    for row in rows:
+        assert row["pairs"] == 45 and row["cpu_time"] > 0
+        expected = analyzer.compute_dc_copula_network_parallel(
+            df1, df2, smoothing=row["name"], max_workers=1, verbose=False
+        )
+        pd.testing.assert_frame_equal(pd.read_csv(row["network"], sep="\t"), expected)
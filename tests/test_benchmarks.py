@@ -0,0 +1,34 @@
+import pytest
+from benchmarks.run import compare_results, parameter_grid, result_key
+
+
+def test_parameter_grid_expands_all_combinations():
+    class Bench:
+        params = [[10, 20], ["none", "beta"]]
+        param_names = ["n_samples", "smoothing"]
+
+    grid = parameter_grid(Bench)
+    assert len(grid) == 4
+    assert {"n_samples": 20, "smoothing": "beta"} in grid
+
+
+def test_parameter_grid_without_params():
+    class Bench:
+        pass
+
+    assert parameter_grid(Bench) == [{}]
+
+
+def test_compare_results_reports_percentage_change():
+    key = result_key("bench.Bench.time_x", {"n": 1})
+    baseline = {"results": [{"key": key, "median": 2.0}]}
+    current = {
+        "results": [
+            {"key": key, "median": 2.5},
+            {"key": "bench.Bench.time_new", "median": 1.0},
+        ]
+    }
+    comparison = compare_results(current, baseline, threshold=10.0)
+    assert len(comparison) == 1  # benchmarks missing from the baseline are skipped
+    assert comparison[0]["change_percent"] == pytest.approx(25.0)
+    assert comparison[0]["regression"]
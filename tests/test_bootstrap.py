@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ks_2samp
+from analyzer import GeneExpressionAnalyzer
+from bootstrap import BootstrapAnalyzer, SharedBootstrapSamples, ks_statistics
+from copula.empirical_copula import EmpiricalCopula
+
+
+def test_ks_statistics_match_scipy():
+    rng = np.random.default_rng(0)
+    x = rng.random((5, 12))
+    y = rng.random((5, 9))
+    x[:, 3] = y[:, 2]  # ties between both samples
+    expected = [ks_2samp(a, b).statistic for a, b in zip(x, y)]
+    np.testing.assert_array_equal(ks_statistics(x, y), expected)
+
+
+@pytest.mark.parametrize("smoothing", ["none", "checkerboard"])
+def test_edge_stability_matches_independent_runs(smoothing):
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    empirical_copula = EmpiricalCopula()
+
+    with SharedBootstrapSamples(df1, df2, n_bootstraps=4, seed=1) as shared_samples:
+        stability_df = BootstrapAnalyzer(empirical_copula).compute_edge_stability(
+            shared_samples,
+            smoothing=smoothing,
+            threshold=0.4,
+            batch_size=7,
+            max_workers=1,
+            verbose=False,
+        )
+        resamples1, resamples2 = shared_samples.resamples
+
+    # Every resample gives the same weights as a regular run on the resampled data
+    analyzer = GeneExpressionAnalyzer(empirical_copula)
+    weights = np.array(
+        [
+            analyzer.compute_dc_copula_network_parallel(
+                pd.concat([df1.iloc[:, :1], df1.iloc[:, 1:].iloc[:, samples1]], axis=1),
+                pd.concat([df2.iloc[:, :1], df2.iloc[:, 1:].iloc[:, samples2]], axis=1),
+                smoothing=smoothing,
+                max_workers=1,
+                verbose=False,
+            )["Weight"].values
+            for samples1, samples2 in zip(resamples1, resamples2)
+        ]
+    )
+
+    assert list(stability_df.columns) == BootstrapAnalyzer.COLUMNS
+    assert len(stability_df) == 45
+    np.testing.assert_allclose(stability_df["BootstrapMean"], weights.mean(axis=0))
+    np.testing.assert_allclose(stability_df["BootstrapStd"], weights.std(axis=0, ddof=1))
+    np.testing.assert_allclose(
+        stability_df["CILower"], np.quantile(weights, 0.025, axis=0)
+    )
+    np.testing.assert_allclose(
+        stability_df["SelectionFrequency"], np.mean(weights >= 0.4, axis=0)
+    )
+
+
+def test_shared_memory_does_not_grow_with_genes_times_resamples():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    n_genes, n_samples = len(df1), df1.shape[1] - 1
+
+    with SharedBootstrapSamples(df1, df2, n_bootstraps=1000) as shared_samples:
+        # The expression data and one sample index per sample and resample of both conditions
+        assert shared_samples.nbytes == 2 * 8 * n_samples * (n_genes + 1000)
+
+
+@pytest.mark.parametrize("backend", ["threads", "serial"])
+def test_edge_stability_backends(backend):
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = BootstrapAnalyzer(EmpiricalCopula())
+
+    with SharedBootstrapSamples(df1, df2, n_bootstraps=3, seed=2) as shared_samples:
+        expected = analyzer.compute_edge_stability(
+            shared_samples, batch_size=7, max_workers=2, verbose=False
+        )
+        stability_df = analyzer.compute_edge_stability(
+            shared_samples, batch_size=7, max_workers=2, verbose=False, backend=backend
+        )
+    pd.testing.assert_frame_equal(stability_df, expected)
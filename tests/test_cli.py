@@ -0,0 +1,157 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Importing the CLI used to take ~500 ms because of pandas and scipy, it must only need click
+HEAVY_MODULES = {
+    "pandas",
+    "numpy",
+    "scipy",
+    "tqdm",
+    "analyzer",
+    "enrichment",
+    "concurrent.futures.process",
+}
+
+
+def imported_modules(statement):
+    """
+    Runs `statement` in a fresh interpreter and returns the names of all modules imported afterwards.
+    """
+    process = subprocess.run(
+        [sys.executable, "-c", f"{statement}\nimport sys\nprint('\\n'.join(sys.modules), file=sys.stderr)"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(process.stderr.split())
+
+
+def test_cli_import_is_lazy():
+    assert not HEAVY_MODULES & imported_modules("import cli")
+
+
+def test_help_does_not_import_heavy_modules():
+    statement = "import sys, cli\nsys.argv = ['cli', '--help']\ntry:\n    cli.cli()\nexcept SystemExit:\n    pass"
+    assert not HEAVY_MODULES & imported_modules(statement)
+
+
+def test_go_enrichment_defaults_to_the_r_engine():
+    from click.testing import CliRunner
+
+    import cli
+
+    engine = next(param for param in cli.go_enrichment.params if param.name == "engine")
+    assert engine.default == "r"
+
+    result = CliRunner().invoke(
+        cli.cli,
+        ["go-enrichment", "--input_file", "network.tsv", "--output_path", ".", "--engine", "python"],
+    )
+    assert result.exit_code == 2
+    assert "--engine python requires --annotation_file and --obo_file" in result.output
+
+
+@pytest.mark.parametrize(
+    "option, message",
+    [
+        (["--pipeline"], "--pipeline is not supported with --condition"),
+        (["--output_format", "tsv.gz"], "--output_format tsv.gz is not supported with --condition"),
+    ],
+)
+def test_condition_rejects_unsupported_output_options(tmp_path, option, message):
+    from click.testing import CliRunner
+
+    import cli
+
+    conditions = [
+        "--condition",
+        "normal=./tests/data/BRCA_normal_subset.tsv",
+        "--condition",
+        "tumor=./tests/data/BRCA_tumor_subset.tsv",
+    ]
+    result = CliRunner().invoke(
+        cli.cli, ["codc", *conditions, "--output_path", str(tmp_path), *option]
+    )
+    assert result.exit_code == 2
+    assert message in result.output
+
+
+def test_pipeline_shuts_down_the_workers_when_loading_fails(monkeypatch, tmp_path):
+    from click.testing import CliRunner
+
+    import backends
+    import cli
+
+    executors = []
+
+    class RecordingExecutor(backends.SerialExecutor):
+        shut_down = False
+
+        def shutdown(self, wait=True, **kwargs):
+            self.shut_down = True
+
+    def create_executor(backend, max_workers=None):
+        executors.append(RecordingExecutor())
+        return executors[-1]
+
+    monkeypatch.setattr(backends, "create_executor", create_executor)
+    result = CliRunner().invoke(
+        cli.cli,
+        [
+            "codc",
+            "--input_file_1",
+            str(tmp_path / "missing.tsv"),
+            "--input_file_2",
+            "./tests/data/BRCA_tumor_subset.tsv",
+            "--output_path",
+            str(tmp_path),
+            "--pipeline",
+            "--backend",
+            "serial",
+        ],
+    )
+    assert isinstance(result.exception, FileNotFoundError)
+    assert len(executors) == 1 and executors[0].shut_down
+
+
+@pytest.mark.parametrize("backend", ["threads", "serial"])
+def test_bootstraps_run_on_the_chosen_backend(monkeypatch, tmp_path, backend):
+    from click.testing import CliRunner
+
+    import bootstrap
+    import cli
+
+    backends = []
+    create_executor = bootstrap.create_executor
+
+    def recording_create_executor(backend, max_workers=None):
+        backends.append(backend)
+        return create_executor(backend, max_workers)
+
+    monkeypatch.setattr(bootstrap, "create_executor", recording_create_executor)
+    result = CliRunner().invoke(
+        cli.cli,
+        [
+            "codc",
+            "--input_file_1",
+            "./tests/data/BRCA_normal_subset.tsv",
+            "--input_file_2",
+            "./tests/data/BRCA_tumor_subset.tsv",
+            "--output_path",
+            str(tmp_path),
+            "--backend",
+            backend,
+            "--bootstraps",
+            "2",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert backends == [backend]
+    assert len(pd.read_csv(tmp_path / "edge_stability.tsv", sep="\t")) == 45
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from comparison import ImplementationComparison
+from copula.empirical_copula import EmpiricalCopula
+
+
+@pytest.fixture
+def comparison():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    return ImplementationComparison(analyzer, df1, df2)
+
+
+def test_sample_pairs(comparison):
+    pairs = comparison.sample_pairs(20, seed=1)
+    assert pairs.shape == (20, 2)
+    assert (pairs[:, 0] < pairs[:, 1]).all() and pairs.max() < 10
+    assert len({tuple(pair) for pair in pairs}) == 20
+    assert len(comparison.sample_pairs()) == 45
+
+
+def test_reference_network_parity(comparison):
+    # The reference network was computed with the R implementation on the genes of the test data
+    r_network = pd.read_csv("./data/R_impl_network.tsv", sep="\t")
+    pairs = comparison.pairs_of_network(r_network)
+    python_network, seconds = comparison.run_python(pairs, batch_size=10, max_workers=1)
+
+    merged, summary = comparison.compare_networks(python_network, r_network)
+    assert seconds > 0
+    assert summary["pairs_matched"] == len(merged) == 45
+    assert summary["max_abs_difference"] < 1e-12
+    assert summary["pairs_above_tolerance"] == 0
+
+
+def test_compare_networks_reports_differences():
+    python_network = pd.DataFrame(
+        {"Regulator": ["A", "A", "B"], "Target": ["B", "C", "C"], "Weight": [0.1, 0.2, 0.3]}
+    )
+    # Same pairs in the other orientation, one weight differs and one pair is missing
+    r_network = pd.DataFrame(
+        {"Regulator": ["B", "C", "D"], "Target": ["A", "A", "A"], "Weight": [0.1, 0.5, 0.4]}
+    )
+    merged, summary = ImplementationComparison.compare_networks(python_network, r_network)
+
+    assert summary["pairs_matched"] == 2
+    assert summary["pairs_only_python"] == 1 and summary["pairs_only_r"] == 1
+    assert summary["max_abs_difference"] == pytest.approx(0.3)
+    assert summary["mean_abs_difference"] == pytest.approx(0.15)
+    assert summary["pairs_above_tolerance"] == 1
+    assert list(merged.columns) == ["Regulator", "Target", "Weight_python", "Weight_r", "Difference"]
+
+
+def test_timing_table():
+    table = ImplementationComparison.timing_table({"python": (2.0, 100), "r": (8.0, 100)})
+    assert list(table["pairs_per_sec"]) == [50.0, 12.5]
+    assert list(table["speedup"]) == [4.0, 1.0]
+    assert np.isnan(
+        ImplementationComparison.timing_table({"python": (2.0, 100), "r": (None, 100)})["pairs_per_sec"][1]
+    )
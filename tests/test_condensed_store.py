@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer, expression_data_class
+from condensed_store import CondensedStore, CondensedStoreAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+
+OPTIONS = {"ties_method": "average", "smoothing": "none", "ks_stat_method": "asymp"}
+
+
+@pytest.fixture
+def setup_data():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    return df1, df2, analyzer
+
+
+@pytest.mark.parametrize("backend", ["processes", "threads"])
+def test_workers_write_into_store(tmp_path, setup_data, backend):
+    df1, df2, analyzer = setup_data
+    path = str(tmp_path / "network.npy")
+    store = CondensedStore.create(path, df1.iloc[:, 0].values, 7, OPTIONS)
+    with expression_data_class(backend)(df1, df2) as shared_data:
+        computed = CondensedStoreAnalyzer(analyzer).compute_store(
+            store, shared_data, max_workers=2, verbose=False, backend=backend
+        )
+    assert computed == 7
+
+    store = CondensedStore.open(path)
+    assert store.complete and store.weights.dtype == np.float32
+    expected = analyzer.compute_condensed(df1.iloc[:, 1:].values, df2.iloc[:, 1:].values)
+    np.testing.assert_allclose(store.weights, expected, rtol=1e-6)
+
+    network_df = analyzer.compute_dc_copula_network_parallel(df1, df2, verbose=False)
+    stored_network = store.to_network()
+    pd.testing.assert_frame_equal(
+        stored_network.drop(columns="Weight"), network_df.drop(columns="Weight")
+    )
+    first = network_df.iloc[0]
+    assert store.weight(first["Target"], first["Regulator"]) == pytest.approx(
+        first["Weight"]
+    )
+    with pytest.raises(KeyError):
+        store.weight("ACTA1", "NOT_A_GENE")
+
+
+def test_resume_computes_pending_tiles_only(tmp_path, setup_data):
+    df1, df2, analyzer = setup_data
+    path = str(tmp_path / "network.npy")
+    gene_names = df1.iloc[:, 0].values
+    store = CondensedStore.create(path, gene_names, 10, OPTIONS)
+    store_analyzer = CondensedStoreAnalyzer(analyzer)
+    with expression_data_class("serial")(df1, df2) as shared_data:
+        store_analyzer.compute_store(store, shared_data, verbose=False, backend="serial")
+        expected = np.array(store.weights)
+
+        # Interrupting the run after the first two tiles
+        store.done[2:] = 0
+        store.weights[20:] = np.nan
+        store.flush()
+        store = CondensedStore.resume(path, gene_names, 10, OPTIONS)
+        np.testing.assert_array_equal(store.pending_tiles(), [2, 3, 4])
+        assert (
+            store_analyzer.compute_store(store, shared_data, verbose=False, backend="serial")
+            == 3
+        )
+    np.testing.assert_array_equal(store.weights, expected)
+
+    with pytest.raises(ValueError, match="batch_size"):
+        CondensedStore.resume(path, gene_names, 20, OPTIONS)
+    with pytest.raises(ValueError, match="options"):
+        CondensedStore.resume(path, gene_names, 10, {**OPTIONS, "smoothing": "beta"})
+    with pytest.raises(ValueError, match="other genes"):
+        CondensedStore.resume(path, gene_names[::-1], 10, OPTIONS)
+
+
+@pytest.mark.parametrize("sidecar", ["network.json", "network.done.npy"])
+def test_resume_rejects_incomplete_store(tmp_path, setup_data, sidecar):
+    df1, _, _ = setup_data
+    path = str(tmp_path / "network.npy")
+    gene_names = df1.iloc[:, 0].values
+    CondensedStore.create(path, gene_names, 10, OPTIONS).flush()
+    (tmp_path / sidecar).unlink()
+
+    with pytest.raises(ValueError, match=f"incomplete store \\(missing .*{sidecar}\\)"):
+        CondensedStore.resume(path, gene_names, 10, OPTIONS)
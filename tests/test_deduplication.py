@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from deduplication import GeneClasses
+
+
+@pytest.fixture
+def frames():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    # All-zero genes, and a rescaled copy of ACTA1 with the same ranks in both conditions
+    extra1 = pd.DataFrame(
+        [
+            ["ZERO1"] + [0.0] * 9,
+            ["ACTA1_COPY"] + list(df1.iloc[0, 1:] * 2),
+            ["ZERO2"] + [0.0] * 9,
+        ],
+        columns=df1.columns,
+    )
+    extra2 = pd.DataFrame(
+        [
+            ["ZERO1"] + [0.0] * 9,
+            ["ACTA1_COPY"] + list(df2.iloc[0, 1:] + 1),
+            ["ZERO2"] + [0.0] * 9,
+        ],
+        columns=df2.columns,
+    )
+    return (
+        pd.concat([df1, extra1], ignore_index=True),
+        pd.concat([df2, extra2], ignore_index=True),
+    )
+
+
+def test_gene_classes(frames):
+    gene_classes = GeneClasses(*frames)
+    gene_names = list(frames[0].iloc[:, 0])
+    classes = dict(zip(gene_names, gene_classes.classes))
+    assert classes["ACTA1_COPY"] == classes["ACTA1"]
+    assert classes["ZERO1"] == classes["ZERO2"]
+    assert classes["ZERO1"] != classes["ACTA1"]
+    # Every class is represented by its first gene
+    for k, representative in enumerate(gene_classes.representatives):
+        assert representative == np.flatnonzero(gene_classes.classes == k)[0]
+    pairs = gene_classes.pairs()
+    n_classes = gene_classes.n_classes
+    assert len(pairs) == n_classes * (n_classes - 1) // 2 + np.sum(gene_classes.sizes > 1)
+    assert len(pairs) < gene_classes.n_pairs
+
+
+@pytest.mark.parametrize("smoothing", ["none", "beta", "checkerboard"])
+def test_expanded_network_matches_full_network(frames, smoothing):
+    df1, df2 = frames
+    analyzer = GeneExpressionAnalyzer(EmpiricalCopula())
+    expected = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, smoothing=smoothing, max_workers=1, verbose=False
+    )
+
+    gene_classes = GeneClasses(df1, df2)
+    results = []
+    analyzer.compute_dc_copula_network_parallel(
+        df1,
+        df2,
+        smoothing=smoothing,
+        max_workers=1,
+        verbose=False,
+        pairs=gene_classes.pairs(),
+        on_batch=results.append,
+    )
+    network_df = gene_classes.expand(np.concatenate(results), df1.iloc[:, 0].values)
+    pd.testing.assert_frame_equal(network_df, expected)
@@ -1,3 +1,5 @@
+import tracemalloc
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -366,3 +368,48 @@ def test_empirical_copula_max_ties():
         decimal=6,
         err_msg="empirical-copula max ties do not match expected values.",
     )
+
+
+def test_batched_empirical_distribution_function():
+    copula = EmpiricalCopula()
+    rng = np.random.default_rng(0)
+    data = rng.random((4, 30, 2))
+    evaluation_points = rng.random((4, 20, 2))
+    batched = copula.batched_empirical_distribution_function(evaluation_points, data)
+    for k in range(4):
+        np.testing.assert_array_equal(
+            batched[k],
+            copula.empirical_distribution_function(evaluation_points[k], data[k]),
+        )
+
+
+@pytest.mark.parametrize("num_dimensions", [1, 2, 3, 5])
+def test_dominance_counts_match_pairwise_comparison(num_dimensions):
+    copula = EmpiricalCopula()
+    rng = np.random.default_rng(num_dimensions)
+    # Few distinct values, so that there are many ties
+    data = rng.integers(0, 6, size=(40, num_dimensions)).astype(float)
+    points = rng.integers(-1, 7, size=(25, num_dimensions)).astype(float)
+    expected = [np.sum(np.all(data <= point, axis=1)) for point in points]
+    np.testing.assert_array_equal(
+        copula.dominance_counts(points, data, chunk_size=7), expected
+    )
+
+
+def test_dominance_counts_memory_is_linear_in_samples():
+    copula = EmpiricalCopula()
+    rng = np.random.default_rng(0)
+    data = rng.random((20_000, 2))
+    points = data[:1024]
+
+    tracemalloc.start()
+    try:
+        counts = copula.dominance_counts(points, data, chunk_size=256)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # The prefix bitsets of all n + 1 lengths alone would take 100 MB packed and 400 MB unpacked
+    assert peak < 16 * 2**20
+    expected = [np.sum(np.all(data <= point, axis=1)) for point in points[:50]]
+    np.testing.assert_array_equal(counts[:50], expected)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from scipy.stats import hypergeom
+from enrichment import (
+    GOAnnotationIndex,
+    adjust_pvalues,
+    network_genes,
+    parse_annotations,
+    parse_obo,
+)
+
+OBO_FILE = "./tests/data/go_subset.obo"
+GAF_FILE = "./tests/data/go_subset.gaf"
+MUSCLE_GENES = ["ACTA1", "MYL2", "ACTN2", "CKM", "MYL1", "MYH2", "ATP2A1", "KBTBD10", "NRAP", "NEB"]
+
+
+def test_parse_obo():
+    terms = parse_obo(OBO_FILE)
+    assert "GO:0000001" not in terms  # obsolete
+    assert terms["GO:0030016"]["ontology"] == "CC"
+    assert sorted(terms["GO:0030016"]["parents"]) == ["GO:0005737", "GO:0110165"]
+
+
+def test_parse_annotations_drops_negated():
+    annotations = parse_annotations(GAF_FILE, "SYMBOL")
+    assert not ((annotations["gene"] == "NUC0") & (annotations["go_id"] == "GO:0030016")).any()
+    with pytest.raises(ValueError):
+        parse_annotations(GAF_FILE, "ENTREZID")
+
+
+@pytest.mark.parametrize("method", ["BH", "BY", "bonferroni", "holm", "none"])
+def test_adjust_pvalues(method):
+    pvalues = np.array([0.01, 0.04, 0.03, 0.005, 0.5])
+    # Reference values from R: p.adjust(c(0.01, 0.04, 0.03, 0.005, 0.5), method)
+    expected = {
+        "BH": [0.025, 0.05, 0.05, 0.025, 0.5],
+        "BY": [0.05708333, 0.11416667, 0.11416667, 0.05708333, 1.0],
+        "bonferroni": [0.05, 0.2, 0.15, 0.025, 1.0],
+        "holm": [0.04, 0.09, 0.09, 0.025, 0.5],
+        "none": pvalues,
+    }[method]
+    np.testing.assert_allclose(adjust_pvalues(pvalues, method), expected, rtol=1e-6)
+
+
+def test_index_propagates_annotations_to_ancestors():
+    index = GOAnnotationIndex.build(GAF_FILE, OBO_FILE, "CC", "SYMBOL")
+    term_sizes = dict(zip(index.terms, np.asarray(index.membership.sum(axis=1)).ravel()))
+    assert term_sizes["GO:0030016"] == 10
+    assert term_sizes["GO:0005737"] == 20  # myofibril is part of the cytoplasm
+    assert term_sizes["GO:0005575"] == 50
+    assert "GO:0006936" not in term_sizes  # BP term
+
+
+def test_enrich_hypergeometric_test():
+    index = GOAnnotationIndex.build(GAF_FILE, OBO_FILE, "CC", "SYMBOL")
+    result = index.enrich(MUSCLE_GENES[:8] + ["UNKNOWN"], min_size=1)
+    myofibril = result.set_index("ID").loc["GO:0030016"]
+    assert myofibril["pvalue"] == pytest.approx(hypergeom.sf(7, 50, 10, 8))
+    assert myofibril["GeneRatio"] == "8/8"
+    assert myofibril["BgRatio"] == "10/50"
+    assert result["ID"].iloc[0] == "GO:0030016"
+    assert "GO:0005634" not in set(result["ID"])
+
+
+def test_load_uses_cache(tmp_path):
+    index = GOAnnotationIndex.load(GAF_FILE, OBO_FILE, "CC", cache_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 1
+    cached = GOAnnotationIndex.load(GAF_FILE, OBO_FILE, "CC", cache_dir=tmp_path)
+    assert list(cached.terms) == list(index.terms)
+    assert (cached.membership != index.membership).nnz == 0
+
+
+def test_network_genes():
+    genes = network_genes("./data/python_impl_network.tsv", threshold=0.5)
+    assert set(genes) == {"MYL1", "MYL2", "MYH2", "NRAP"}
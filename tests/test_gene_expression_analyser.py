@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
 import numpy as np
-from analyzer import GeneExpressionAnalyzer
+from analyzer import PAIR_RESULT_DTYPE, GeneExpressionAnalyzer, SharedExpressionData
 from copula.empirical_copula import EmpiricalCopula
 
 
@@ -229,3 +229,88 @@ def test_compute_dc_copula_network_parallel_result():
 
     # Use pandas testing assert function to compare dataframes
     pd.testing.assert_frame_equal(network_df, expected_network_df)
+
+
+def test_iter_pair_batches_covers_all_pairs():
+    batches = list(GeneExpressionAnalyzer.iter_pair_batches(5, batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    pairs = [pair for batch in batches for pair in batch]
+    assert pairs == [(i, j) for i in range(4) for j in range(i + 1, 5)]
+
+
+def test_bounded_in_flight_submission(setup_data):
+    df1, df2, analyzer = setup_data
+    network_df = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, batch_size=1, max_workers=2, max_in_flight=1
+    )
+    assert len(network_df) == 3
+    assert set(zip(network_df["Regulator"], network_df["Target"])) == {
+        ("Gene1", "Gene2"),
+        ("Gene1", "Gene3"),
+        ("Gene2", "Gene3"),
+    }
+
+
+def test_condensed_to_pairs_matches_pair_order():
+    pairs = [(i, j) for i in range(49) for j in range(i + 1, 50)]
+    converted = GeneExpressionAnalyzer.condensed_to_pairs(np.arange(len(pairs)), 50)
+    np.testing.assert_array_equal(converted, pairs)
+
+
+def test_subset_of_pairs(setup_data):
+    df1, df2, analyzer = setup_data
+    network_df = analyzer.compute_dc_copula_network_parallel(df1, df2)
+    subset_df = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, pairs=np.array([[0, 2], [1, 2]])
+    )
+    pd.testing.assert_frame_equal(subset_df, network_df.iloc[[1, 2]].reset_index(drop=True))
+
+
+def test_compute_condensed_matches_network():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    network_df = analyzer.compute_dc_copula_network_parallel(df1, df2, verbose=False)
+
+    out = np.full(45, -1.0)
+    condensed = analyzer.compute_condensed(
+        df1.iloc[:, 1:].values, df2.iloc[:, 1:].values, batch_size=7, out=out
+    )
+    assert condensed is out
+    np.testing.assert_allclose(condensed, network_df["Weight"].values)
+
+
+def test_compute_condensed_validates_inputs(setup_data):
+    df1, df2, analyzer = setup_data
+    data1, data2 = df1.iloc[:, 1:].values, df2.iloc[:, 1:].values
+    with pytest.raises(ValueError):
+        analyzer.compute_condensed(data1, data2, out=np.empty(4))
+    with pytest.raises(ValueError):
+        analyzer.compute_condensed(data1, data2[:2])
+
+
+def test_compute_pairs_returns_packed_records(setup_data):
+    df1, df2, analyzer = setup_data
+    with SharedExpressionData(df1, df2) as shared_data:
+        results = analyzer.compute_pairs(
+            [(0, 1), (1, 2)],
+            shared_data.shm_data1.name,
+            shared_data.shm_data2.name,
+            "average",
+            "none",
+            "asymp",
+            shared_data.data1_shape,
+            shared_data.data2_shape,
+            shared_data.dtype,
+        )
+        network_df = analyzer.compute_dc_copula_network_parallel(
+            df1, df2, shared_data=shared_data, max_workers=1, verbose=False
+        )
+    assert results.dtype == PAIR_RESULT_DTYPE
+    np.testing.assert_array_equal(results["regulator"], [0, 1])
+    np.testing.assert_array_equal(results["target"], [1, 2])
+
+    expected = network_df.iloc[[0, 2]].reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        GeneExpressionAnalyzer.to_network(results, shared_data.gene_names), expected
+    )
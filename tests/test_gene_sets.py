@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ks_2samp
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from gene_sets import GeneSetAnalyzer, read_gene_sets
+from multi_condition import SharedConditions
+
+
+@pytest.fixture
+def frames():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    return df1, df2
+
+
+def compute(frames, gene_sets, smoothing="none"):
+    df1, df2 = frames
+    empirical_copula = EmpiricalCopula()
+    analyzer = GeneSetAnalyzer(empirical_copula)
+    indices = analyzer.index_gene_sets(gene_sets, df1.iloc[:, 0].values)
+    with SharedConditions({"1": df1, "2": df2}, empirical_copula) as shared_conditions:
+        return analyzer.compute_gene_sets(
+            shared_conditions,
+            indices,
+            smoothing=smoothing,
+            batch_size=2,
+            max_workers=1,
+            verbose=False,
+        )
+
+
+def test_read_gene_sets(tmp_path):
+    path = tmp_path / "sets.gmt"
+    path.write_text("muscle\tdescription\tACTA1\tMYL2\tCKM\n\nsarcomere\t\tNRAP\tNEB\n")
+    assert read_gene_sets(str(path)) == {
+        "muscle": ["ACTA1", "MYL2", "CKM"],
+        "sarcomere": ["NRAP", "NEB"],
+    }
+
+    path.write_text("muscle\tdescription\tACTA1\nmuscle\t\tMYL2\tCKM\n")
+    with pytest.raises(ValueError, match="more than once"):
+        read_gene_sets(str(path))
+
+
+def test_index_gene_sets_validates_genes(frames):
+    gene_names = frames[0].iloc[:, 0].values
+    with pytest.raises(ValueError, match="UNKNOWN"):
+        GeneSetAnalyzer.index_gene_sets({"a": ["ACTA1", "UNKNOWN"]}, gene_names)
+    with pytest.raises(ValueError, match="two distinct genes"):
+        GeneSetAnalyzer.index_gene_sets({"a": ["ACTA1", "ACTA1"]}, gene_names)
+
+
+@pytest.mark.parametrize("smoothing", ["none", "checkerboard"])
+def test_gene_pairs_match_network(frames, smoothing):
+    df1, df2 = frames
+    network_df = GeneExpressionAnalyzer(EmpiricalCopula()).compute_dc_copula_network_parallel(
+        df1, df2, smoothing=smoothing, max_workers=1, verbose=False
+    )
+    gene_sets = {
+        f"{regulator}-{target}": [regulator, target]
+        for regulator, target in zip(network_df["Regulator"], network_df["Target"])
+    }
+    np.testing.assert_allclose(
+        compute(frames, gene_sets, smoothing), network_df["Weight"].values
+    )
+
+
+def test_gene_triplet_matches_empirical_copula(frames):
+    df1, df2 = frames
+    genes = ["ACTA1", "CKM", "NEB"]
+    copula = EmpiricalCopula()
+    copulas = []
+    for df in frames:
+        data = df.set_index("Gene").loc[genes].values.T
+        u = copula.pseudo_observations(data)
+        copulas.append(copula.empirical_copula(u, data))
+    expected = ks_2samp(*copulas, method="asymp").statistic
+
+    weights = compute(frames, {"triplet": genes, "module": genes + ["MYL1", "NRAP"]})
+    assert weights[0] == pytest.approx(expected)
+    assert 0 <= weights[1] <= 1
+
+    table = GeneSetAnalyzer.to_table({"triplet": genes, "module": genes}, weights)
+    assert list(table.columns) == ["GeneSet", "Size", "Genes", "Weight"]
+    assert table["Weight"].is_monotonic_decreasing
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from grid_copula import GridCopula, GridCopulaAnalyzer
+from multi_condition import SharedConditions
+
+
+@pytest.fixture
+def frames():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    return df1, df2
+
+
+def grid_weights(frames, grid_size):
+    with SharedConditions(dict(zip("12", frames)), EmpiricalCopula()) as shared_conditions:
+        return GridCopulaAnalyzer(grid_size).compute_condensed(
+            shared_conditions, batch_size=7, max_workers=1, verbose=False
+        )
+
+
+def test_grid_copula_matches_empirical_copula_at_grid_points():
+    rng = np.random.default_rng(0)
+    copula = EmpiricalCopula()
+    u = copula.pseudo_observations(rng.random((50, 2)))
+    grid = GridCopula(5)
+    values, counts = grid.grid_copula(*grid.bin_pseudo_observations(u).T)
+    points = np.array([(a / 5, b / 5) for a in range(6) for b in range(6)])
+    np.testing.assert_allclose(
+        values.ravel(), copula.empirical_distribution_function(points, u)
+    )
+    assert counts.sum() == 50
+
+
+def test_grid_is_exact_when_every_sample_is_on_a_grid_line(frames):
+    # Both conditions have 9 samples, so all pseudo-observations are multiples of 1 / 10
+    exact = GeneExpressionAnalyzer(EmpiricalCopula()).compute_condensed(
+        frames[0].iloc[:, 1:].values, frames[1].iloc[:, 1:].values, max_workers=1
+    )
+    np.testing.assert_allclose(grid_weights(frames, 10), exact)
+    np.testing.assert_allclose(grid_weights(frames, 30), exact)
+
+
+def test_coarse_grid_approximates_weights():
+    rng = np.random.default_rng(1)
+    data1 = rng.random((500, 2))
+    data2 = np.column_stack([data1[:, 0], data1[:, 0] + rng.random(500) / 2])
+    copula = EmpiricalCopula()
+    exact = GeneExpressionAnalyzer(copula).pair_weight(
+        data1, data2, 0, 1, "average", "none", "asymp"
+    )
+    grid = GridCopula(50)
+    weight = grid.pair_weight(
+        grid.bin_pseudo_observations(copula.pseudo_observations(data1)),
+        grid.bin_pseudo_observations(copula.pseudo_observations(data2)),
+    )
+    assert weight == pytest.approx(exact, abs=0.05)
+
+
+def test_invalid_grid_size():
+    with pytest.raises(ValueError):
+        GridCopula(0)
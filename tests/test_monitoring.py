@@ -0,0 +1,54 @@
+import json
+
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from monitoring import ProgressMonitor
+
+
+def test_snapshot_reports_progress(tmp_path):
+    monitor = ProgressMonitor(tmp_path / "metrics.jsonl", interval=3600)
+    monitor.start(pairs_total=100, shared_memory_bytes=2048)
+    monitor.record_batch(40, pid=123, finished=1.5)
+    snapshot = monitor.snapshot()
+    monitor.stop()
+
+    assert snapshot["pairs_done"] == 40
+    assert snapshot["pairs_total"] == 100
+    assert snapshot["pairs_per_sec"] > 0
+    assert snapshot["eta_seconds"] == pytest.approx(60 / snapshot["pairs_per_sec"])
+    assert snapshot["workers"] == {"123": 1.5}
+    assert snapshot["shared_memory_bytes"] == 2048
+    assert snapshot["parent_rss_bytes"] > 0
+
+
+def test_prometheus_textfile(tmp_path):
+    path = tmp_path / "codc.prom"
+    monitor = ProgressMonitor(path, file_format="prometheus", interval=3600)
+    monitor.start(pairs_total=10)
+    monitor.record_batch(10, pid=7, finished=2.0)
+    monitor.stop()
+
+    metrics = dict(
+        line.rsplit(" ", 1) for line in path.read_text().splitlines() if not line.startswith("#")
+    )
+    assert metrics["codc_pairs_done"] == "10"
+    assert metrics["codc_finished"] == "1"
+    assert metrics['codc_worker_last_heartbeat_timestamp_seconds{pid="7"}'] == "2.0"
+
+
+def test_compute_dc_copula_network_parallel_writes_metrics(tmp_path):
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    monitor = ProgressMonitor(tmp_path / "metrics.jsonl", interval=0.01)
+
+    analyzer.compute_dc_copula_network_parallel(
+        df1, df2, batch_size=5, monitor=monitor, verbose=False
+    )
+
+    lines = [json.loads(line) for line in open(tmp_path / "metrics.jsonl")]
+    assert lines[-1]["finished"]
+    assert lines[-1]["pairs_done"] == lines[-1]["pairs_total"] == 45
+    assert len(lines[-1]["workers"]) >= 1
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from multi_condition import MultiConditionAnalyzer, SharedConditions
+
+
+@pytest.fixture
+def frames():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    df3 = df2.copy()
+    rng = np.random.default_rng(0)
+    df3.iloc[:, 1:] = df2.iloc[:, 1:].values[:, ::-1] + rng.random(df2.iloc[:, 1:].shape)
+    return {"normal": df1, "tumor": df2, "subtype": df3}
+
+
+class CountingCopula(EmpiricalCopula):
+    calls = 0
+
+    def pseudo_observations_copula(self, *args, **kwargs):
+        CountingCopula.calls += 1
+        return super().pseudo_observations_copula(*args, **kwargs)
+
+
+def test_comparisons():
+    names = ["normal", "tumor", "subtype"]
+    assert MultiConditionAnalyzer.comparisons(names) == [
+        ("normal", "tumor"),
+        ("normal", "subtype"),
+        ("tumor", "subtype"),
+    ]
+    assert MultiConditionAnalyzer.comparisons(names, "normal") == [
+        ("normal", "tumor"),
+        ("normal", "subtype"),
+    ]
+    with pytest.raises(ValueError):
+        MultiConditionAnalyzer.comparisons(names, "unknown")
+
+
+@pytest.mark.parametrize("smoothing", ["none", "beta"])
+def test_comparisons_match_pairwise_runs(frames, smoothing):
+    empirical_copula = EmpiricalCopula()
+    analyzer = MultiConditionAnalyzer(empirical_copula)
+    comparisons = analyzer.comparisons(list(frames))
+    with SharedConditions(frames, empirical_copula) as shared_conditions:
+        weights = analyzer.compute_comparisons(
+            shared_conditions,
+            comparisons,
+            smoothing=smoothing,
+            batch_size=7,
+            max_workers=1,
+            verbose=False,
+        )
+
+    pairwise = GeneExpressionAnalyzer(empirical_copula)
+    for a, b in comparisons:
+        expected = pairwise.compute_dc_copula_network_parallel(
+            frames[a], frames[b], smoothing=smoothing, verbose=False
+        )
+        network = analyzer.to_network(
+            weights[(a, b)], frames[a].iloc[:, 0].values, "Diff Co-Exp of both Condition"
+        )
+        pd.testing.assert_frame_equal(network, expected)
+
+
+def test_copulas_are_shared_across_comparisons(frames):
+    empirical_copula = CountingCopula()
+    analyzer = MultiConditionAnalyzer(empirical_copula)
+    with SharedConditions(frames, empirical_copula) as shared_conditions:
+        # Run the tile in this process to count the copula computations
+        weights = analyzer.compute_tile(
+            (0, 45),
+            [shm.name for shm in shared_conditions.shms],
+            shared_conditions.shapes,
+            [(0, 1), (0, 2), (1, 2)],
+            "none",
+            "asymp",
+        )
+    assert weights.shape == (3, 45)
+    # One copula per pair and condition, instead of two per pair and comparison
+    assert CountingCopula.calls == 45 * 3
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from network_index import NetworkIndex
+
+
+@pytest.fixture
+def network():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    weights = analyzer.compute_condensed(df1.iloc[:, 1:].values, df2.iloc[:, 1:].values)
+    network_df = analyzer.compute_dc_copula_network_parallel(df1, df2, verbose=False)
+    return df1.iloc[:, 0].values, weights, network_df
+
+
+def expected_edges(network_df, gene, threshold):
+    edges = pd.concat(
+        [
+            network_df[network_df["Target"] == gene].rename(columns={"Regulator": "Partner"}),
+            network_df[network_df["Regulator"] == gene].rename(columns={"Target": "Partner"}),
+        ]
+    )
+    edges = edges[edges["Weight"] >= threshold]
+    return dict(zip(edges["Partner"], edges["Weight"]))
+
+
+def test_sources_give_the_same_index(tmp_path, network):
+    gene_names, weights, network_df = network
+    network_path = str(tmp_path / "network.tsv")
+    network_df.to_csv(network_path, sep="\t", index=False)
+    indices = [
+        NetworkIndex.from_network(str(tmp_path / "df"), network_df, gene_names, 0.2),
+        NetworkIndex.from_tsv(
+            str(tmp_path / "tsv"), network_path, gene_names, 0.2, chunksize=7
+        ),
+        NetworkIndex.from_condensed(
+            str(tmp_path / "condensed"), weights, gene_names, 0.2, chunk_size=6
+        ),
+    ]
+
+    for network_index in indices:
+        network_index = NetworkIndex.open(network_index.path)
+        assert network_index.n_edges == (network_df["Weight"] >= 0.2).sum()
+        for gene in gene_names:
+            edges = network_index.edges(gene)
+            assert network_index.degree(gene) == len(edges)
+            assert (np.diff(edges["Weight"]) <= 0).all()
+            np.testing.assert_allclose(
+                edges["Weight"],
+                [expected_edges(network_df, gene, 0.2)[p] for p in edges["Partner"]],
+                rtol=1e-6,
+            )
+            assert set(edges["Partner"]) == set(expected_edges(network_df, gene, 0.2))
+
+
+def test_edges_top_and_min_weight(tmp_path, network):
+    gene_names, weights, _ = network
+    network_index = NetworkIndex.from_condensed(str(tmp_path), weights, gene_names, 0.0)
+    gene = gene_names[0]
+    edges = network_index.edges(gene)
+    assert len(edges) == len(gene_names) - 1
+
+    pd.testing.assert_frame_equal(network_index.edges(gene, top=3), edges.head(3))
+    min_weight = float(edges["Weight"].iloc[4])
+    strong = network_index.edges(gene, min_weight=min_weight)
+    assert (strong["Weight"] >= min_weight).all()
+    assert len(strong) == (edges["Weight"] >= min_weight).sum()
+    with pytest.raises(KeyError):
+        network_index.edges("NOT_A_GENE")
+
+
+def test_weights_keep_the_type_of_the_network(tmp_path, network):
+    gene_names, weights, network_df = network
+    network_path = str(tmp_path / "network.tsv")
+    network_df.to_csv(network_path, sep="\t", index=False)
+    from_tsv = NetworkIndex.from_tsv(str(tmp_path / "tsv"), network_path, gene_names, 0.0)
+    from_store = NetworkIndex.from_condensed(
+        str(tmp_path / "npy"), weights.astype(np.float32), gene_names, 0.0
+    )
+    assert from_tsv.weights.dtype == np.float64
+    assert from_store.weights.dtype == np.float32
+
+    written = pd.read_csv(network_path, sep="\t")
+    edge = written.iloc[len(written) // 2]
+    for network_index in (from_tsv, from_store):
+        # A weight copied from the network keeps its edge
+        edges = network_index.edges(edge["Target"], min_weight=float(edge["Weight"]))
+        assert edge["Regulator"] in set(edges["Partner"])
+    edges = from_tsv.edges(edge["Target"])
+    assert edges.loc[edges["Partner"] == edge["Regulator"], "Weight"].item() == edge["Weight"]
@@ -0,0 +1,38 @@
+import pandas as pd
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from performance import PerformanceSweep
+
+
+def test_sweep_records_every_configuration(tmp_path):
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    sweep = PerformanceSweep(analyzer, df1, df2, warmup=1, iterations=2)
+
+    rows = sweep.run(gene_counts=(5, None), workers=(1,), batch_sizes=(3, 50))
+
+    # 2 dataset sizes x 2 batch sizes x 2 measured iterations, warmup runs are not recorded
+    assert len(rows) == 8
+    assert {row["n_genes"] for row in rows} == {5, 10}
+    assert {row["pairs"] for row in rows} == {10, 45}
+    assert all(row["wall_time"] > 0 and row["worker_cpu_time"] > 0 for row in rows)
+    assert all(row["worker_peak_rss"] > 0 for row in rows)
+
+    sweep.write_csv(rows, tmp_path / "performance.csv")
+    measurements = pd.read_csv(tmp_path / "performance.csv")
+    assert list(measurements.columns) == PerformanceSweep.COLUMNS
+    assert sorted(measurements["iteration"].unique()) == [1, 2]
+
+
+def test_sweep_records_the_backend():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    sweep = PerformanceSweep(analyzer, df1, df2, warmup=0, iterations=1)
+
+    rows = sweep.run(backends=("processes", "threads", "serial"), workers=(2,))
+
+    assert [row["backend"] for row in rows] == ["processes", "threads", "serial"]
+    assert {row["pairs"] for row in rows} == {45}
+    assert all(row["parent_cpu_time"] >= 0 for row in rows)
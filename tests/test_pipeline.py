@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import PAIR_RESULT_DTYPE, GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from pipeline import NETWORK_COLUMNS, NetworkWriter, read_expression_files
+
+INPUT_FILES = (
+    "./tests/data/BRCA_normal_subset.tsv",
+    "./tests/data/BRCA_tumor_subset.tsv",
+)
+
+
+def sorted_network(df):
+    return df.sort_values(["Regulator", "Target"]).reset_index(drop=True)
+
+
+def test_read_expression_files():
+    df1, df2 = read_expression_files(*INPUT_FILES)
+    pd.testing.assert_frame_equal(df1, pd.read_csv(INPUT_FILES[0], sep="\t"))
+    pd.testing.assert_frame_equal(df2, pd.read_csv(INPUT_FILES[1], sep="\t"))
+
+
+@pytest.mark.parametrize("file_name", ["network.tsv", "network.tsv.gz"])
+def test_written_network_matches_collected_network(tmp_path, file_name):
+    df1, df2 = read_expression_files(*INPUT_FILES)
+    analyzer = GeneExpressionAnalyzer(EmpiricalCopula())
+    expected = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, batch_size=7, max_workers=1, verbose=False
+    )
+
+    path = str(tmp_path / file_name)
+    with NetworkWriter(path, df1.iloc[:, 0].values, max_pending=2) as writer:
+        assert (
+            analyzer.compute_dc_copula_network_parallel(
+                df1,
+                df2,
+                batch_size=7,
+                max_workers=1,
+                verbose=False,
+                on_batch=writer.write,
+            )
+            is None
+        )
+    assert writer.rows == len(expected)
+
+    written = pd.read_csv(path, sep="\t")
+    pd.testing.assert_frame_equal(sorted_network(written), sorted_network(expected))
+
+
+def test_empty_network_has_header(tmp_path):
+    path = tmp_path / "network.tsv"
+    NetworkWriter(str(path), gene_names=[]).close()
+    assert path.read_text() == "\t".join(NETWORK_COLUMNS) + "\n"
+
+
+def test_write_error_is_raised(tmp_path):
+    writer = NetworkWriter(str(tmp_path / "network.tsv"), gene_names=["A"])
+    # Gene index 1 does not exist
+    writer.write(np.array([(0, 1, 0.5)], dtype=PAIR_RESULT_DTYPE))
+    with pytest.raises(RuntimeError, match="Writing"):
+        writer.close()
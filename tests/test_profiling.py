@@ -0,0 +1,104 @@
+import json
+
+import numpy as np
+import pandas as pd
+from analyzer import GeneExpressionAnalyzer, expression_data_class
+from copula.empirical_copula import EmpiricalCopula
+from profiling import (
+    PROFILE_PROGRESS,
+    RunProfiler,
+    StageProfiler,
+    batch_stats,
+    peak_rss_bytes,
+)
+
+
+def test_stage_profiler_accumulates_stages():
+    profiler = StageProfiler()
+    for _ in range(3):
+        with profiler.stage("ranking"):
+            sum(range(1000))
+    profiler.add("ks_test", wall=0.5, cpu=0.25)
+    snapshot = profiler.snapshot()
+    assert snapshot["stages"]["ranking"]["calls"] == 3
+    assert snapshot["stages"]["ks_test"] == {"wall": 0.5, "cpu": 0.25, "calls": 1}
+    assert snapshot["max_rss"] > 0
+
+
+def test_stage_profiler_keeps_the_peak_of_the_parent():
+    # Batches of the thread and serial backends are profiled in the parent process
+    np.ones(100_000_000 // 8)
+    peak = peak_rss_bytes()
+    StageProfiler()
+    assert peak_rss_bytes() >= peak
+
+
+def test_run_profiler_report_aggregates_workers():
+    profiler = RunProfiler()
+    profiler.start_compute()
+    for pid, start, end in [(1, 0.0, 1.0), (1, 1.0, 2.0), (2, 0.0, 4.0)]:
+        profiler.add_batch(
+            {
+                "pid": pid,
+                "start": start,
+                "end": end,
+                "cpu": end - start,
+                "pairs": 10,
+                "max_rss": 100,
+                "stages": {"ks_test": {"wall": 0.5, "cpu": 0.5, "calls": 10}},
+            },
+            received=end + 0.1,
+        )
+    profiler.end_compute()
+    report = profiler.report()
+
+    assert report["pairs"] == 30
+    assert report["worker_stages"]["ks_test"]["calls"] == 30
+    assert [worker["pairs"] for worker in report["workers"]] == [20, 10]
+    assert report["stragglers"]["worker_imbalance"] == 4.0 / 3.0
+    assert report["stragglers"]["tail_time"] == 2.0
+    json.dumps(report)  # The report must be JSON-serializable
+
+
+def test_compute_dc_copula_network_parallel_profile():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    profiler = RunProfiler()
+
+    network_df = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, batch_size=10, profiler=profiler
+    )
+    report = profiler.report()
+
+    assert len(network_df) == 45
+    assert report["pairs"] == 45
+    assert report["batches"]["count"] == 5
+    assert report["worker_stages"]["empirical_copula"]["calls"] == 45
+    assert "shared_memory_setup" in report["parent"]["stages"]
+
+
+def test_monitored_batches_only_report_progress():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    profile = batch_stats(None, monitor=object())
+    assert profile == PROFILE_PROGRESS
+    assert batch_stats(RunProfiler(), monitor=object()) is True
+    assert batch_stats(None, None) is False
+
+    with expression_data_class("serial")(df1, df2) as shared_data:
+        weights, snapshot = analyzer.compute_condensed_range(
+            (0, 10),
+            *shared_data.sources,
+            "average",
+            "none",
+            "asymp",
+            shared_data.data1_shape,
+            shared_data.data2_shape,
+            shared_data.dtype,
+            profile,
+        )
+    assert len(weights) == 10
+    assert set(snapshot) == {"pid", "end", "pairs"}
+    assert snapshot["pairs"] == 10
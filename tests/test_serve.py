@@ -0,0 +1,103 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer
+from copula.empirical_copula import EmpiricalCopula
+from serve import CodcService, create_server
+
+
+@pytest.fixture(scope="module")
+def setup_data():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    analyzer = GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula())
+    return df1, df2, analyzer
+
+
+def sorted_network(df):
+    return df.sort_values(["Regulator", "Target"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("batch_size", [7, 100])
+def test_network_jobs_match_codc(setup_data, batch_size, monkeypatch):
+    df1, df2, analyzer = setup_data
+    # Forcing every job onto the worker pool
+    monkeypatch.setattr("serve.INLINE_MAX_PAIRS", 0)
+    expected = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, smoothing="beta", max_workers=1, verbose=False
+    )
+    with CodcService(
+        df1, df2, analyzer, max_workers=1, batch_size=batch_size
+    ) as service:
+        network_df = service.network({"smoothing": "beta"})
+        pd.testing.assert_frame_equal(
+            sorted_network(network_df), sorted_network(expected)
+        )
+
+        genes = ["NEB", "ACTA1", "CKM"]
+        subset = service.network({"genes": genes, "smoothing": "beta"})
+    assert len(subset) == 3
+    expected = expected[
+        expected["Regulator"].isin(genes) & expected["Target"].isin(genes)
+    ]
+    pd.testing.assert_frame_equal(sorted_network(subset), sorted_network(expected))
+
+
+def test_pair_queries(setup_data):
+    df1, df2, analyzer = setup_data
+    expected = analyzer.compute_dc_copula_network_parallel(
+        df1, df2, max_workers=1, verbose=False
+    )
+    first = expected.iloc[0]
+    with CodcService(df1, df2, analyzer, backend="serial") as service:
+        regulator, target = first["Regulator"], first["Target"]
+        pairs = service.pairs({"pairs": [[regulator, target], [target, regulator]]})
+        assert [pair["Weight"] for pair in pairs] == [first["Weight"]] * 2
+        assert pairs[1]["Regulator"] == target
+
+        with pytest.raises(ValueError, match="Unknown genes"):
+            service.pairs({"pairs": [["ACTA1", "NOT_A_GENE"]]})
+        with pytest.raises(ValueError, match="must differ"):
+            service.pairs({"pairs": [["ACTA1", "ACTA1"]]})
+        with pytest.raises(ValueError, match="smoothing"):
+            service.pairs({"pairs": [["ACTA1", "NEB"]], "smoothing": "gaussian"})
+
+
+def test_http_server(setup_data):
+    df1, df2, analyzer = setup_data
+    with CodcService(df1, df2, analyzer, backend="threads", max_workers=2) as service:
+        server = create_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        def post(path, job):
+            request = urllib.request.Request(url + path, data=json.dumps(job).encode())
+            with urllib.request.urlopen(request) as response:
+                return response.read().decode()
+
+        try:
+            with urllib.request.urlopen(url + "/info") as response:
+                assert json.load(response)["n_genes"] == 10
+            network = post("/network", {"genes": ["ACTA1", "NEB"]})
+            assert network.splitlines()[0] == "Target\tRegulator\tCondition\tWeight"
+            assert len(network.splitlines()) == 2
+            pairs = json.loads(post("/pairs", {"pairs": [["ACTA1", "NEB"]]}))["pairs"]
+            assert pairs[0]["Target"] == "NEB"
+
+            with pytest.raises(urllib.error.HTTPError) as error:
+                post("/pairs", {"pairs": []})
+            assert error.value.code == 400
+            assert "pairs" in json.load(error.value)["error"]
+
+            post("/shutdown", {})
+            thread.join(timeout=10)
+            assert not thread.is_alive()
+        finally:
+            if thread.is_alive():
+                server.shutdown()
+            server.server_close()
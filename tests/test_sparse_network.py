@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sparse_network import SparseNetwork
+
+NETWORK_FILE = "./data/python_impl_network.tsv"
+
+
+@pytest.fixture
+def network_df():
+    return pd.read_csv(NETWORK_FILE, sep="\t")
+
+
+def test_degrees_match_edge_list(network_df):
+    network = SparseNetwork.from_network(network_df, threshold=0.3)
+    edges = network_df[network_df["Weight"] >= 0.3]
+    assert network.n_edges == len(edges)
+
+    endpoints = pd.DataFrame(
+        {
+            "Gene": np.concatenate([edges["Regulator"], edges["Target"]]),
+            "Weight": np.concatenate([edges["Weight"], edges["Weight"]]),
+        }
+    )
+    expected = endpoints.groupby("Gene")["Weight"].agg(["size", "sum"])
+    degrees = network.degrees().set_index("Gene")
+    connected = degrees[degrees["Degree"] > 0]
+    assert connected["Degree"].to_dict() == expected["size"].to_dict()
+    np.testing.assert_allclose(connected["WeightedDegree"], expected.loc[connected.index, "sum"])
+    assert network.hubs(3)["Gene"].tolist() == ["MYH2", "MYL2", "NRAP"]
+
+
+def test_sources_build_the_same_network(network_df):
+    from_frame = SparseNetwork.from_network(network_df, threshold=0.3)
+    from_tsv = SparseNetwork.from_tsv(NETWORK_FILE, threshold=0.3, chunksize=7)
+    # The example network lists the pairs of 10 genes in condensed order
+    from_condensed = SparseNetwork.from_condensed(
+        network_df["Weight"].values, from_frame.gene_names, threshold=0.3, chunk_size=4
+    )
+    for network in (from_tsv, from_condensed):
+        assert list(network.gene_names) == list(from_frame.gene_names)
+        assert (network.adjacency != from_frame.adjacency).nnz == 0
+
+
+def test_save_load_and_filter(network_df, tmp_path):
+    network = SparseNetwork.from_network(network_df, threshold=0.3)
+    network.save(tmp_path / "network.npz")
+    assert (tmp_path / "network_genes.tsv").exists()
+
+    loaded = SparseNetwork.load(str(tmp_path / "network.npz"))
+    assert list(loaded.gene_names) == list(network.gene_names)
+    assert loaded.filter(0.5).n_edges == (network_df["Weight"] >= 0.5).sum()
+
+
+def test_filter_keeps_edges_with_zero_weight():
+    network_df = pd.DataFrame(
+        {
+            "Target": ["B", "C", "C"],
+            "Regulator": ["A", "A", "B"],
+            "Weight": [0.0, 0.4, 0.2],
+        }
+    )
+    network = SparseNetwork.from_network(network_df, threshold=0.0)
+    filtered = network.filter(0.0)
+    assert network.n_edges == filtered.n_edges == 3
+    pd.testing.assert_frame_equal(filtered.degrees(), network.degrees())
+    assert network.degrees().set_index("Gene").loc["A", "Degree"] == 2
+    assert network.filter(0.3).n_edges == 1
+
+
+def test_modules():
+    network = SparseNetwork.from_edges(
+        np.array(["A", "B", "C", "D", "E", "F"]),
+        rows=np.array([0, 1, 3]),
+        cols=np.array([1, 2, 4]),
+        weights=np.array([0.9, 0.8, 0.7]),
+    )
+    modules = network.modules(min_size=2)
+    assert modules.groupby("Module")["Gene"].apply(list).to_dict() == {
+        1: ["A", "B", "C"],
+        2: ["D", "E"],
+    }
+    assert network.modules(min_size=3)["Gene"].tolist() == ["A", "B", "C"]
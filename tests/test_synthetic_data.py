@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from synthetic_data import SyntheticExpressionGenerator
+
+
+def test_write_condition_matches_input_format(tmp_path):
+    generator = SyntheticExpressionGenerator(n_genes=25, n_samples=8, n_samples_2=6)
+    generator.write_condition(tmp_path / "c1.tsv", 1, chunk_size=7)
+    generator.write_condition(tmp_path / "c2.tsv.gz", 2, chunk_size=7, file_format="tsv.gz")
+
+    df1 = pd.read_csv(tmp_path / "c1.tsv", delimiter="\t")
+    df2 = pd.read_csv(tmp_path / "c2.tsv.gz", delimiter="\t")
+    assert df1.shape == (25, 9)
+    assert df2.shape == (25, 7)
+    assert df1.columns[0] == "Gene"
+    assert np.array_equal(df1.iloc[:, 0].values, df2.iloc[:, 0].values)
+    assert (df1.iloc[:, 1:].values >= 0).all()
+
+
+@pytest.mark.parametrize("zero_fraction", [0.0, 0.2, 0.5])
+def test_zero_fraction(tmp_path, zero_fraction):
+    generator = SyntheticExpressionGenerator(
+        n_genes=200, n_samples=500, zero_fraction=zero_fraction
+    )
+    values = generator.generate_chunk(0, 200, 1, np.random.default_rng(0))
+    assert np.mean(values == 0) == pytest.approx(zero_fraction, abs=0.01)
+
+    # Apart from the dropouts, no values are tied, also after writing them
+    generator.write_condition(tmp_path / "condition_1.tsv", 1)
+    written = pd.read_csv(tmp_path / "condition_1.tsv", delimiter="\t").iloc[:, 1:].values
+    assert np.mean(written == 0) == pytest.approx(zero_fraction, abs=0.01)
+    for gene in written:
+        nonzero = gene[gene != 0]
+        assert len(np.unique(nonzero)) == len(nonzero)
+
+
+def test_planted_modules_are_differentially_coexpressed(tmp_path):
+    generator = SyntheticExpressionGenerator(
+        n_genes=50, n_samples=500, n_modules=1, module_size=5, module_strength=0.9
+    )
+    members = np.flatnonzero(generator.module_membership == 0)
+    rng = np.random.default_rng(1)
+    condition_1 = generator.generate_chunk(0, 50, 1, rng)[members]
+    condition_2 = generator.generate_chunk(0, 50, 2, rng)[members]
+    upper = np.triu_indices(len(members), k=1)
+    assert np.corrcoef(condition_1)[upper].min() > 0.5
+    assert np.abs(np.corrcoef(condition_2)[upper]).max() < 0.3
+
+    generator.write_modules(tmp_path / "modules.tsv")
+    modules = pd.read_csv(tmp_path / "modules.tsv", delimiter="\t")
+    assert len(modules) == 5
+    assert set(modules["Module"]) == {0}
+
+
+def test_modules_must_fit():
+    with pytest.raises(ValueError):
+        SyntheticExpressionGenerator(n_genes=10, n_samples=5, n_modules=3, module_size=5)
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+from analyzer import GeneExpressionAnalyzer, SharedExpressionData
+from copula.empirical_copula import EmpiricalCopula
+from tuning import BatchTuner, parse_memory_size
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("512", 512), ("4K", 4096), ("1.5G", int(1.5 * 1024**3)), ("2gb", 2 * 1024**3)],
+)
+def test_parse_memory_size(value, expected):
+    assert parse_memory_size(value) == expected
+
+
+def test_parse_memory_size_invalid():
+    with pytest.raises(ValueError):
+        parse_memory_size("lots")
+
+
+def test_choose_batch_size_amortizes_overhead_and_balances_load():
+    tuner = BatchTuner(analyzer=None, max_overhead=0.05, min_batches_per_worker=4)
+    calibration = {"seconds_per_pair": 0.001, "task_overhead": 0.002}
+    # 0.002s overhead must be at most 5% of the batch: 40 pairs of 1ms
+    assert tuner.choose_batch_size(calibration, n_pairs=100000, workers=4) == 40
+    # Only 100 pairs for 4 workers: at most 100 / (4 * 4) pairs per batch
+    assert tuner.choose_batch_size(calibration, n_pairs=100, workers=4) == 6
+
+
+@pytest.fixture
+def shared_data():
+    df1 = pd.read_csv("./tests/data/BRCA_normal_subset.tsv", sep="\t")
+    df2 = pd.read_csv("./tests/data/BRCA_tumor_subset.tsv", sep="\t")
+    with SharedExpressionData(df1, df2) as data:
+        yield data
+
+
+def test_tune_respects_memory_limit(shared_data):
+    tuner = BatchTuner(GeneExpressionAnalyzer(empirical_copula=EmpiricalCopula()))
+    tuning = tuner.tune(shared_data, max_workers=2, memory_limit=parse_memory_size("8G"))
+    assert 1 <= tuning["workers"] <= 2
+    assert tuning["batch_size"] >= 1
+    assert tuning["estimated_memory"] <= parse_memory_size("8G")
+    assert tuning["calibration"]["seconds_per_pair"] > 0
+
+    with pytest.raises(ValueError):
+        tuner.tune(shared_data, memory_limit=parse_memory_size("1M"))
@@ -0,0 +1,223 @@
+import os
+import pickle
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from profiling import peak_rss_bytes
+
+MEMORY_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_memory_size(value: str) -> int:
+    """
+    Parses a human readable memory size such as '512M', '4G' or '1.5GB' into bytes.
+
+    Raises:
+        ValueError: If the value can not be parsed.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid memory size: {value}")
+    number, unit = match.groups()
+    return int(float(number) * MEMORY_UNITS[unit])
+
+
+def format_memory_size(n_bytes: float) -> str:
+    for unit in ("T", "G", "M", "K"):
+        if n_bytes >= MEMORY_UNITS[unit]:
+            return f"{n_bytes / MEMORY_UNITS[unit]:.1f}{unit}"
+    return f"{int(n_bytes)}B"
+
+
+class BatchTuner:
+    """
+    Chooses the batch size and the number of worker processes of a run from a short calibration on a sample of
+    gene pairs.
+
+    The batch size is chosen so that the fixed cost of a task (pickling the arguments, scheduling, transferring
+    the results) stays a small fraction of its compute time, while leaving enough batches per worker to balance
+    the load. The number of workers is the largest one whose estimated total memory fits into the budget.
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        calibration_pairs: int = 50,
+        max_overhead: float = 0.05,
+        min_batches_per_worker: int = 4,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            analyzer (GeneExpressionAnalyzer): The analyzer used for the run.
+            calibration_pairs (int): Number of sampled gene pairs computed during the calibration.
+            max_overhead (float): Targeted upper bound of the per-task overhead relative to its compute time.
+            min_batches_per_worker (int): Minimum number of batches per worker, for load balancing.
+            seed (int): Seed used to sample the calibration pairs.
+        """
+        self.analyzer = analyzer
+        self.calibration_pairs = calibration_pairs
+        self.max_overhead = max_overhead
+        self.min_batches_per_worker = min_batches_per_worker
+        self.seed = seed
+
+    def sample_pairs(self, n_genes: int) -> list:
+        """
+        Samples gene pairs from a random tile of genes, so the calibration reads the same kind of data a worker
+        does during the run.
+        """
+        rng = np.random.default_rng(self.seed)
+        tile_size = min(n_genes, int(np.ceil(np.sqrt(2 * self.calibration_pairs))) + 1)
+        genes = np.sort(rng.choice(n_genes, size=tile_size, replace=False))
+        pairs = [
+            (int(genes[a]), int(genes[b]))
+            for a in range(tile_size - 1)
+            for b in range(a + 1, tile_size)
+        ]
+        return pairs[: self.calibration_pairs]
+
+    def calibrate(
+        self, shared_data, ties_method="average", smoothing="none", ks_stat_method="asymp"
+    ) -> dict:
+        """
+        Computes a sample of gene pairs in a single worker process and measures the cost of a pair, the size of
+        its results and the fixed cost and memory of a worker.
+
+        Returns:
+            dict: The calibration measurements.
+        """
+        pairs = self.sample_pairs(shared_data.n_genes)
+        args = (
+            shared_data.shm_data1.name,
+            shared_data.shm_data2.name,
+            ties_method,
+            smoothing,
+            ks_stat_method,
+            shared_data.data1_shape,
+            shared_data.data2_shape,
+            shared_data.dtype,
+            True,
+        )
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            # An empty batch starts the worker and measures the round trip of a task without any computation
+            executor.submit(self.analyzer.compute_pairs, [], *args).result()
+            start = time.perf_counter()
+            _, empty_snapshot = executor.submit(
+                self.analyzer.compute_pairs, [], *args
+            ).result()
+            task_round_trip = time.perf_counter() - start
+            results, snapshot = executor.submit(
+                self.analyzer.compute_pairs, pairs, *args
+            ).result()
+
+        # Serializing the arguments happens in the parent for every task
+        start = time.perf_counter()
+        pickle.dumps((self.analyzer, pairs) + args)
+        task_pickling = time.perf_counter() - start
+
+        n_pairs = max(len(results), 1)
+        return {
+            "pairs": len(results),
+            "seconds_per_pair": (snapshot["end"] - snapshot["start"]) / n_pairs,
+            "task_overhead": task_round_trip + task_pickling,
+            "result_bytes_per_pair": len(pickle.dumps(results)) / n_pairs,
+            "frame_bytes_per_pair": self.analyzer.to_network(
+                results, shared_data.gene_names
+            )
+            .memory_usage(deep=True)
+            .sum()
+            / n_pairs,
+            "worker_rss": max(empty_snapshot["max_rss"], snapshot["max_rss"]),
+        }
+
+    def tune(
+        self,
+        shared_data,
+        ties_method="average",
+        smoothing="none",
+        ks_stat_method="asymp",
+        batch_size=None,
+        max_workers=None,
+        memory_limit=None,
+    ) -> dict:
+        """
+        Chooses the batch size and number of workers for a run.
+
+        Args:
+            shared_data (SharedExpressionData): The expression data of the run.
+            batch_size (int): A fixed batch size, or None to choose it.
+            max_workers (int): Upper bound of the number of workers. Defaults to the number of CPUs.
+            memory_limit (int): Budget in bytes for the total resident memory of the parent and all workers, or
+                                None for no limit.
+
+        Returns:
+            dict: The chosen `batch_size` and `workers`, the `estimated_memory` of the run in bytes and the
+                  `calibration` measurements.
+
+        Raises:
+            ValueError: If not even a single worker fits into the memory limit.
+        """
+        calibration = self.calibrate(shared_data, ties_method, smoothing, ks_stat_method)
+        n_pairs = shared_data.n_genes * (shared_data.n_genes - 1) // 2
+        max_workers = max_workers or os.cpu_count()
+
+        # Memory that does not depend on the number of workers: the parent process, the shared expression data
+        # and the collected results (kept as packed records and as the result DataFrame at the end of the run)
+        fixed_memory = (
+            peak_rss_bytes()
+            + shared_data.nbytes
+            + n_pairs
+            * (calibration["result_bytes_per_pair"] + calibration["frame_bytes_per_pair"])
+        )
+
+        def worker_memory(size):
+            # A worker holds the results of its batch, once packed and once pickled
+            return calibration["worker_rss"] + 2 * size * calibration["result_bytes_per_pair"]
+
+        auto_batch_size = batch_size is None
+        if auto_batch_size:
+            batch_size = self.choose_batch_size(calibration, n_pairs, max_workers)
+
+        workers = max_workers
+        if memory_limit is not None:
+            available = memory_limit - fixed_memory
+            workers = min(max_workers, int(available // worker_memory(batch_size)))
+            if workers < 1:
+                raise ValueError(
+                    f"The memory limit of {format_memory_size(memory_limit)} is too low, the run needs at least "
+                    f"{format_memory_size(fixed_memory + worker_memory(batch_size))}."
+                )
+            if auto_batch_size and workers < max_workers:
+                # Fewer workers need fewer batches to balance the load, larger batches are fine as long as
+                # every worker stays within its share of the budget
+                largest_fitting = (
+                    available / workers - calibration["worker_rss"]
+                ) // (2 * calibration["result_bytes_per_pair"])
+                batch_size = max(
+                    batch_size,
+                    min(
+                        self.choose_batch_size(calibration, n_pairs, workers),
+                        largest_fitting,
+                    ),
+                )
+
+        return {
+            "batch_size": int(batch_size),
+            "workers": int(workers),
+            "estimated_memory": int(fixed_memory + workers * worker_memory(batch_size)),
+            "calibration": calibration,
+        }
+
+    def choose_batch_size(self, calibration: dict, n_pairs: int, workers: int) -> int:
+        """
+        Returns the smallest batch size that keeps the task overhead below `max_overhead`, capped so that every
+        worker still gets at least `min_batches_per_worker` batches.
+        """
+        seconds_per_pair = max(calibration["seconds_per_pair"], 1e-9)
+        amortized = calibration["task_overhead"] / (self.max_overhead * seconds_per_pair)
+        balanced = n_pairs / (workers * self.min_batches_per_worker)
+        return int(max(1, min(np.ceil(amortized), balanced)))